@@ -0,0 +1,122 @@
+import argparse
+import datetime
+import json
+import pathlib
+import platform
+import subprocess
+import sys
+from .compare import compare_results
+from .suite import collect_benchmarks, run_benchmarks
+
+SUITES = ["astar", "cbs", "algorithms"]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(args) -> int:
+    benchmarks = collect_benchmarks(args["suite"], max_timesteps=args["max_timesteps"], tick_budget=args["tick_budget"])
+    results = run_benchmarks(benchmarks, repeat=args["repeat"], memory=not args["no_memory"], pattern=args["filter"])
+    report = {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "suites": args["suite"],
+            "repeat": args["repeat"],
+            "max_timesteps": args["max_timesteps"],
+            "tick_budget": args["tick_budget"]
+        },
+        "results": results
+    }
+    args["output"].parent.mkdir(parents=True, exist_ok=True)
+    with open(args["output"], "w") as output:
+        json.dump(report, output, indent=2)
+    print(f"{len(results)} benchmarks written to {args['output']}")
+    return 0
+
+
+def compare(args) -> int:
+    with open(args["baseline"], "r") as baseline_file, open(args["current"], "r") as current_file:
+        baseline = json.load(baseline_file)["results"]
+        current = json.load(current_file)["results"]
+    tolerances = {"time": args["time_tolerance"], "memory": args["memory_tolerance"], "count": args["count_tolerance"]}
+    regressions, missing = compare_results(baseline, current, tolerances)
+    for name in missing:
+        print(f"MISSING {name}")
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    compared = len(baseline) - len(missing)
+    print(f"{compared} benchmarks compared, {len(regressions)} regressions, {len(missing)} missing")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Benchmarks of the planners and of the algorithms, run from the root of the repository"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="Run the benchmarks and write their results as JSON")
+    run_parser.add_argument(
+        "--suite",
+        nargs="+",
+        choices=SUITES,
+        default=SUITES,
+        help="Suites to run: A* microbenchmarks, CBS searches on every map, every algorithm on every scenario"
+    )
+    run_parser.add_argument(
+        "-k", "--filter",
+        default=None,
+        help="Regular expression, only the benchmarks whose name matches it are run (e.g. 'astar/.*/free')"
+    )
+    run_parser.add_argument(
+        "-o", "--output",
+        type=pathlib.Path,
+        default=pathlib.Path("benchmarks", "results", "latest.json"),
+        help="Path of the JSON results"
+    )
+    run_parser.add_argument("--repeat", type=int, default=3, help="Timed runs of every benchmark")
+    run_parser.add_argument("--no-memory", action="store_true", help="Skip the run measuring the peak memory")
+    run_parser.add_argument(
+        "--max-timesteps",
+        type=int,
+        default=3000,
+        help="Maximum number of timesteps of every simulation"
+    )
+    run_parser.add_argument(
+        "--tick-budget",
+        type=float,
+        default=None,
+        help="Planning time allowed per timestep of the simulations, in seconds"
+    )
+    compare_parser = commands.add_parser("compare", help="Compare results with a baseline and flag regressions")
+    compare_parser.add_argument("baseline", type=pathlib.Path, help="JSON results of the baseline")
+    compare_parser.add_argument("current", type=pathlib.Path, help="JSON results to check")
+    compare_parser.add_argument(
+        "--time-tolerance",
+        type=float,
+        default=0.2,
+        help="Allowed relative increase of the times (wall time, setup time, tick latencies)"
+    )
+    compare_parser.add_argument(
+        "--memory-tolerance",
+        type=float,
+        default=0.1,
+        help="Allowed relative increase of the peak memory"
+    )
+    compare_parser.add_argument(
+        "--count-tolerance",
+        type=float,
+        default=0.0,
+        help="Allowed relative increase of the A* expansions and of the makespan"
+    )
+    arguments = vars(parser.parse_args())
+    sys.exit(run(arguments) if arguments["command"] == "run" else compare(arguments))
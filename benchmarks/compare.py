@@ -0,0 +1,80 @@
+from typing import Dict, List, Optional, Tuple
+
+# metric -> category, every metric is better when lower
+METRICS = {
+    "wall_time": "time",
+    "setup_time": "time",
+    "tick_latency.p50": "time",
+    "tick_latency.p90": "time",
+    "tick_latency.p99": "time",
+    "peak_memory": "memory",
+    "expansions": "count",
+    "makespan": "count"
+}
+MIN_TIME = 1e-3  # seconds, time differences below it are noise
+
+
+class Regression:
+    def __init__(self, benchmark: str, metric: str, baseline, current):
+        self.benchmark = benchmark
+        self.metric = metric
+        self.baseline = baseline
+        self.current = current
+
+    def __str__(self):
+        if isinstance(self.baseline, (int, float)) and not isinstance(self.baseline, bool) and self.baseline:
+            change = f" ({(self.current - self.baseline) / abs(self.baseline):+.1%})"
+        else:
+            change = ""
+        return f"{self.benchmark} {self.metric}: {self.baseline} -> {self.current}{change}"
+
+
+def get_metric(result: Dict, metric: str) -> Optional[float]:
+    value = result
+    for key in metric.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def compare_results(
+    baseline: Dict[str, Dict],
+    current: Dict[str, Dict],
+    tolerances: Dict[str, float]
+) -> Tuple[List[Regression], List[str]]:
+    """
+    Compare the results of two runs of the benchmarks.
+
+    A metric regresses if its current value is greater than the baseline one by more than the tolerance of its
+    category (a fraction of the baseline value), a benchmark regresses if it does not complete anymore. A makespan of
+    -1 (not completed) is only compared through completion.
+
+    Args:
+        tolerances: tolerance of every category of METRICS, "time", "memory" and "count".
+
+    Returns:
+        Tuple[List[Regression], List[str]]: the regressions and the benchmarks of the baseline missing in current.
+    """
+    regressions = []
+    missing = []
+    for name, baseline_result in baseline.items():
+        current_result = current.get(name)
+        if current_result is None:
+            missing.append(name)
+            continue
+        if baseline_result.get("completed", True) and not current_result.get("completed", True):
+            regressions.append(Regression(name, "completed", True, False))
+            continue
+        for metric, category in METRICS.items():
+            baseline_value = get_metric(baseline_result, metric)
+            current_value = get_metric(current_result, metric)
+            if baseline_value is None or current_value is None:
+                continue
+            if metric == "makespan" and (baseline_value < 0 or current_value < 0):
+                continue
+            if category == "time" and current_value - baseline_value < MIN_TIME:
+                continue
+            if current_value > baseline_value * (1 + tolerances[category]):
+                regressions.append(Regression(name, metric, baseline_value, current_value))
+    return regressions, missing
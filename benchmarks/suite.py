@@ -0,0 +1,253 @@
+import contextlib
+import os
+import pathlib
+import random
+import re
+import statistics
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+from simulator import Grid
+from simulator.headless_simulation import HeadlessSimulation
+from planner.a_star_planner import AStarPlanner
+from planner.algorithm_utils import ALGORITHMS
+from planner.budget import PlanningBudget, PlanningTimeout
+from planner.cbs import CBS
+from planner.distance_oracle import DistanceOracle
+from planner.reservation_table import ReservationTable
+
+MAPS_DIR = pathlib.Path("maps")
+SCENARIOS_DIR = pathlib.Path("scenarios")
+SEED = 2024
+ASTAR_REQUESTS = 200        # start/goal pairs planned by every A* microbenchmark
+ASTAR_OBSTACLE_PATHS = 8    # paths reserved in the constraint set of the "reserved" A* microbenchmarks
+CBS_AGENTS = 4
+CBS_TIME_LIMIT = 10.0       # seconds, a CBS search still running is stopped and recorded as timed out
+
+
+class Benchmark:
+    """
+    A benchmark case, its input is built (from a fixed seed) when it is created: run executes it once and returns
+    its own metrics, e.g. the makespan. The wall time and the peak memory are measured around run by
+    run_benchmarks, and the A* expansions if counts_expansions: they are counted by AStarPlanner in this process
+    only, so the cases planning with other planners (FocalAStar, SIPP), through the route cache or in a pool of
+    workers leave the metric out.
+    """
+
+    def __init__(self, name: str, kind: str, run: Callable[[], Dict], counts_expansions: bool = False):
+        self.name = name
+        self.kind = kind
+        self.run = run
+        self.counts_expansions = counts_expansions
+
+
+def free_cells(grid: Grid) -> List[Tuple[int, int]]:
+    return [(x, y) for y in range(grid.height) for x in range(grid.width) if grid.is_passable((x, y))]
+
+
+def random_pairs(grid: Grid, count: int, rng: random.Random, distinct: bool = False) -> List[Tuple[Tuple, Tuple]]:
+    """
+    Args:
+        distinct: if True the 2 * count cells of the pairs are all distinct, e.g. for the agents of a multi-agent
+            search, which has no solution if two agents start (or end) in the same cell.
+
+    Returns:
+        List[Tuple[Tuple, Tuple]]: count (start, goal) pairs of distinct free cells, the goal reachable from the
+        start, drawn from rng.
+    """
+    cells = free_cells(grid)
+    oracle = DistanceOracle(grid)
+    if distinct:  # the whole sample is drawn again until every goal is reachable from its start
+        while True:
+            sample = rng.sample(cells, 2 * count)
+            pairs = list(zip(sample[:count], sample[count:]))
+            if all(oracle.distance(start, goal) < DistanceOracle.UNREACHABLE for start, goal in pairs):
+                return pairs
+    pairs = []
+    while len(pairs) < count:
+        start, goal = rng.sample(cells, 2)
+        if oracle.distance(start, goal) < DistanceOracle.UNREACHABLE:
+            pairs.append((start, goal))
+    return pairs
+
+
+def astar_benchmarks(map_path: pathlib.Path) -> List[Benchmark]:
+    """
+    A* microbenchmarks of a map: the same start/goal pairs planned without constraints and against the
+    reservations of other fixed paths.
+    """
+    grid = Grid(str(map_path))
+    rng = random.Random(f"{SEED}-astar-{map_path.stem}")
+    requests = random_pairs(grid, ASTAR_REQUESTS, rng)
+    reserved = ReservationTable()
+    for owner, (start, goal) in enumerate(random_pairs(grid, ASTAR_OBSTACLE_PATHS, rng)):
+        reserved.add_path(owner, AStarPlanner.plan(start, goal, grid))
+
+    def plan_all(constraints: ReservationTable) -> Callable[[], Dict]:
+        def run() -> Dict:
+            lengths = [len(AStarPlanner.plan(start, goal, grid, constraints)) - 1 for start, goal in requests]
+            return {"path_length": sum(lengths)}
+        return run
+
+    return [
+        Benchmark(f"astar/{map_path.stem}/free", "micro", plan_all(ReservationTable()), counts_expansions=True),
+        Benchmark(f"astar/{map_path.stem}/reserved", "micro", plan_all(reserved), counts_expansions=True)
+    ]
+
+
+def cbs_benchmark(map_path: pathlib.Path) -> Benchmark:
+    grid = Grid(str(map_path))
+    rng = random.Random(f"{SEED}-cbs-{map_path.stem}")
+    agents_tasks = dict(enumerate(random_pairs(grid, CBS_AGENTS, rng, distinct=True)))
+    heuristic = DistanceOracle(grid)
+
+    def run() -> Dict:
+        budget = PlanningBudget(CBS_TIME_LIMIT)
+        budget.start()
+        try:
+            solution = CBS.high_level_search(agents_tasks, grid, heuristic=heuristic, budget=budget)
+        except PlanningTimeout:
+            return {"completed": False, "makespan": -1}
+        if not solution:
+            return {"completed": False, "makespan": -1}
+        return {
+            "completed": True,
+            "makespan": max(len(path) for path in solution.values()) - 1,
+            "sum_of_costs": sum(len(path) - 1 for path in solution.values())
+        }
+
+    return Benchmark(f"cbs/{map_path.stem}/{CBS_AGENTS}", "macro", run, counts_expansions=True)
+
+
+def algorithm_benchmark(
+    algorithm: str,
+    scenario_path: pathlib.Path,
+    max_timesteps: int,
+    tick_budget: Optional[float] = None
+) -> Benchmark:
+    """
+    Headless simulation of a scenario, the time spent creating the algorithm (the offline planning) is recorded
+    apart from the latency of every tick.
+    """
+    def run() -> Dict:
+        start_time = time.perf_counter()
+        simulation = HeadlessSimulation(scenario_path, algorithm, max_timesteps=max_timesteps, tick_budget=tick_budget)
+        setup_time = time.perf_counter() - start_time
+        latencies = []
+        while not simulation.is_finished() and simulation.algorithm.timestep < max_timesteps:
+            tick_start = time.perf_counter()
+            simulation.update()
+            latencies.append(time.perf_counter() - tick_start)
+        return {
+            "completed": simulation.is_finished(),
+            "makespan": simulation.algorithm.makespan,
+            "timesteps": simulation.algorithm.timestep,
+            "fallbacks": len(simulation.budget.fallbacks),
+            "setup_time": setup_time,
+            "tick_latency": latency_percentiles(latencies)
+        }
+
+    return Benchmark(f"algorithm/{algorithm}/{scenario_path.stem}", "macro", run)
+
+
+def latency_percentiles(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {"p50": 0.0, "p90": 0.0, "p99": 0.0, "max": 0.0}
+    if len(latencies) == 1:
+        return {"p50": latencies[0], "p90": latencies[0], "p99": latencies[0], "max": latencies[0]}
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {"p50": percentiles[49], "p90": percentiles[89], "p99": percentiles[98], "max": max(latencies)}
+
+
+def collect_benchmarks(
+    suites: List[str],
+    max_timesteps: int = 3000,
+    tick_budget: Optional[float] = None
+) -> List[Benchmark]:
+    """
+    Args:
+        suites: "astar", "cbs" and/or "algorithms".
+        max_timesteps: timesteps after which a simulation is stopped (and recorded as not completed).
+        tick_budget: planning time allowed per timestep of the simulations, None for no limit.
+    """
+    benchmarks = []
+    maps = sorted(MAPS_DIR.glob("*.map"))
+    if "astar" in suites:
+        for map_path in maps:
+            benchmarks += astar_benchmarks(map_path)
+    if "cbs" in suites:
+        benchmarks += [cbs_benchmark(map_path) for map_path in maps]
+    if "algorithms" in suites:
+        for scenario_path in sorted(SCENARIOS_DIR.glob("*.json")):
+            benchmarks += [
+                algorithm_benchmark(algorithm, scenario_path, max_timesteps, tick_budget) for algorithm in ALGORITHMS
+            ]
+    return benchmarks
+
+
+def run_benchmarks(
+    benchmarks: List[Benchmark],
+    repeat: int = 3,
+    memory: bool = True,
+    pattern: Optional[str] = None,
+    log: Callable[[str], None] = print
+) -> Dict[str, Dict]:
+    """
+    Run every benchmark whose name matches pattern (a regular expression, every benchmark if None) repeat times,
+    with the output of the planners silenced. The wall time is the median of the runs, the other metrics are the
+    ones of the first run (the benchmarks are deterministic, apart from the ones stopped by a time limit). The peak
+    memory is measured with tracemalloc in one more run, so that tracing does not slow down the timed ones.
+
+    Returns:
+        Dict[str, Dict]: the metrics of every benchmark, by name.
+    """
+    results = {}
+    for benchmark in benchmarks:
+        if pattern is not None and not re.search(pattern, benchmark.name):
+            continue
+        wall_times = []
+        metrics = {}
+        for i in range(repeat):
+            expansions = AStarPlanner.expansions
+            with silenced():
+                start_time = time.perf_counter()
+                run_metrics = benchmark.run()
+                wall_times.append(time.perf_counter() - start_time)
+            if i == 0:
+                metrics = dict(run_metrics)
+                if benchmark.counts_expansions:
+                    metrics["expansions"] = AStarPlanner.expansions - expansions
+        result = {"kind": benchmark.kind, "wall_time": statistics.median(wall_times), "wall_times": wall_times}
+        if memory:
+            with silenced():
+                tracemalloc.start()
+                try:
+                    benchmark.run()
+                    result["peak_memory"] = tracemalloc.get_traced_memory()[1]
+                finally:
+                    tracemalloc.stop()
+        results[benchmark.name] = {**result, **metrics}
+        log(f"{benchmark.name}: {format_result(results[benchmark.name])}")
+    return results
+
+
+def format_result(result: Dict) -> str:
+    fields = [f"wall {result['wall_time']:.3f}s"]
+    if "expansions" in result:
+        fields.append(f"expansions {result['expansions']}")
+    if "tick_latency" in result:
+        fields.append(f"tick p99 {result['tick_latency']['p99'] * 1000:.2f}ms")
+    if "makespan" in result:
+        fields.append(f"makespan {result['makespan']}")
+    if "peak_memory" in result:
+        fields.append(f"peak {result['peak_memory'] / 2 ** 20:.1f}MiB")
+    return ", ".join(fields)
+
+
+@contextlib.contextmanager
+def silenced():
+    """
+    Discard what the algorithms and the planners print, e.g. the timeit reports.
+    """
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
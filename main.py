@@ -1,12 +1,29 @@
 import argparse
 
 import pathlib
-from simulator import TkinterSimulation
+from simulator.headless_simulation import HeadlessSimulation
+from planner.planner_utils import PLANNERS
 
 
 def main(args):
-    simulation = TkinterSimulation(args["scenario"], args["algorithm"])
-    simulation.start()
+    if args["headless"]:
+        simulation = HeadlessSimulation(
+            args["scenario"],
+            args["algorithm"],
+            max_timesteps=args["max_timesteps"],
+            tick_budget=args["tick_budget"],
+            path_planner=args["planner"]
+        )
+        print(simulation.run())
+    else:
+        from simulator.simulation import TkinterSimulation  # requires tkinter
+        simulation = TkinterSimulation(
+            args["scenario"],
+            args["algorithm"],
+            tick_budget=args["tick_budget"],
+            path_planner=args["planner"]
+        )
+        simulation.start()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -21,4 +38,27 @@ if __name__ == "__main__":
         type=pathlib.Path,
         help="Path of the scenario file"
     )
+    parser.add_argument(
+        "-p", "--planner",
+        choices=PLANNERS,
+        default="a_star",
+        help="Name of the single-agent path planner used by the algorithm"
+    )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="Run the simulation without GUI, as fast as possible"
+    )
+    parser.add_argument(
+        "--max-timesteps",
+        type=int,
+        default=10000,
+        help="Maximum number of timesteps simulated in headless mode"
+    )
+    parser.add_argument(
+        "--tick-budget",
+        type=float,
+        default=None,
+        help="Planning time allowed per timestep, in seconds; when exceeded the algorithm falls back to cheaper plans"
+    )
     main(vars(parser.parse_args()))
@@ -1,74 +1,84 @@
-from .grid_graph import GridNode, GridEdge
-from queue import PriorityQueue
-from typing import Tuple, Set
+from .grid_graph import GridNode
+from .budget import PlanningBudget
+from .reservation_table import ReservationTable, as_reservation_table
+from heapq import heappush, heappop
+from itertools import count
+from typing import Tuple, Set, Dict, Callable, Union, Optional
 from simulator import Grid
 
 
 class AStarPlanner:
+    expansions = 0  # nodes expanded by all the searches of the process, read by the benchmarks
 
-    # TODO: change lines 25:26. Time to find node in fringe should be O(1).
     @classmethod
     def plan(
         cls,
         start_position: Tuple,
         target_position: Tuple,
         grid: Grid,
-        constraints:Set[tuple] = None,
+        constraints: Union[ReservationTable, Set[tuple]] = None,
         timestep=0,
-        get_time: bool = True
+        get_time: bool = True,
+        heuristic: Callable[[Tuple, Tuple], int] = None,
+        budget: Optional[PlanningBudget] = None
     ):
-        #print(f"A* CONSTRAINTS: {constraints}")
-        constraints_vertex_set = set()
-        constraints_edge_set = set()
-        if constraints is not None:
-            for constraint in constraints:
-                if len(constraint) == 2: # VERTEX
-                    constraints_vertex_set.add(GridNode(*constraint))
-                elif len(constraint) == 3: # EDGE
-                    constraints_edge_set.add(GridEdge(*constraint))
+        heuristic = heuristic if heuristic is not None else manhattan_distance
+        reservations = as_reservation_table(constraints)
         start = GridNode(start_position, timestep=timestep)
         target = GridNode(target_position)
         start.g = 0
-        start.h = start.manhattan(target)
+        start.h = heuristic(start_position, target_position)
         start.f = start.g + start.h
-        fringe = PriorityQueue()
+        # the fringe is a binary heap of (f, node, insertion order) entries, ordered as the nodes in the PriorityQueue
+        # of the original planner (GridNode compares by f, so nodes with the same f are left in the order of the
+        # heap), the insertion order only ranks entries of the same state. Nodes whose cost is improved are pushed
+        # again and the outdated entries are discarded when popped (lazy deletion), best_g maps each state to its
+        # best cost.
+        tie_breaker = count()
+        fringe = [(start.f, start, next(tie_breaker))]
+        best_g: Dict[Tuple, int] = {cls._state(start, get_time): start.g}
         closed = set()
-        fringe.put(start)
 
-        # print(f"ASTAR: {constraints_grid_set=}")
-        while not fringe.empty():
-            n: GridNode = fringe.get()
-            closed.add(n)
+        while fringe:
+            if budget is not None:  # the search is aborted with PlanningTimeout once the deadline has passed
+                budget.check()
+            _, n, _ = heappop(fringe)
+            state = cls._state(n, get_time)
+            if state in closed or n.g > best_g[state]:  # outdated entry
+                continue
+            closed.add(state)
+            AStarPlanner.expansions += 1
             if n.same_position(target):
                 return cls._get_path(n, get_time)
-            # neighbors = {adj for adj in n.get_valid_positions(grid) if adj not in constraints_grid_set}
-            neighbors = n.get_valid_positions(grid, get_time) - constraints_vertex_set
-            for adj_node in neighbors:
-                edge = GridEdge((n.x, n.y),(adj_node.x, adj_node.y), n.timestep)
-                if edge in constraints_edge_set:
+            # the successors (waiting included) come from the table of the grid, a node is created only for the
+            # successors that enter the fringe
+            position = (n.x, n.y)
+            adj_timestep = n.timestep + 1 if get_time else n.timestep
+            adj_g = n.g + 1
+            for adj_position in grid.successors(position):
+                if (
+                    reservations.is_vertex_reserved(adj_position, adj_timestep) or
+                    reservations.is_edge_reserved(position, adj_position, n.timestep)
+                ):
                     continue
-                cur_t = adj_node.timestep
-                if adj_node in closed:
+                adj_state = (*adj_position, adj_timestep) if get_time else adj_position
+                if adj_state in closed:
                     continue
-                if adj_node in fringe.queue:  # already visited
-                    new_cost = adj_node.g
-                    for node in fringe.queue:  # retrieve g,h info
-                        if adj_node == node:
-                            adj_node = node
-                            adj_node.timestep = cur_t
-                            break
-                    if new_cost < adj_node.g:
-                        adj_node.parent = n
-                        adj_node.g = new_cost
-                        adj_node.f = adj_node.g + adj_node.h
-
-                else:
-                    adj_node.h = adj_node.manhattan(target)
-                    adj_node.f = adj_node.g + adj_node.h
-                    adj_node.parent = n
-                    fringe.put(adj_node)
+                if adj_state in best_g and best_g[adj_state] <= adj_g:  # already in the fringe
+                    continue
+                best_g[adj_state] = adj_g
+                adj_node = GridNode(adj_position, timestep=adj_timestep)
+                adj_node.g = adj_g
+                adj_node.h = heuristic(adj_position, target_position)
+                adj_node.f = adj_node.g + adj_node.h
+                adj_node.parent = n
+                heappush(fringe, (adj_node.f, adj_node, next(tie_breaker)))
         return cls._get_path(start)
 
+    @staticmethod
+    def _state(node: GridNode, get_time: bool = True) -> Tuple:
+        return (node.x, node.y, node.timestep) if get_time else (node.x, node.y)
+
     @classmethod
     def _get_path(cls, node: GridNode, get_time: bool = True):
         path = [node.get_path_step(get_time)]
@@ -80,3 +90,4 @@ class AStarPlanner:
 
 def manhattan_distance(pos_a: tuple, pos_b: tuple) -> int:
     return abs(pos_a[0] - pos_b[0]) + abs(pos_a[1] - pos_b[1])
+
@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
-from typing import List
+from typing import List, Optional
+from .budget import PlanningBudget
 from .task import Task
 from simulator import Agent, Grid
 
@@ -11,7 +12,10 @@ class Algorithm(ABC):
     def __init__(self, agents: List[Agent], grid: Grid, tasks: List[Task]):
         ...
     @abstractmethod
-    def update(self):
+    def update(self, budget: Optional[PlanningBudget] = None):
+        """
+        Advance by one timestep, the planning done in the tick is bounded by budget (None for no limit).
+        """
         ...
 
     @abstractmethod
@@ -3,16 +3,39 @@ from .central import Central
 from .token_passing import TokenPassing
 from .token_passing_task_swap import TokenPassingTaskSwap
 from .prioritized import PrioritizedTaskPlanning
+
+ALGORITHMS = [
+    "token_passing",
+    "token_passing_task_swap",
+    "central",
+    "central_ecbs",
+    "prioritized_task_assignment",
+    "prioritized_task_assignment_online"
+]
+
+ONLINE_ALGORITHMS = [
+    "token_passing",
+    "token_passing_task_swap",
+    "central",
+    "central_ecbs",
+    "prioritized_task_assignment_online"
+]
+
+
 def get_algorithm(algorithm_name: str, *args, **kwargs) -> Algorithm:
     match algorithm_name:
         case "central":
             return Central(*args, **kwargs)
+        case "central_ecbs":
+            return Central(*args, mapf_solver="ecbs", **kwargs)
         case "token_passing":
             return TokenPassing(*args, **kwargs)
         case "token_passing_task_swap":
             return TokenPassingTaskSwap(*args, **kwargs)
         case "prioritized_task_assignment":
             return PrioritizedTaskPlanning(*args, **kwargs)
+        case "prioritized_task_assignment_online":
+            return PrioritizedTaskPlanning(*args, online=True, **kwargs)
         case _:
             raise NotImplementedError(f"The desired algorithm [{algorithm_name}] was not implemented")
 
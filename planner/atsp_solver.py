@@ -0,0 +1,340 @@
+import random
+import time
+from typing import Iterable, List, Optional, Sequence
+import numpy as np
+
+
+class ATSPSolver:
+    """
+    In-process heuristic solver of asymmetric TSP instances given as full distance matrices, an alternative to LKH
+    for small instances and for hosts where the LKH executable is not available.
+
+    The tour is built by insertion and improved by local search until no move improves it (or the time limit is
+    reached): Or-opt moves a chain of up to max_chain_length vertices elsewhere in the tour, 2-opt reverses a
+    chain (the matrix is asymmetric, so the cost of the reversed chain is computed from prefix sums of the reversed
+    edges), 3-opt exchanges two consecutive chains without reversing them and, with the makespan objective, chains
+    of the same length are swapped between two agent tours. Every move is evaluated at once for all its candidate
+    positions with NumPy. The local optimum is then perturbed to escape it (kicks): some vertices are removed and
+    inserted again, the local search is run again on the agent tours that changed, and the new tour is kept if it
+    is not worse.
+
+    With the makespan objective the first num_agents vertices are agents: the tour is the concatenation of the
+    agent tours (an agent followed by its tasks), the agents are never moved, and the cost of the longest agent tour
+    is minimized first, then the total cost. With the total objective the vertices are all alike.
+    """
+
+    def __init__(
+        self,
+        objective: str = "makespan",
+        time_limit: Optional[float] = None,
+        max_chain_length: int = 3,
+        three_opt_size: int = 200,
+        kicks: int = 50,
+        seed: int = 123
+    ):
+        """
+        Args:
+            objective (str, optional): "makespan" or "total". Default is "makespan".
+            time_limit (float, optional): seconds of local search, None for no limit. Without a limit the search is
+                bounded by the kicks and the same matrix always gives the same tour, on any host. The tour found
+                when the limit is reached depends on the speed and the load of the host, it is not reproducible.
+                Default is None.
+            max_chain_length (int, optional): longest chain moved by Or-opt. Default is 3.
+            three_opt_size (int, optional): 3-opt is applied to the agent tours (or to the tour, with the total
+                objective) of at most this many vertices, its moves are cubic in their length. Default is 200.
+            kicks (int, optional): perturbations of the local optimum (fewer if the time limit is reached). Default
+                is 50.
+            seed (int, optional): seed of the perturbations, the same seed gives the same tour. Default is 123.
+        """
+        if objective not in ("makespan", "total"):
+            raise ValueError(f"Unknown objective [{objective}]")
+        self.objective = objective
+        self.time_limit = time_limit
+        self.max_chain_length = max_chain_length
+        self.three_opt_size = three_opt_size
+        self.kicks = kicks
+        self.seed = seed
+
+    def solve(self, distance_matrix: Sequence[Sequence[int]], num_agents: int = 1) -> List[int]:
+        """
+        Args:
+            distance_matrix: (n, n) matrix of integer distances, distance_matrix[i][j] is the cost of going from
+                node i to node j.
+            num_agents (int, optional): the first num_agents nodes are the agents, used by the makespan objective.
+
+        Returns:
+            List[int]: the tour, a permutation of the nodes 0, ..., n - 1 starting from node 0.
+        """
+        distances = np.asarray(distance_matrix, dtype=np.int64)
+        if len(distances) <= 1:
+            return list(range(len(distances)))
+        num_agents = max(num_agents, 1) if self.objective == "makespan" else 1
+        deadline = time.monotonic() + self.time_limit if self.time_limit is not None else None
+        rng = random.Random(self.seed)
+        # the agents (or node 0) form the initial tour, the other nodes are inserted in order
+        tour = _Tour(distances, np.arange(num_agents), num_agents)
+        self._insert(tour, range(num_agents, len(distances)))
+        self._local_search(tour, deadline)
+        for _ in range(self.kicks if len(distances) > num_agents else 0):
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            candidate = self._kick(tour, rng)
+            self._local_search(candidate, deadline, candidate.route_costs != tour.route_costs)
+            # equal tours are accepted too, so that the search can move along the plateaus of the makespan
+            if not candidate.better(tour.makespan, tour.total):
+                tour = candidate
+        return tour.vertices.tolist()
+
+    def _local_search(self, tour: "_Tour", deadline: Optional[float], active: Optional[np.ndarray] = None) -> None:
+        """
+        Apply improving moves until there are none (or the deadline has passed).
+
+        Args:
+            active: boolean mask of the agent tours whose chains are moved, every agent tour if None. Otherwise
+                the longest agent tour is always searched, and after the first round only the agent tours changed
+                by the previous round are.
+        """
+        while deadline is None or time.monotonic() < deadline:
+            costs = tour.route_costs.copy()
+            if active is None:
+                searched = np.ones(tour.num_agents, dtype=bool)
+            else:
+                searched = active.copy()
+                searched[np.argmax(costs)] = True
+            improved = self._or_opt(tour, deadline, searched)
+            improved = self._two_opt(tour, deadline, searched) or improved
+            improved = self._three_opt(tour, deadline, searched) or improved
+            improved = self._swap(tour, deadline, searched) or improved
+            if not improved:
+                return
+            if active is not None:
+                active = tour.route_costs != costs
+
+    @staticmethod
+    def _insert(tour: "_Tour", vertices: Iterable[int]) -> None:
+        # every vertex is inserted in turn at the position giving the smallest makespan, ties broken by the
+        # smallest increase of the total cost
+        distances = tour.distances
+        for vertex in vertices:
+            after = np.concatenate((tour.vertices[1:], tour.vertices[:1]))
+            insertion = distances[tour.vertices, vertex] + distances[vertex, after] - distances[tour.vertices, after]
+            makespan = np.maximum(tour.makespan, tour.route_costs[tour.routes] + insertion)
+            k = np.lexsort((insertion, makespan))[0]
+            tour.update(np.insert(tour.vertices, k + 1, vertex))
+
+    def _kick(self, tour: "_Tour", rng: random.Random) -> "_Tour":
+        """
+        Returns:
+            _Tour: a copy of tour where some vertices (not agents) are removed and inserted again, in random order.
+                Half of the times they are the vertices of the longest agent tour and of one or two other random
+                ones, so that tasks can be exchanged among agents, otherwise they are up to a quarter (at least 4)
+                of the vertices, drawn at random.
+        """
+        is_movable = tour.vertices >= tour.num_agents
+        movable = tour.vertices[is_movable].tolist()
+        removed = []
+        if tour.num_agents > 1 and rng.random() < 0.5:
+            others = rng.sample(range(tour.num_agents), min(rng.randint(1, 2), tour.num_agents))
+            routes = [int(np.argmax(tour.route_costs))] + others
+            removed = tour.vertices[is_movable & np.isin(tour.routes, routes)].tolist()
+        if not removed:
+            removed = rng.sample(movable, rng.randint(1, min(len(movable), max(4, len(movable) // 4))))
+        rng.shuffle(removed)
+        kicked = _Tour(tour.distances, tour.vertices[~np.isin(tour.vertices, removed)], tour.num_agents)
+        self._insert(kicked, removed)
+        return kicked
+
+    def _or_opt(self, tour: "_Tour", deadline: Optional[float], searched: np.ndarray) -> bool:
+        improved = False
+        for length in range(1, self.max_chain_length + 1):
+            i = 1
+            while i + length <= tour.size:
+                if deadline is not None and time.monotonic() >= deadline:
+                    return improved
+                # the chain must not contain an agent
+                if tour.block_end[i] >= i + length - 1 and searched[tour.routes[i]] and tour.relocate_best(i, length):
+                    improved = True
+                i += 1
+        return improved
+
+    @staticmethod
+    def _two_opt(tour: "_Tour", deadline: Optional[float], searched: np.ndarray) -> bool:
+        improved = False
+        for i in range(1, tour.size - 1):
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            if tour.block_end[i] > i and searched[tour.routes[i]] and tour.reverse_best(i):
+                improved = True
+        return improved
+
+    def _three_opt(self, tour: "_Tour", deadline: Optional[float], searched: np.ndarray) -> bool:
+        improved = False
+        for i in range(tour.size - 2):
+            # the exchanged chains follow position i, in the same agent tour
+            first = i + 1
+            if tour.block_end[first] < first + 1 or tour.routes[first] != tour.routes[i]:
+                continue
+            if tour.block_end[first] - i > self.three_opt_size or not searched[tour.routes[i]]:
+                continue
+            for j in range(first, tour.block_end[first]):
+                if deadline is not None and time.monotonic() >= deadline:
+                    return improved
+                if tour.exchange_best(i, j):
+                    improved = True
+        return improved
+
+    def _swap(self, tour: "_Tour", deadline: Optional[float], searched: np.ndarray) -> bool:
+        improved = False
+        if tour.num_agents == 1:
+            return improved
+        for length in range(1, self.max_chain_length + 1):
+            for i in range(1, tour.size - length + 1):
+                if deadline is not None and time.monotonic() >= deadline:
+                    return improved
+                if tour.block_end[i] >= i + length - 1 and searched[tour.routes[i]] and tour.swap_best(i, length):
+                    improved = True
+        return improved
+
+
+class _Tour:
+    """
+    Tour of an ATSPSolver with the arrays used to evaluate the moves: the cost of the edge leaving every position,
+    its prefix sums forward and backward, the agent tour (route) of every position with its cost, and the last
+    position of the chain of movable vertices starting at every position.
+    """
+
+    def __init__(self, distances: np.ndarray, vertices: np.ndarray, num_agents: int):
+        self.distances = distances
+        self.num_agents = num_agents
+        self.update(vertices)
+
+    def update(self, vertices: np.ndarray) -> None:
+        self.vertices = np.asarray(vertices, dtype=np.int64)
+        self.size = len(self.vertices)
+        after = np.concatenate((self.vertices[1:], self.vertices[:1]))
+        self.edges = self.distances[self.vertices, after]
+        self.forward = np.concatenate(([0], np.cumsum(self.edges)))
+        self.backward = np.concatenate(([0], np.cumsum(self.distances[after, self.vertices])))
+        self.total = int(self.edges.sum())
+        fixed = self.vertices < self.num_agents
+        self.routes = np.cumsum(fixed) - 1
+        self.route_costs = np.bincount(self.routes, weights=self.edges, minlength=self.num_agents).astype(np.int64)
+        self.makespan = int(self.route_costs.max())
+        fixed_positions = np.append(np.flatnonzero(fixed), self.size)
+        positions = np.arange(self.size)
+        self.block_end = np.where(
+            fixed, positions - 1, fixed_positions[np.searchsorted(fixed_positions, positions, side="right")] - 1
+        )
+        # the three longest agent tours, to get the longest one not changed by a move
+        self.top_routes = np.argsort(-self.route_costs, kind="stable")[:3].tolist()
+        self.top_costs = self.route_costs[self.top_routes].tolist()
+
+    def better(self, makespan: int, total: int) -> bool:
+        return (makespan, total) < (self.makespan, self.total)
+
+    def longest_other(self, route1: int, route2: np.ndarray) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: the cost of the longest agent tour other than route1 and route2 (element-wise).
+        """
+        others = [(route, cost) for route, cost in zip(self.top_routes, self.top_costs) if route != route1]
+        others += [(-1, 0)] * 2
+        return np.where(route2 != others[0][0], others[0][1], others[1][1])
+
+    def relocate_best(self, i: int, length: int) -> bool:
+        """
+        Or-opt: move the chain of positions i, ..., i + length - 1 after the position giving the best objective.
+        """
+        d, v = self.distances, self.vertices
+        last = i + length - 1
+        before, first_vertex, last_vertex, after = v[i - 1], v[i], v[last], v[(last + 1) % self.size]
+        removal = d[before, after] - d[before, first_vertex] - d[last_vertex, after]
+        chain = self.forward[last] - self.forward[i]
+        k = np.concatenate((np.arange(0, i - 1), np.arange(last + 1, self.size)))
+        if not len(k):
+            return False
+        a, b = v[k], v[(k + 1) % self.size]
+        insertion = d[a, first_vertex] + d[last_vertex, b] - d[a, b]
+        route, target = self.routes[i], self.routes[k]
+        same = target == route
+        source_cost = np.where(same, self.route_costs[route] + removal + insertion,
+                               self.route_costs[route] + removal - chain)
+        target_cost = np.where(same, source_cost, self.route_costs[target] + insertion + chain)
+        makespan = np.maximum(self.longest_other(route, target), np.maximum(source_cost, target_cost))
+        total = self.total + removal + insertion
+        best = np.lexsort((total, makespan))[0]
+        if not self.better(int(makespan[best]), int(total[best])):
+            return False
+        position = k[best]
+        chain_vertices = v[i:last + 1]
+        rest = np.concatenate((v[:i], v[last + 1:]))
+        insert_at = position + 1 if position < i else position + 1 - length
+        self.update(np.concatenate((rest[:insert_at], chain_vertices, rest[insert_at:])))
+        return True
+
+    def reverse_best(self, i: int) -> bool:
+        """
+        2-opt: reverse the chain of positions i, ..., j for the best j in the chain of movable vertices of i.
+        """
+        d, v = self.distances, self.vertices
+        j = np.arange(i + 1, self.block_end[i] + 1)
+        before, first_vertex, last_vertex, after = v[i - 1], v[i], v[j], v[(j + 1) % self.size]
+        delta = (
+            d[before, last_vertex] + d[first_vertex, after] - d[before, first_vertex] - d[last_vertex, after] +
+            (self.backward[j] - self.backward[i]) - (self.forward[j] - self.forward[i])
+        )
+        best = int(np.argmin(delta))
+        if delta[best] >= 0:  # the agent tour gets shorter, so the makespan does not grow
+            return False
+        end = j[best]
+        self.update(np.concatenate((v[:i], v[i:end + 1][::-1], v[end + 1:])))
+        return True
+
+    def exchange_best(self, i: int, j: int) -> bool:
+        """
+        3-opt: exchange the chains of positions i + 1, ..., j and j + 1, ..., k for the best k in the chain of
+        movable vertices of i + 1.
+        """
+        d, v = self.distances, self.vertices
+        k = np.arange(j + 1, self.block_end[i + 1] + 1)
+        a, b, c, e = v[i], v[i + 1], v[j], v[j + 1]
+        f, g = v[k], v[(k + 1) % self.size]
+        delta = d[a, e] + d[f, b] + d[c, g] - self.edges[i] - self.edges[j] - self.edges[k]
+        best = int(np.argmin(delta))
+        if delta[best] >= 0:
+            return False
+        end = k[best]
+        self.update(np.concatenate((v[:i + 1], v[j + 1:end + 1], v[i + 1:j + 1], v[end + 1:])))
+        return True
+
+    def swap_best(self, i: int, length: int) -> bool:
+        """
+        Swap the chain of positions i, ..., i + length - 1 with the chain of the same length, in another agent tour,
+        giving the best objective.
+        """
+        d, v = self.distances, self.vertices
+        last = i + length - 1
+        j = np.arange(1, self.size - length + 1)
+        j = j[(self.block_end[j] >= j + length - 1) & (self.routes[j] != self.routes[i])]
+        if not len(j):
+            return False
+        before1, first1, last1, after1 = v[i - 1], v[i], v[last], v[(last + 1) % self.size]
+        before2, first2, last2, after2 = v[j - 1], v[j], v[j + length - 1], v[(j + length) % self.size]
+        chain1 = self.forward[last] - self.forward[i]
+        chain2 = self.forward[j + length - 1] - self.forward[j]
+        delta1 = d[before1, first2] + chain2 + d[last2, after1] - d[before1, first1] - chain1 - d[last1, after1]
+        delta2 = d[before2, first1] + chain1 + d[last1, after2] - d[before2, first2] - chain2 - d[last2, after2]
+        route1, route2 = self.routes[i], self.routes[j]
+        makespan = np.maximum(
+            self.longest_other(route1, route2),
+            np.maximum(self.route_costs[route1] + delta1, self.route_costs[route2] + delta2)
+        )
+        total = self.total + delta1 + delta2
+        best = np.lexsort((total, makespan))[0]
+        if not self.better(int(makespan[best]), int(total[best])):
+            return False
+        other = j[best]
+        vertices = v.copy()
+        vertices[i:last + 1], vertices[other:other + length] = v[other:other + length], v[i:last + 1]
+        self.update(vertices)
+        return True
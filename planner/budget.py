@@ -0,0 +1,70 @@
+import time
+from dataclasses import dataclass
+from math import inf
+from typing import List, Optional
+
+
+class PlanningTimeout(Exception):
+    """
+    Raised by a search that runs past the deadline of its PlanningBudget.
+    """
+
+
+@dataclass
+class FallbackEvent:
+    timestep: int
+    source: str
+    fallback: str
+    elapsed: float
+
+
+class PlanningBudget:
+    """
+    Wall-clock time budget of a tick of the simulation, measured on the monotonic clock.
+
+    The simulation starts the budget at the beginning of every tick and passes it to Algorithm.update, the searches
+    check the deadline and either stop early keeping the best result found so far or raise PlanningTimeout, in
+    which case the algorithm falls back to a cheaper plan. Every fallback is recorded in fallbacks.
+    A budget without seconds never expires.
+    """
+
+    def __init__(self, seconds: Optional[float] = None):
+        """
+        Args:
+            seconds (float, optional): planning time allowed per tick, None for no limit. Default is None.
+        """
+        self.seconds = seconds
+        self.start_time = time.monotonic()
+        self.deadline = inf
+        self.fallbacks: List[FallbackEvent] = []
+
+    def start(self) -> None:
+        """
+        Start the budget of a new tick.
+        """
+        self.start_time = time.monotonic()
+        self.deadline = self.start_time + self.seconds if self.seconds is not None else inf
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.start_time
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.deadline != inf and time.monotonic() >= self.deadline
+
+    def check(self) -> None:
+        """
+        Raises PlanningTimeout if the deadline has passed.
+        """
+        if self.expired():
+            raise PlanningTimeout(f"planning budget of {self.seconds}s exceeded")
+
+    def report_fallback(self, timestep: int, source: str, fallback: str) -> None:
+        """
+        Record that source fell back to a cheaper plan at timestep, because the budget expired.
+        """
+        event = FallbackEvent(timestep=timestep, source=source, fallback=fallback, elapsed=self.elapsed())
+        self.fallbacks.append(event)
+        print(f"PLANNING BUDGET EXCEEDED at timestep {timestep}: {source} -> {fallback} ({event.elapsed:.3f}s)")
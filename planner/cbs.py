@@ -1,43 +1,17 @@
-from copy import deepcopy
-from dataclasses import dataclass
-from enum import Enum, auto
-from typing import Tuple, List, Dict, Set, Optional
-from itertools import combinations
+from dataclasses import dataclass, field
+from heapq import heappush, heappop
+from typing import Tuple, List, Dict, Set, Optional, Callable, FrozenSet
+from itertools import count
 from simulator import Grid
 from .a_star_planner import AStarPlanner
+from .budget import PlanningBudget
+from .reservation_table import ReservationTable
+from .conflict_detection import Conflict, ConflictType, ConflictDetector, find_first_conflict
+from .mdd import Cardinality, MDDCache, classify_conflict
+from .planning_pool import get_planning_pool
 from .timing import timeit
 
 
-class ConflictType(Enum):
-    VERTEX = auto()
-    EDGE = auto()
-
-
-@dataclass
-class Conflict:
-    type: ConflictType
-    timestep: int
-    agent1: int
-    agent2: int
-    position1: tuple
-    position2: tuple | None = None
-
-    def agents(self):
-        return self.agent1, self.agent2
-
-    def __str__(self):
-        return (
-            "CONFLICT:("
-            f"{self.type=} "
-            f"{self.agent1=} "
-            f"{self.agent2=} "
-            f"{self.position1=} "
-            f"{self.position2=} "
-            f"{self.timestep=} "
-            ")"
-        )
-
-
 class CBS:
 
     @classmethod
@@ -47,104 +21,107 @@ class CBS:
         agents_tasks: Dict[int, Tuple[Tuple, Tuple]],
         grid: Grid,
         timestep: int = 0,
-        spatio_temporal_obstacles: Optional[Set[Tuple[Tuple, int]]] = None
+        spatio_temporal_obstacles: Optional[Set[Tuple[Tuple, int]]] = None,
+        heuristic: Optional[Callable[[Tuple, Tuple], int]] = None,
+        planner=AStarPlanner,
+        workers: int = 0,
+        budget: Optional[PlanningBudget] = None
     ) -> Dict[int, List[Tuple]]:
-        open_set = set()
-        closed_set = set()
-
-        root = CTNode()
-        root.constraints = {
-            agent_key:
-                spatio_temporal_obstacles
-                if spatio_temporal_obstacles
-                else set()
-            for agent_key in agents_tasks
-        }
-        root.solution = {
-            agent_key: AStarPlanner.plan(
+        """
+        workers: if greater than 1, the agents of the root and the two children of every node are planned in
+            parallel by a persistent pool of `workers` processes, the result is the same of the serial search.
+        budget: the deadline is checked before expanding a node and by the serial low-level searches, the search
+            raises PlanningTimeout once it has passed.
+        """
+        # the obstacles are shared by every agent, the constraints of each agent are layered on top of them
+        obstacles = ReservationTable.from_constraints(spatio_temporal_obstacles if spatio_temporal_obstacles else ())
+        pool = get_planning_pool(grid, workers, heuristic) if workers > 1 else None
+        search = pool.new_search(spatio_temporal_obstacles) if pool else None
+
+        def plan(agent_key: int, constraints: FrozenSet[Tuple]) -> List[Tuple]:
+            start_position, target_position = agents_tasks[agent_key]
+            return planner.plan(
                 start_position=start_position,
                 target_position=target_position,
                 grid=grid,
-                constraints=root.constraints[agent_key],
-                timestep=timestep
-            ) for agent_key, (start_position, target_position) in agents_tasks.items()
-        }
+                constraints=ReservationTable.from_constraints(constraints, base=obstacles),
+                timestep=timestep,
+                heuristic=heuristic,
+                budget=budget
+            )
+
+        def plan_all(requests: List[Tuple[int, FrozenSet[Tuple]]]) -> List[List[Tuple]]:
+            if pool is None:
+                return [plan(agent_key, constraints) for agent_key, constraints in requests]
+            return pool.plan_all(
+                planner,
+                [(*agents_tasks[agent_key], constraints) for agent_key, constraints in requests],
+                search,
+                timestep
+            )
+
+        mdds = MDDCache(agents_tasks, grid, timestep, obstacles, heuristic)
+        root = CTNode(
+            constraints={agent_key: frozenset() for agent_key in agents_tasks},
+            solution=dict(zip(agents_tasks, plan_all([(agent_key, frozenset()) for agent_key in agents_tasks])))
+        )
         root.compute_solution_cost()
-        open_set |= {root}
-        while open_set:
-            p: CTNode = min(open_set, key=lambda node: node.cost)
-            open_set -= {p}
-            # pprint(open_set)
-            closed_set |= {p}
-            conflict = cls.get_first_conflict(p.solution)
-            # print(conflict)
+        # an agent leaves its target to start the next task, so it is not padded after the end of its path
+        root.conflicts = ConflictDetector(root.solution, wait_at_goal=False)
+        # the open list is a binary heap of (cost, insertion order, node) entries, the insertion order breaks ties
+        tie_breaker = count()
+        open_list = [(root.cost, next(tie_breaker), root)]
+        generated = {root}
+        while open_list:
+            if budget is not None:
+                budget.check()
+            *_, p = heappop(open_list)
+            conflict = cls.choose_conflict(p, mdds)
             if not conflict:
                 return p.solution
             constraints = dict()
             if conflict.type == ConflictType.EDGE:
-                constraints[conflict.agent1] = {(conflict.position1, conflict.position2, conflict.timestep)}
-                constraints[conflict.agent2] = {(conflict.position2, conflict.position1, conflict.timestep)}
+                constraints[conflict.agent1] = (conflict.position1, conflict.position2, conflict.timestep)
+                constraints[conflict.agent2] = (conflict.position2, conflict.position1, conflict.timestep)
             else:
-                constraints[conflict.agent1] = {(conflict.position1, conflict.timestep)}
-                constraints[conflict.agent2] = {(conflict.position1, conflict.timestep)}
-            for agent in [conflict.agent1, conflict.agent2]:
-                node_a = deepcopy(p)
-                node_a.constraints[agent] |= constraints[agent]
-                # print(f"{agent} : {node_a.constraints[agent]}")
-                start_position, target_position = agents_tasks[agent]
-                node_a.solution[agent] = AStarPlanner.plan(
-                    start_position=start_position,
-                    target_position=target_position,
-                    grid=grid,
-                    constraints=node_a.constraints[agent],
-                    timestep=timestep
-                )
-                # print(node_a.solution[agent])
-                # print(p.solution[agent])
-                # print(node_a.solution[agent] == p.solution[agent])
-                if node_a.solution:
-                    node_a.compute_solution_cost()
-                    if node_a not in closed_set:
-                        open_set |= {node_a}
-                    # else:
-                    # print(f"NODEA for agent {agent} in closed_set")
+                constraints[conflict.agent1] = (conflict.position1, conflict.timestep)
+                constraints[conflict.agent2] = (conflict.position1, conflict.timestep)
+            requests = [(agent, p.constraints[agent] | {constraints[agent]}) for agent in conflict.agents()]
+            for (agent, agent_constraints), agent_path in zip(requests, plan_all(requests)):
+                node_a = p.child(agent, agent_constraints, agent_path)
+                if node_a not in generated:
+                    generated.add(node_a)
+                    heappush(open_list, (node_a.cost, next(tie_breaker), node_a))
         print("CBS: NO SOLUTION FOUND")
         return {}
 
+    @staticmethod
+    def choose_conflict(node: "CTNode", mdds: MDDCache) -> Conflict | None:
+        """
+        Improved CBS conflict selection: cardinal conflicts are resolved first, then semi-cardinal and then
+        non-cardinal ones, the earliest conflict is chosen within the same class. The MDDs of the agents are
+        built only for the agents involved in a conflict, and shared by the nodes with the same constraints.
+
+        Returns:
+            Conflict | None: the conflict to branch on, None if the solution of node has no conflicts.
+        """
+        if node.conflicts.first_conflict() is None:
+            return None
+        chosen, chosen_cardinality = None, None
+        for conflict in node.conflicts.conflicts():
+            mdd1, mdd2 = (
+                mdds.get(agent, node.constraints[agent], node.solution[agent]) for agent in conflict.agents()
+            )
+            cardinality = classify_conflict(conflict, mdd1, mdd2)
+            if cardinality == Cardinality.CARDINAL:
+                return conflict
+            if chosen is None or cardinality > chosen_cardinality:
+                chosen, chosen_cardinality = conflict, cardinality
+        return chosen
+
     @staticmethod
     def get_first_conflict(solution: Dict[int, List]) -> Conflict | None:
-        # max_len = max(len(solution[a]) for a in solution)
-        # padded_sol = {
-        #    key: [value[0]] * (max_len - len(value)) + value.copy()
-        #    for key, value in solution.items()
-        # }
-        for (agent1, path1), (agent2, path2) in combinations(solution.items(), 2):
-            min_len = min(len(path1), len(path2))
-            for i in range(min_len - 1, -1, -1):
-                if path1[i] == path2[i]:
-                    position, timestep = path1[i]
-                    return Conflict(
-                        type=ConflictType.VERTEX,
-                        agent1=agent1,
-                        agent2=agent2,
-                        position1=position,
-                        timestep=timestep
-                    )
-            for i in range(min_len - 1, 0, -1):
-                (pos11, timestep), (pos12, _), (pos21, _), (pos22, _) = path1[i], path1[i - 1], path2[i], path2[i - 1]
-                edge1 = (pos11, pos12)
-                edge2 = (pos21, pos22)
-                edge2inv = (pos22, pos21)
-                if edge1 == edge2 or edge1 == edge2inv:
-                    return Conflict(
-                        type=ConflictType.EDGE,
-                        agent1=agent1,
-                        agent2=agent2,
-                        position1=pos11,
-                        position2=pos12,
-                        timestep=timestep
-                    )
-        return None  # No conflicts found
+        return find_first_conflict(solution, wait_at_goal=False)
 
     #@classmethod
     #def compute_solutions_and_cost(
@@ -162,24 +139,42 @@ class CBS:
         return sum([len(solution[agent]) for agent in solution])
 
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class CTNode:
-    constraints: Optional[Dict[int, Set[Tuple[Tuple, int]]]] = None
-    solution: Optional[Dict[int, List[Tuple]]] = None
+    """
+    Node of the constraint tree. Children share with their parent the constraints and the paths of every agent
+    except the replanned one, so they are never deep-copied. The constraints of an agent are stored as a frozenset,
+    and the node is identified by the canonical key {(agent, constraint), ...}: the solution is a function of the
+    constraints, so it does not need to be compared (the hash of the frozen key is computed once and cached by the
+    frozenset). The conflicts of a child are computed incrementally from the ones of its parent, checking only the
+    pairs involving the replanned agent.
+    """
+    constraints: Dict[int, FrozenSet[Tuple]]
+    solution: Dict[int, List[Tuple]]
     cost: int = 0
+    key: FrozenSet[Tuple[int, Tuple]] = frozenset()
+    conflicts: Optional[ConflictDetector] = field(default=None, repr=False)
+
+    def child(self, agent: int, agent_constraints: FrozenSet[Tuple], agent_path: List[Tuple]) -> "CTNode":
+        constraints = dict(self.constraints)
+        constraints[agent] = agent_constraints
+        solution = dict(self.solution)
+        solution[agent] = agent_path
+        conflicts = self.conflicts.copy()
+        conflicts.update(agent, agent_path)
+        return CTNode(
+            constraints=constraints,
+            solution=solution,
+            cost=self.cost - len(self.solution[agent]) + len(agent_path),
+            key=self.key | {(agent, constraint) for constraint in agent_constraints - self.constraints[agent]},
+            conflicts=conflicts
+        )
 
     def __eq__(self, other):
-        return (
-                isinstance(other, CTNode) and
-                self.constraints == other.constraints and
-                self.solution == other.solution
-        )
+        return isinstance(other, CTNode) and self.key == other.key
 
     def __hash__(self):
-        return hash(
-            str(self.constraints) +
-            str(self.solution)
-        )
+        return hash(self.key)
 
     def compute_solution_cost(self):
         self.cost = sum([len(self.solution[agent]) for agent in self.solution])
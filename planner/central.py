@@ -1,10 +1,16 @@
 from .task import Task
 from simulator import Agent
 from enum import Enum, auto
-from typing import List, Dict, Any, Tuple, Union
+from typing import List, Dict, Tuple, Union, Optional, Set
 from simulator import Grid
-from .a_star_planner import manhattan_distance
+from .budget import PlanningBudget, PlanningTimeout
+from .distance_oracle import DistanceOracle
 from .cbs import CBS
+from .ecbs import ECBS
+from .planner_utils import get_planner
+from .path_cache import PathCache
+from .reservation_table import ReservationTable
+from .task_ledger import TaskLedger
 import numpy as np
 from scipy.optimize import linear_sum_assignment
 from .algorithm import Algorithm
@@ -46,102 +52,123 @@ class CAgent:
 
 
 class Central(Algorithm):
-    def __init__(self, agents: List[Agent], grid: Grid, tasks: List[Task]):
+    def __init__(
+        self,
+        agents: List[Agent],
+        grid: Grid,
+        tasks: List[Task],
+        path_planner: str = "a_star",
+        mapf_solver: str = "cbs",
+        suboptimality: float = 1.5,
+        workers: int = 0
+    ):
+        """
+        mapf_solver: "cbs" for optimal plans, "ecbs" for plans at most suboptimality times longer than the optimal
+            ones, found much faster. The low level of ECBS is always a focal A*, path_planner is used by CBS only.
+        workers: number of processes CBS plans with, the search is serial if it is not greater than 1.
+        """
+        if mapf_solver not in ("cbs", "ecbs"):
+            raise NotImplementedError(f"The desired MAPF solver [{mapf_solver}] was not implemented")
         self.c_agents: Dict[int, CAgent] = {ag: CAgent(agent) for ag, agent in enumerate(agents)}
         self.parking_locations = [agent.starting_position for agent in agents]
         self.grid = grid
+        self.path_planner = PathCache(get_planner(path_planner))
+        self.distance_oracle = DistanceOracle(grid)
+        self.mapf_solver = mapf_solver
+        self.suboptimality = suboptimality
+        self.workers = workers
         self.timestep = 0
-        self.tasks: List[Task] = tasks
-        self.executed_tasks = []
-        self.task_assignment_dict = {}
+        self.makespan = -1
+        self.ledger = TaskLedger(tasks)
+        self.delivering: Dict[int, Task] = {}  # agent -> picked task
         self.location_assignments = {ak: self.c_agents[ak].position for ak in self.c_agents}
         self.current_paths: Dict[int, List[Tuple[Tuple, int]]] = {ak: [] for ak in self.c_agents}
 
     def assign_task_to_agent(self, agent_key, task, target):
-        self.task_assignment_dict[task] = agent_key
+        self.ledger.pick(task, agent_key)
+        self.delivering[agent_key] = task
         self.location_assignments[agent_key] = task.g
-        self.executed_tasks.append(task)
         self.c_agents[agent_key].target = target
 
+    def deliver_task(self, agent_key):
+        task = self.delivering.get(agent_key)
+        if task is not None and self.c_agents[agent_key].position == task.g:
+            self.ledger.deliver(task)
+            del self.delivering[agent_key]
+
     def distance_from_agent(self, agent_key):
-        return lambda p: manhattan_distance(self.c_agents[agent_key].position, p)
+        return lambda p: self.distance_oracle(self.c_agents[agent_key].position, p)
 
     @staticmethod
-    def build_cost_matrix(free_agents: List[int], endpoints: List[Dict[str, Any]]):
-        C = max([max(e["costs"]) for e in endpoints]) + 1
-        cost_matrix = np.zeros((len(free_agents), len(endpoints)))
-        for i, agent_k in enumerate(free_agents):
-            for j, endpoint in enumerate(endpoints):
-                if endpoint["type"] == TargetPosition.PICKUP:
-                    cost_matrix[i][j] = len(free_agents) * C * endpoint["costs"][i]
-                else:
-                    cost_matrix[i][j] = len(free_agents) * C ** 2 * endpoint["costs"][i]
-
-        return cost_matrix
+    def build_cost_matrix(costs: np.ndarray, is_pickup: np.ndarray) -> np.ndarray:
+        """
+        Args:
+            costs (np.ndarray): (agents, endpoints) array of the distances from the agents to the endpoints.
+            is_pickup (np.ndarray): boolean array, True for the endpoints that are pickups.
+
+        Returns:
+            np.ndarray: the cost matrix of the assignment, moving to a pickup is cheaper than parking.
+        """
+        costs = costs.astype(np.float64)
+        C = costs.max() + 1
+        scale = np.where(is_pickup, C, C ** 2) * len(costs)
+        return costs * scale[None, :]
 
     def assign_endpoints(self, free_agents: List[int]):
+        # the pickups of the open tasks are endpoints, unless the pickup or the goal of the task is the goal of a
+        # picked task or of a task chosen before it
         tasks = []
-        unexecuted_tasks = [t for t in self.tasks if t not in self.executed_tasks]
-        for task in unexecuted_tasks:
-            tasks_to_check = self.executed_tasks + tasks
-            for ex_task in tasks_to_check:
-                if task.s == ex_task.g or task.g == ex_task.g:
-                    break
-            else:
-                tasks.append(task)
-        endpoints = [
-            {
-                "type": TargetPosition.PICKUP,
-                "position": task.s,
-                "costs": [manhattan_distance(self.c_agents[ak].position, task.s) for ak in free_agents]
-            } for task in tasks
-        ]
+        goals = set()
+        for task in self.ledger.open_tasks():
+            if (
+                self.ledger.is_goal_in_use(task.s) or self.ledger.is_goal_in_use(task.g) or
+                task.s in goals or task.g in goals
+            ):
+                continue
+            tasks.append(task)
+            goals.add(task.g)
+        endpoints = [{"type": TargetPosition.PICKUP, "position": task.s, "task": task} for task in tasks]
         num_free_agents = len(free_agents)
         if len(endpoints) < num_free_agents:
             parking_locations_copy = self.parking_locations.copy()
             for agent in free_agents:
                 p_loc = min(parking_locations_copy, key=self.distance_from_agent(agent))
                 parking_locations_copy.remove(p_loc)
-                endpoints.append({
-                    "type": TargetPosition.PARK,
-                    "position": p_loc,
-                    "costs": [manhattan_distance(self.c_agents[ak].position, p_loc) for ak in free_agents]
-                })
-        cost_matrix = self.build_cost_matrix(free_agents, endpoints)
+                endpoints.append({"type": TargetPosition.PARK, "position": p_loc})
+        agent_positions = np.array([self.c_agents[ak].position for ak in free_agents])
+        costs = np.stack(
+            [self.distance_oracle.distances(agent_positions, endpoint["position"]) for endpoint in endpoints],
+            axis=1
+        )
+        is_pickup = np.array([endpoint["type"] == TargetPosition.PICKUP for endpoint in endpoints])
+        cost_matrix = self.build_cost_matrix(costs, is_pickup)
         cols, rows = linear_sum_assignment(cost_matrix)
         return {
-            free_agents[i]: {
-                "type": endpoints[j]["type"],
-                "position": endpoints[j]["position"]
-            } for i, j in zip(cols, rows)
+            free_agents[i]: endpoints[j] for i, j in zip(cols, rows)
         }
 
-    def update(self):
-        # consider all the agents that rests in a pickup position of un-executed task
-        unexecuted_tasks = [t for t in self.tasks if t not in self.executed_tasks]
+    def update(self, budget: Optional[PlanningBudget] = None):
+        # consider all the agents that rests in a pickup position of an open task
         free_agents = [ag for ag in self.c_agents if self.c_agents[ag].status == Status.FREE]
         resting_agents = [ag for ag in self.c_agents if self.c_agents[ag].status == Status.RESTING]
         # endpoints = {agent_k: {"type": TargetPosition.PARK, "position":self.c_agents[agent_k].position} for agent_k in self.c_agents}
         endpoints = dict()
         for agent_k in resting_agents:
             cur_agent: CAgent = self.c_agents[agent_k]
-            for t in unexecuted_tasks:
-                if (
-                        cur_agent.position == t.s and
-                        self.task_assignment_dict[t] is None and
-                        not any([self.location_assignments[a] == t.g for a in self.c_agents])
-                ):
+            for t in self.ledger.open_at(cur_agent.position):
+                if t.g not in self.location_assignments.values():
                     self.assign_task_to_agent(agent_k, t, TargetPosition.DELIVERY)
                     endpoints[agent_k] = {"type": TargetPosition.DELIVERY, "position": t.g}
                     break
         if len(free_agents) > 0:
             endpoints.update(self.assign_endpoints(free_agents))
         if endpoints:
-            self.assign_paths_to_agents(endpoints)
+            self.assign_paths_to_agents(endpoints, budget)
         for agent_key in self.c_agents:
             self.c_agents[agent_key].update()
             match self.c_agents[agent_key].status:
                 case Status.FREE:
+                    self.deliver_task(agent_key)
                     self.current_paths[agent_key] = []
                     self.location_assignments[agent_key] = self.c_agents[agent_key].position
                 case Status.RESTING:
@@ -149,10 +176,23 @@ class Central(Algorithm):
                     self.location_assignments[agent_key] = self.c_agents[agent_key].position
                 case Status.BUSY:
                     pass
-
+        if self.makespan == -1:
+            if (
+                not self.ledger.has_open_tasks() and
+                all([agent.status != Status.BUSY for agent in self.c_agents.values()])
+            ):
+                self.makespan = self.timestep
+                print("CURRENT MAKESPAN", self.makespan)
         self.timestep += 1
 
-    def assign_paths_to_agents(self, endpoints: Dict[int, Dict[str, Union[TargetPosition, Tuple]]]):
+    def assign_paths_to_agents(
+        self,
+        endpoints: Dict[int, Dict[str, Union[TargetPosition, Tuple]]],
+        budget: Optional[PlanningBudget] = None
+    ):
+        """
+        budget: if the MAPF solver runs past its deadline, the agents are planned by prioritized planning instead.
+        """
         agents_tasks = {
             ak: (
                 self.c_agents[ak].position,
@@ -161,16 +201,67 @@ class Central(Algorithm):
             if endpoints[ak]
         }
         spatio_temporal_obstacles = {st_pos for path in self.current_paths.values() for st_pos in path}
-        solutions = CBS.high_level_search(agents_tasks, self.grid, self.timestep, spatio_temporal_obstacles)
+        try:
+            if self.mapf_solver == "ecbs":
+                solutions = ECBS.high_level_search(
+                    agents_tasks,
+                    self.grid,
+                    self.timestep,
+                    spatio_temporal_obstacles,
+                    heuristic=self.distance_oracle,
+                    w=self.suboptimality,
+                    budget=budget
+                )
+            else:
+                solutions = CBS.high_level_search(
+                    agents_tasks,
+                    self.grid,
+                    self.timestep,
+                    spatio_temporal_obstacles,
+                    heuristic=self.distance_oracle,
+                    planner=self.path_planner,
+                    workers=self.workers,
+                    budget=budget
+                )
+        except PlanningTimeout:
+            budget.report_fallback(self.timestep, f"Central ({self.mapf_solver})", "prioritized planning")
+            solutions = self.prioritized_paths(agents_tasks, spatio_temporal_obstacles)
         for agent_key, path in solutions.items():
             self.assign_path_to_agent(agent_key, path, endpoints)
 
+    def prioritized_paths(
+        self,
+        agents_tasks: Dict[int, Tuple[Tuple, Tuple]],
+        spatio_temporal_obstacles: Set[Tuple[Tuple, int]]
+    ) -> Dict[int, List[Tuple]]:
+        """
+        Plan the agents one at a time, the farthest from its target first, every agent avoids the obstacles and the
+        paths of the agents planned before it. Fast but not complete, used when the MAPF solver runs out of time.
+        """
+        reservations = ReservationTable.from_constraints(spatio_temporal_obstacles)
+        solutions = {}
+        for agent_key in sorted(agents_tasks, key=lambda ak: -self.distance_oracle(*agents_tasks[ak])):
+            start_position, target_position = agents_tasks[agent_key]
+            solutions[agent_key] = self.path_planner.plan(
+                start_position=start_position,
+                target_position=target_position,
+                grid=self.grid,
+                constraints=reservations,
+                timestep=self.timestep,
+                heuristic=self.distance_oracle
+            )
+            reservations.add_path(agent_key, solutions[agent_key])
+        return solutions
+
     def assign_path_to_agent(self, agent_key, path, endpoints):
         self.current_paths[agent_key] = path
         self.location_assignments[agent_key] = endpoints[agent_key]["position"]
         self.c_agents[agent_key].target = endpoints[agent_key]["type"]
         self.c_agents[agent_key].assign_path(path)
+        if endpoints[agent_key]["type"] == TargetPosition.PICKUP:
+            self.ledger.assign(endpoints[agent_key]["task"], agent_key)
 
     def add_tasks(self, task_list: List[Task]):
-        self.tasks += task_list
-        self.task_assignment_dict.update({t: None for t in task_list})
+        if task_list:
+            self.makespan = -1
+        self.ledger.extend(task_list)
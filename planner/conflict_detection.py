@@ -0,0 +1,232 @@
+from dataclasses import dataclass
+from enum import Enum, auto
+from typing import Dict, Hashable, List, Optional, Tuple
+import numpy as np
+
+
+class ConflictType(Enum):
+    VERTEX = auto()
+    EDGE = auto()
+
+
+@dataclass
+class Conflict:
+    type: ConflictType
+    timestep: int
+    agent1: int
+    agent2: int
+    position1: tuple
+    position2: tuple | None = None
+
+    def agents(self):
+        return self.agent1, self.agent2
+
+    def __str__(self):
+        return (
+            "CONFLICT:("
+            f"{self.type=} "
+            f"{self.agent1=} "
+            f"{self.agent2=} "
+            f"{self.position1=} "
+            f"{self.position2=} "
+            f"{self.timestep=} "
+            ")"
+        )
+
+
+class ConflictDetector:
+    """
+    Vectorized vertex and edge conflict detection for a solution {agent: path}, where every path is in the reversed
+    [(position, timestep), ...] format.
+
+    The paths are packed in a (agents, timesteps) array of cell codes over the time window spanned by the solution.
+    Before the start of its path an agent is absent and can not conflict, after the end of its path it waits at
+    its goal if wait_at_goal is True, otherwise it is absent as well. The earliest vertex and edge conflict of every
+    pair of agents are kept in two (agents, agents) arrays, so that when the path of a single agent changes only the
+    pairs involving that agent are checked again.
+    """
+    NO_CONFLICT = np.iinfo(np.int64).max // 4
+
+    def __init__(self, solution: Dict[Hashable, List[Tuple]], wait_at_goal: bool = True):
+        self.wait_at_goal = wait_at_goal
+        self.agents: List[Hashable] = list(solution)
+        self.index: Dict[Hashable, int] = {agent: i for i, agent in enumerate(self.agents)}
+        self.width = 1 + max((pos[0] for path in solution.values() for pos, _ in path), default=0)
+        self.start_timestep = min((path[-1][1] for path in solution.values() if path), default=0)
+        horizon = max((path[0][1] for path in solution.values() if path), default=self.start_timestep)
+        self.cells = np.empty((len(self.agents), horizon - self.start_timestep + 1), dtype=np.int64)
+        for agent, path in solution.items():
+            self.cells[self.index[agent]] = self._pack(self.index[agent], path, self.cells.shape[1])
+        self.first_vertex, self.first_edge = self._pairwise_first_conflicts()
+
+    def copy(self) -> "ConflictDetector":
+        other = object.__new__(ConflictDetector)
+        other.wait_at_goal = self.wait_at_goal
+        other.agents = self.agents
+        other.index = self.index
+        other.width = self.width
+        other.start_timestep = self.start_timestep
+        other.cells = self.cells.copy()
+        other.first_vertex = self.first_vertex.copy()
+        other.first_edge = self.first_edge.copy()
+        return other
+
+    def update(self, agent: Hashable, path: List[Tuple]) -> None:
+        """
+        Replace the path of agent, only the pairs involving agent are checked again.
+        """
+        if path and (path[-1][1] < self.start_timestep or max(pos[0] for pos, _ in path) >= self.width):
+            # the path does not fit in the packed window, every path is packed again
+            solution = self.solution()
+            solution[agent] = path
+            self.__init__(solution, self.wait_at_goal)
+            return
+        i = self.index[agent]
+        if path and path[0][1] - self.start_timestep >= self.cells.shape[1]:
+            # extend the window, the other agents keep their last state (waiting at their goal or absent)
+            extension = path[0][1] - self.start_timestep + 1 - self.cells.shape[1]
+            if self.wait_at_goal:
+                self.cells = np.pad(self.cells, ((0, 0), (0, extension)), mode="edge")
+            else:
+                absent = -1 - np.arange(len(self.agents), dtype=np.int64)
+                self.cells = np.hstack((self.cells, np.repeat(absent[:, None], extension, axis=1)))
+        self.cells[i] = self._pack(i, path, self.cells.shape[1])
+        vertex, edge = self._first_conflicts_with(i)
+        self.first_vertex[i, :], self.first_vertex[:, i] = vertex, vertex
+        self.first_edge[i, :], self.first_edge[:, i] = edge, edge
+
+    def first_conflict(self) -> Optional[Conflict]:
+        """
+        Returns:
+            Optional[Conflict]: the earliest conflict of the solution, vertex conflicts come before edge conflicts
+                occurring at the same timestep, ties are broken by agent order. None if there are no conflicts.
+        """
+        keys = np.minimum(self.first_vertex * 2, self.first_edge * 2 + 1)
+        keys[np.tril_indices(len(self.agents))] = self.NO_CONFLICT * 2
+        if keys.size == 0:
+            return None
+        i, j = np.unravel_index(np.argmin(keys), keys.shape)
+        key = keys[i, j]
+        if key >= self.NO_CONFLICT * 2:
+            return None
+        column, is_edge = divmod(int(key), 2)
+        return self._conflict(int(i), int(j), column, ConflictType.EDGE if is_edge else ConflictType.VERTEX)
+
+    def has_conflicts(self) -> bool:
+        return self.first_conflict() is not None
+
+    def num_conflicting_pairs(self) -> int:
+        """
+        Returns:
+            int: the number of pairs of agents with at least one conflict.
+        """
+        conflicting = np.minimum(self.first_vertex, self.first_edge) < self.NO_CONFLICT
+        return int(np.count_nonzero(np.triu(conflicting, 1)))
+
+    def conflicts(self) -> List[Conflict]:
+        """
+        Returns:
+            List[Conflict]: every vertex and edge conflict of the solution, sorted by timestep.
+        """
+        vertex = self.cells[:, None, :] == self.cells[None, :, :]
+        edge = self._swaps(self.cells, self.cells)
+        conflicts = []
+        for conflict_type, collisions in ((ConflictType.VERTEX, vertex), (ConflictType.EDGE, edge)):
+            for i, j, column in zip(*np.nonzero(collisions)):
+                if i < j:
+                    conflicts.append(self._conflict(int(i), int(j), int(column), conflict_type))
+        conflicts.sort(key=lambda c: (c.timestep, c.type.value))
+        return conflicts
+
+    def solution(self) -> Dict[Hashable, List[Tuple]]:
+        """
+        Returns:
+            Dict[Hashable, List[Tuple]]: the packed solution in the reversed format, paths are padded at the goal
+                if wait_at_goal is True.
+        """
+        return {
+            agent: [
+                (self._position(int(cell)), self.start_timestep + column)
+                for column, cell in reversed(list(enumerate(self.cells[i])))
+                if cell >= 0
+            ]
+            for i, agent in enumerate(self.agents)
+        }
+
+    def _pack(self, agent_index: int, path: List[Tuple], length: int) -> np.ndarray:
+        # absent agents get a negative code, different for every agent
+        row = np.full(length, -1 - agent_index, dtype=np.int64)
+        if not path:
+            return row
+        first_column = path[-1][1] - self.start_timestep
+        codes = [pos[1] * self.width + pos[0] for pos, _ in reversed(path)]
+        row[first_column:first_column + len(codes)] = codes
+        if self.wait_at_goal:
+            row[first_column + len(codes):] = codes[-1]
+        return row
+
+    def _position(self, cell: int) -> Tuple[int, int]:
+        return cell % self.width, cell // self.width
+
+    @staticmethod
+    def _swaps(cells1: np.ndarray, cells2: np.ndarray) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: boolean (len(cells1), len(cells2), timesteps - 1) array, True where the agent of cells1
+                moves from a to b while the agent of cells2 moves from b to a.
+        """
+        before1, after1 = cells1[:, None, :-1], cells1[:, None, 1:]
+        before2, after2 = cells2[None, :, :-1], cells2[None, :, 1:]
+        return (before1 == after2) & (after1 == before2) & (before1 != after1)
+
+    def _earliest(self, collisions: np.ndarray) -> np.ndarray:
+        if collisions.shape[-1] == 0:
+            return np.full(collisions.shape[:-1], self.NO_CONFLICT, dtype=np.int64)
+        has_collision = collisions.any(axis=-1)
+        return np.where(has_collision, collisions.argmax(axis=-1), self.NO_CONFLICT)
+
+    def _pairwise_first_conflicts(self) -> Tuple[np.ndarray, np.ndarray]:
+        vertex = self.cells[:, None, :] == self.cells[None, :, :]
+        np.einsum("iit->it", vertex)[:] = False
+        return self._earliest(vertex), self._earliest(self._swaps(self.cells, self.cells))
+
+    def _first_conflicts_with(self, i: int) -> Tuple[np.ndarray, np.ndarray]:
+        vertex = self.cells[i][None, :] == self.cells
+        vertex[i] = False
+        edge = self._swaps(self.cells[i:i + 1], self.cells)[0]
+        return self._earliest(vertex), self._earliest(edge)
+
+    def _conflict(self, i: int, j: int, column: int, conflict_type: ConflictType) -> Conflict:
+        position1 = self._position(int(self.cells[i, column]))
+        if conflict_type == ConflictType.VERTEX:
+            return Conflict(
+                type=ConflictType.VERTEX,
+                agent1=self.agents[i],
+                agent2=self.agents[j],
+                position1=position1,
+                timestep=self.start_timestep + column
+            )
+        return Conflict(
+            type=ConflictType.EDGE,
+            agent1=self.agents[i],
+            agent2=self.agents[j],
+            position1=position1,
+            position2=self._position(int(self.cells[i, column + 1])),
+            timestep=self.start_timestep + column
+        )
+
+
+def find_first_conflict(solution: Dict[Hashable, List[Tuple]], wait_at_goal: bool = True) -> Optional[Conflict]:
+    """
+    Returns:
+        Optional[Conflict]: the earliest conflict of the solution, None if there are no conflicts.
+    """
+    return ConflictDetector(solution, wait_at_goal).first_conflict()
+
+
+def validate_solution(solution: Dict[Hashable, List[Tuple]], wait_at_goal: bool = True) -> List[Conflict]:
+    """
+    Returns:
+        List[Conflict]: every vertex and edge conflict of the solution, an empty list if the solution is valid.
+    """
+    return ConflictDetector(solution, wait_at_goal).conflicts()
@@ -0,0 +1,135 @@
+from collections import OrderedDict
+from typing import Tuple, Iterable
+import numpy as np
+from simulator import Grid
+
+
+class DistanceOracle:
+    """
+    Exact obstacle-aware distances on a Grid.
+
+    The distances towards a goal are computed with a backward BFS from the goal the first time that goal is
+    requested, the resulting distance field is kept in a bounded LRU cache. In the warehouse scenarios the goals are
+    the shelf access positions, the stations and the parking positions, so the cache is usually hit.
+    The oracle can be used as an admissible (and consistent) heuristic for the planners, `oracle(position, goal)`.
+    """
+    UNREACHABLE = 2 ** 30
+
+    def __init__(self, grid: Grid, max_goals: int = 1024):
+        """
+        Args:
+            grid (Grid): grid the distances are computed on.
+            max_goals (int, optional): maximum number of distance fields kept in cache. Default is 1024.
+        """
+        self.grid = grid
+        self.max_goals = max_goals
+        self._fields: OrderedDict[Tuple, np.ndarray] = OrderedDict()
+
+    def distance_field(self, goal: Tuple) -> np.ndarray:
+        """
+        Args:
+            goal (Tuple): (x, y) goal position.
+
+        Returns:
+            np.ndarray: (height, width) array, the element [y][x] is the distance from (x, y) to the goal,
+                UNREACHABLE if the goal can not be reached from (x, y).
+        """
+        goal = tuple(goal)
+        if goal in self._fields:
+            self._fields.move_to_end(goal)
+            return self._fields[goal]
+        field = self._backward_bfs(goal)
+        self._fields[goal] = field
+        if len(self._fields) > self.max_goals:
+            self._fields.popitem(last=False)
+        return field
+
+    def distance(self, position: Tuple, goal: Tuple) -> int:
+        """
+        Args:
+            position (Tuple): (x, y) starting position.
+            goal (Tuple): (x, y) goal position.
+
+        Returns:
+            int: length of the shortest obstacle-free path between position and goal.
+        """
+        return int(self.distance_field(goal)[position[1], position[0]])
+
+    def distances(self, positions: np.ndarray, goal: Tuple) -> np.ndarray:
+        """
+        Args:
+            positions (np.ndarray): (n, 2) array of (x, y) starting positions.
+            goal (Tuple): (x, y) goal position.
+
+        Returns:
+            np.ndarray: the n lengths of the shortest obstacle-free paths between the positions and goal.
+        """
+        positions = np.asarray(positions, dtype=np.int64).reshape(-1, 2)
+        return self.distance_field(goal)[positions[:, 1], positions[:, 0]]
+
+    def pairwise_distances(self, positions: np.ndarray, goals: np.ndarray) -> np.ndarray:
+        """
+        Args:
+            positions (np.ndarray): (n, 2) array of (x, y) starting positions.
+            goals (np.ndarray): (m, 2) array of (x, y) goal positions.
+
+        Returns:
+            np.ndarray: (n, m) array, the element [i][j] is the distance from positions[i] to goals[j]. A distance
+                field is looked up once per distinct goal.
+        """
+        unique_goals, inverse = self._unique_positions(goals)
+        if not len(unique_goals):
+            return np.zeros((len(np.asarray(positions).reshape(-1, 2)), 0), dtype=np.int64)
+        columns = np.stack([self.distances(positions, tuple(goal)) for goal in unique_goals], axis=1)
+        return columns[:, inverse]
+
+    def paired_distances(self, positions: np.ndarray, goals: np.ndarray) -> np.ndarray:
+        """
+        Args:
+            positions (np.ndarray): (n, 2) array of (x, y) starting positions.
+            goals (np.ndarray): (n, 2) array of (x, y) goal positions.
+
+        Returns:
+            np.ndarray: the n distances from positions[i] to goals[i].
+        """
+        positions = np.asarray(positions, dtype=np.int64).reshape(-1, 2)
+        unique_goals, inverse = self._unique_positions(goals)
+        result = np.empty(len(positions), dtype=np.int64)
+        for i, goal in enumerate(unique_goals):
+            same_goal = inverse == i
+            result[same_goal] = self.distances(positions[same_goal], tuple(goal))
+        return result
+
+    def __call__(self, position: Tuple, goal: Tuple) -> int:
+        return self.distance(position, goal)
+
+    def warm_up(self, goals: Iterable[Tuple]) -> None:
+        """
+        Precompute the distance fields of the given goals.
+        """
+        for goal in goals:
+            self.distance_field(goal)
+
+    @staticmethod
+    def _unique_positions(positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        positions = np.asarray(positions, dtype=np.int64).reshape(-1, 2)
+        unique_positions, inverse = np.unique(positions, axis=0, return_inverse=True)
+        return unique_positions, inverse.reshape(-1)
+
+    def _backward_bfs(self, goal: Tuple) -> np.ndarray:
+        # moves are symmetric, so the distances from the goal are the distances to the goal. The BFS expands a whole
+        # level at a time on the neighbor table (CSR) of the grid
+        offsets, cells = self.grid.neighbor_offsets, self.grid.neighbor_cells
+        field = np.full(self.grid.height * self.grid.width, self.UNREACHABLE, dtype=np.int64)
+        frontier = np.array([self.grid.cell_id(goal)], dtype=np.int64)
+        field[frontier] = 0
+        distance = 0
+        while frontier.size:
+            distance += 1
+            starts, counts = offsets[frontier], offsets[frontier + 1] - offsets[frontier]
+            # indices of the neighbors of every frontier cell in the CSR array
+            indices = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            frontier = np.unique(cells[indices])
+            frontier = frontier[field[frontier] == self.UNREACHABLE]
+            field[frontier] = distance
+        return field.reshape(self.grid.height, self.grid.width)
@@ -0,0 +1,177 @@
+from collections import Counter
+from dataclasses import dataclass, field
+from heapq import heappush, heappop
+from itertools import count
+from typing import Tuple, List, Dict, Set, Optional, Callable, FrozenSet
+from simulator import Grid
+from .budget import PlanningBudget
+from .cbs import CTNode
+from .conflict_detection import ConflictType, ConflictDetector
+from .focal_a_star_planner import FocalAStarPlanner
+from .reservation_table import ReservationTable
+from .timing import timeit
+
+
+class ECBS:
+    """
+    Enhanced CBS, bounded-suboptimal variant of CBS: the returned solution costs at most w times the optimal one.
+
+    Both levels use a focal list ordered by the number of conflicts. The low level (FocalAStarPlanner) returns,
+    for every agent, a path at most w times longer than its shortest path together with a lower bound on the
+    length of the shortest path. The high level expands, among the CT nodes whose cost is at most w times the
+    minimum lower bound of the open list, the node with the fewest conflicting pairs of agents.
+    """
+
+    @classmethod
+    @timeit
+    def high_level_search(
+        cls,
+        agents_tasks: Dict[int, Tuple[Tuple, Tuple]],
+        grid: Grid,
+        timestep: int = 0,
+        spatio_temporal_obstacles: Optional[Set[Tuple[Tuple, int]]] = None,
+        heuristic: Optional[Callable[[Tuple, Tuple], int]] = None,
+        w: float = 1.5,
+        budget: Optional[PlanningBudget] = None
+    ) -> Dict[int, List[Tuple]]:
+        """
+        budget: the deadline is checked before expanding a node, the search raises PlanningTimeout once it has
+            passed.
+        """
+        # the obstacles are shared by every agent, the constraints of each agent are layered on top of them
+        obstacles = ReservationTable.from_constraints(spatio_temporal_obstacles if spatio_temporal_obstacles else ())
+
+        def plan(
+            agent_key: int,
+            constraints: FrozenSet[Tuple],
+            solution: Dict[int, List[Tuple]]
+        ) -> Tuple[List[Tuple], int]:
+            start_position, target_position = agents_tasks[agent_key]
+            return FocalAStarPlanner.plan(
+                start_position=start_position,
+                target_position=target_position,
+                grid=grid,
+                constraints=ReservationTable.from_constraints(constraints, base=obstacles),
+                timestep=timestep,
+                heuristic=heuristic,
+                w=w,
+                count_conflicts=PathOccupancy(solution, exclude=agent_key).count_conflicts
+            )
+
+        root = ECTNode(constraints={agent_key: frozenset() for agent_key in agents_tasks}, solution={})
+        for agent_key in agents_tasks:  # every agent avoids the paths of the agents planned before it
+            root.solution[agent_key], root.lower_bounds[agent_key] = plan(agent_key, frozenset(), root.solution)
+        root.compute_solution_cost()
+        root.lower_bound = sum(root.lower_bounds.values())
+        # an agent leaves its target to start the next task, so it is not padded after the end of its path
+        root.conflicts = ConflictDetector(root.solution, wait_at_goal=False)
+        # OPEN is a binary heap of (lower bound, insertion order, node) entries, its top gives lb_min. The entries of
+        # OPEN outside the focal bound also wait in a second heap ordered by cost, so that when lb_min grows only the
+        # entries entering FOCAL are popped. FOCAL is a binary heap of (conflicting pairs, cost, insertion order,
+        # node) entries of the nodes of OPEN with cost <= w * lb_min. Expanded nodes are discarded when found (lazy
+        # deletion).
+        tie_breaker = count()
+        root_order = next(tie_breaker)
+        open_list = [(root.lower_bound, root_order, root)]
+        waiting = []
+        focal = [(root.conflicts.num_conflicting_pairs(), root.cost, root_order, root)]
+        lb_min = root.lower_bound
+        generated = {root}
+        closed = set()
+        while open_list:
+            if budget is not None:
+                budget.check()
+            while focal and focal[0][-1] in closed:
+                heappop(focal)
+            if not focal:  # the node with the minimum lower bound is always within the bound
+                lower_bound, order, node = open_list[0]
+                heappush(focal, (node.conflicts.num_conflicting_pairs(), node.cost, order, node))
+            p = heappop(focal)[-1]
+            closed.add(p)
+            conflict = p.conflicts.first_conflict()
+            if not conflict:
+                return p.solution
+            constraints = dict()
+            if conflict.type == ConflictType.EDGE:
+                constraints[conflict.agent1] = (conflict.position1, conflict.position2, conflict.timestep)
+                constraints[conflict.agent2] = (conflict.position2, conflict.position1, conflict.timestep)
+            else:
+                constraints[conflict.agent1] = (conflict.position1, conflict.timestep)
+                constraints[conflict.agent2] = (conflict.position1, conflict.timestep)
+            for agent in [conflict.agent1, conflict.agent2]:
+                agent_constraints = p.constraints[agent] | {constraints[agent]}
+                node_a = p.child(agent, agent_constraints, *plan(agent, agent_constraints, p.solution))
+                if node_a not in generated:
+                    generated.add(node_a)
+                    order = next(tie_breaker)
+                    heappush(open_list, (node_a.lower_bound, order, node_a))
+                    if node_a.cost <= w * lb_min:
+                        heappush(focal, (node_a.conflicts.num_conflicting_pairs(), node_a.cost, order, node_a))
+                    else:
+                        heappush(waiting, (node_a.cost, order, node_a))
+            # lb_min can only grow, the nodes of OPEN within the new bound enter FOCAL
+            while open_list and open_list[0][-1] in closed:
+                heappop(open_list)
+            if open_list and open_list[0][0] > lb_min:
+                lb_min = open_list[0][0]
+                while waiting and waiting[0][0] <= w * lb_min:
+                    cost, order, node = heappop(waiting)
+                    if node not in closed:
+                        heappush(focal, (node.conflicts.num_conflicting_pairs(), cost, order, node))
+        print("ECBS: NO SOLUTION FOUND")
+        return {}
+
+
+class PathOccupancy:
+    """
+    Cells and moves occupied by the paths of a solution, used to count the conflicts of a single move.
+    """
+
+    def __init__(self, solution: Dict[int, List[Tuple]], exclude: Optional[int] = None):
+        self.vertices = Counter(step for agent, path in solution.items() if agent != exclude for step in path)
+        self.moves = Counter(
+            (pos1, pos2, t)
+            for agent, path in solution.items() if agent != exclude
+            for (pos2, _), (pos1, t) in zip(path, path[1:])
+        )
+
+    def count_conflicts(self, position1: Tuple, position2: Tuple, timestep: int) -> int:
+        """
+        Returns:
+            int: the number of vertex and edge conflicts of the move from position1 at timestep to position2 at
+                timestep + 1.
+        """
+        conflicts = self.vertices[(position2, timestep + 1)]
+        if position1 != position2:
+            conflicts += self.moves[(position2, position1, timestep)]
+        return conflicts
+
+
+@dataclass(eq=False, slots=True)
+class ECTNode(CTNode):
+    """
+    Node of the ECBS constraint tree, it also stores the lower bound on the length of the shortest path of each
+    agent and their sum.
+    """
+    lower_bounds: Dict[int, int] = field(default_factory=dict)
+    lower_bound: int = 0
+
+    def child(
+        self,
+        agent: int,
+        agent_constraints: FrozenSet[Tuple],
+        agent_path: List[Tuple],
+        agent_lower_bound: int = 0
+    ) -> "ECTNode":
+        node = CTNode.child(self, agent, agent_constraints, agent_path)
+        lower_bounds = dict(self.lower_bounds)
+        lower_bounds[agent] = agent_lower_bound
+        return ECTNode(
+            constraints=node.constraints,
+            solution=node.solution,
+            cost=node.cost,
+            key=node.key,
+            conflicts=node.conflicts,
+            lower_bounds=lower_bounds,
+            lower_bound=self.lower_bound - self.lower_bounds[agent] + agent_lower_bound
+        )
@@ -0,0 +1,126 @@
+from heapq import heappush, heappop
+from itertools import count
+from typing import Tuple, Set, Dict, Callable, Union, List
+from simulator import Grid
+from .a_star_planner import manhattan_distance
+from .grid_graph import GridNode
+from .reservation_table import ReservationTable, as_reservation_table
+
+
+class FocalAStarPlanner:
+    """
+    Bounded-suboptimal A* with a focal list, the low level of ECBS.
+
+    OPEN is ordered by f, FOCAL holds the nodes of OPEN with f <= w * f_min and is ordered by the number of
+    conflicts with the paths of the other agents, so that among the paths at most w times longer than the shortest
+    one the least conflicting is preferred. Paths are returned in the reversed [(position, timestep), ...] format,
+    together with the lower bound on the length of the shortest path.
+    """
+
+    @classmethod
+    def plan(
+        cls,
+        start_position: Tuple,
+        target_position: Tuple,
+        grid: Grid,
+        constraints: Union[ReservationTable, Set[tuple]] = None,
+        timestep: int = 0,
+        heuristic: Callable[[Tuple, Tuple], int] = None,
+        w: float = 1.0,
+        count_conflicts: Callable[[Tuple, Tuple, int], int] = None
+    ) -> Tuple[List[Tuple], int]:
+        """
+        Args:
+            w: suboptimality factor, the returned path is at most w times longer than the shortest one.
+            count_conflicts: number of conflicts with the other agents of the move from position1 at timestep to
+                position2 at timestep + 1, no conflicts are counted if None.
+
+        Returns:
+            Tuple[List[Tuple], int]: the path and the lower bound on the length (len(path)) of the shortest path.
+                If the target can not be reached the path contains only the start.
+        """
+        heuristic = heuristic if heuristic is not None else manhattan_distance
+        reservations = as_reservation_table(constraints)
+        start = GridNode(start_position, timestep=timestep)
+        start.h = heuristic(start_position, target_position)
+        start.f = start.h
+        # OPEN is a binary heap of (f, h, insertion order, conflicts, node) entries, its top gives f_min. The entries
+        # of OPEN outside the focal bound also wait in a second heap ordered by f, so that when f_min grows only the
+        # entries entering FOCAL are popped. FOCAL is a binary heap of the same entries prefixed by the number of
+        # conflicts. Expanded and outdated nodes are discarded when found (lazy deletion), best_g maps each state to
+        # its best cost.
+        tie_breaker = count()
+        start_entry = (start.f, start.h, next(tie_breaker), 0, start)
+        open_list = [start_entry]
+        waiting = []
+        focal = [(0,) + start_entry]
+        best_g: Dict[Tuple, int] = {cls._state(start): start.g}
+        closed = set()
+        f_min = start.f
+
+        while open_list:
+            while focal and cls._is_outdated(focal[0][-1], best_g, closed):
+                heappop(focal)
+            if not focal:
+                break
+            entry = heappop(focal)[1:]
+            n = entry[-1]
+            closed.add(cls._state(n))
+            if n.x == target_position[0] and n.y == target_position[1]:
+                return cls._get_path(n), f_min + 1
+            n_conflicts = entry[3]
+            position = (n.x, n.y)
+            for adj_position in grid.successors(position):
+                if (
+                    reservations.is_vertex_reserved(adj_position, n.timestep + 1) or
+                    reservations.is_edge_reserved(position, adj_position, n.timestep)
+                ):
+                    continue
+                adj_state = (*adj_position, n.timestep + 1)
+                if adj_state in closed:
+                    continue
+                if adj_state in best_g and best_g[adj_state] <= n.g + 1:
+                    continue
+                best_g[adj_state] = n.g + 1
+                adj_node = GridNode(adj_position, timestep=n.timestep + 1)
+                adj_node.g = n.g + 1
+                adj_node.h = heuristic(adj_position, target_position)
+                adj_node.f = adj_node.g + adj_node.h
+                adj_node.parent = n
+                adj_conflicts = n_conflicts + (
+                    count_conflicts(position, adj_position, n.timestep) if count_conflicts else 0
+                )
+                adj_entry = (adj_node.f, adj_node.h, next(tie_breaker), adj_conflicts, adj_node)
+                heappush(open_list, adj_entry)
+                if adj_node.f <= w * f_min:
+                    heappush(focal, (adj_conflicts,) + adj_entry)
+                else:
+                    heappush(waiting, adj_entry)
+            # f_min can only grow, the nodes of OPEN within the new bound enter FOCAL
+            while open_list and cls._is_outdated(open_list[0][-1], best_g, closed):
+                heappop(open_list)
+            if open_list and open_list[0][0] > f_min:
+                f_min = open_list[0][0]
+                while waiting and waiting[0][0] <= w * f_min:
+                    open_entry = heappop(waiting)
+                    if not cls._is_outdated(open_entry[-1], best_g, closed):
+                        heappush(focal, (open_entry[3],) + open_entry)
+        path = cls._get_path(start)
+        return path, len(path)
+
+    @staticmethod
+    def _state(node: GridNode) -> Tuple:
+        return node.x, node.y, node.timestep
+
+    @classmethod
+    def _is_outdated(cls, node: GridNode, best_g: Dict[Tuple, int], closed: Set[Tuple]) -> bool:
+        state = cls._state(node)
+        return state in closed or node.g > best_g[state]
+
+    @staticmethod
+    def _get_path(node: GridNode) -> List[Tuple]:
+        path = [node.get_path_step()]
+        while node.parent:
+            node = node.parent
+            path.append(node.get_path_step())
+        return path
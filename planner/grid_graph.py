@@ -1,12 +1,15 @@
-from typing import Set
+from typing import List
 from simulator.grid import Grid
 
 
 class GridEdge:
+    __slots__ = ("x1", "y1", "x2", "y2", "timestep", "_hash")
+
     def __init__(self, position1: tuple, position2: tuple, timestep: int = 0):
         self.x1, self.y1 = position1
         self.x2, self.y2 = position2
         self.timestep = timestep
+        self._hash = hash((self.x1, self.y1, self.x2, self.y2, self.timestep))
 
     def same_edge(self, other):
         return (
@@ -21,12 +24,14 @@ class GridEdge:
         return self.same_edge(other) and self.timestep == other.timestep
 
     def __hash__(self):
-        return hash(f"{self.x1},{self.y1},{self.x2},{self.y1},{self.y2},{self.timestep}")
+        return self._hash
 
 class GridNode:
     """
-    Node class representing positions in the map for tree search
+    Node class representing positions in the map for tree search.
+    Nodes are identified by (x, y, timestep), their hash is computed from that tuple once, when first needed.
     """
+    __slots__ = ("x", "y", "g", "h", "f", "parent", "timestep", "_hash")
 
     def __init__(self, position: tuple, timestep: int = 0):
         self.x, self.y = position
@@ -35,6 +40,7 @@ class GridNode:
         self.f = 0
         self.parent = None
         self.timestep = timestep
+        self._hash = None
 
     def same_position(self, other):
         return isinstance(other, GridNode) and self.x == other.x and self.y == other.y
@@ -54,7 +60,9 @@ class GridNode:
         )
 
     def __hash__(self):
-        return hash(f"{self.x},{self.y},{self.timestep}")
+        if self._hash is None:
+            self._hash = hash((self.x, self.y, self.timestep))
+        return self._hash
 
     def __lt__(self, other):
         return self.f < other.f
@@ -66,23 +74,14 @@ class GridNode:
         pos = (self.x, self.y)
         return pos, self.timestep if return_timestep else pos
 
-    def get_valid_positions(self, grid: Grid, get_time: bool = True) -> Set["GridNode"]:
-        valid_positions = set()
-        adjacent_cells = [
-            (self.x, self.y),  # STAY
-            (self.x - 1, self.y),  # LEFT
-            (self.x + 1, self.y),  # RIGHT
-            (self.x, self.y + 1),  # UP
-            (self.x, self.y - 1),  # DOWN
-        ]
-        for pos_x, pos_y in adjacent_cells:
-            # checking only if > 0, otherwise the last element is returned
-            if pos_x > 0 and pos_y > 0 and grid[pos_y][pos_x] != 0:
-                node = GridNode((pos_x, pos_y), (self.timestep + 1) if get_time else self.timestep)
-                node.g = self.g + 1
-
-                node.parent = self
-                valid_positions.add(node)
+    def get_valid_positions(self, grid: Grid, get_time: bool = True) -> List["GridNode"]:
+        # STAY, LEFT, RIGHT, UP, DOWN, from the successor table of the grid
+        valid_positions = []
+        for position in grid.successors((self.x, self.y)):
+            node = GridNode(position, (self.timestep + 1) if get_time else self.timestep)
+            node.g = self.g + 1
+            node.parent = self
+            valid_positions.append(node)
         return valid_positions
 
 
@@ -0,0 +1,147 @@
+import os
+import subprocess
+import tempfile
+from typing import Dict, List, Optional, Sequence
+
+
+class LKHError(RuntimeError):
+    """
+    Raised when LKH can not be run, fails, or writes an invalid tour.
+    """
+
+
+class LKHRunner:
+    """
+    Runs the LKH-3 solver on asymmetric TSP instances given as full distance matrices.
+
+    Every call to solve writes the problem and the parameter files in its own temporary directory, launches LKH
+    with subprocess and reads the tour as soon as the process exits, so several solves (e.g. from different threads
+    or processes) can run at the same time without touching each other's files.
+    """
+    DEFAULT_EXECUTABLE = os.path.join("planner", "LKH-3.0.9", "LKH")
+    DEFAULT_PARAMETERS = {
+        "TRACE_LEVEL": "1",
+        "RUNS": "10",
+        "MOVE_TYPE": "5",
+        "PATCHING_C": "3",
+        "MAKESPAN": "YES",
+        "POPULATION_SIZE": "10"
+    }
+
+    def __init__(
+        self,
+        executable: str = DEFAULT_EXECUTABLE,
+        time_limit: float = 100,
+        seed: int = 123,
+        parameters: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None
+    ):
+        """
+        Args:
+            executable (str, optional): path of the LKH executable. Default is planner/LKH-3.0.9/LKH.
+            time_limit (float, optional): TIME_LIMIT of LKH, in seconds. Default is 100.
+            seed (int, optional): SEED of LKH, the same seed gives the same tour. Default is 123.
+            parameters (Dict[str, str], optional): other LKH parameters, they update DEFAULT_PARAMETERS.
+            timeout (float, optional): seconds after which the LKH process is killed, None to wait for it.
+                Default is None.
+        """
+        self.executable = os.path.abspath(executable)
+        self.time_limit = time_limit
+        self.seed = seed
+        self.parameters = {**self.DEFAULT_PARAMETERS, **(parameters if parameters else {})}
+        self.timeout = timeout
+
+    def is_available(self) -> bool:
+        return os.path.isfile(self.executable) and os.access(self.executable, os.X_OK)
+
+    def solve(self, distance_matrix: Sequence[Sequence[int]], name: str = "TA-Prioritized") -> List[int]:
+        """
+        Args:
+            distance_matrix: (n, n) matrix of integer distances, distance_matrix[i][j] is the cost of going from
+                node i to node j.
+
+        Returns:
+            List[int]: the tour, a permutation of the nodes 0, ..., n - 1 starting from node 0.
+        """
+        dimension = len(distance_matrix)
+        with tempfile.TemporaryDirectory(prefix="lkh-") as directory:
+            problem_file = os.path.join(directory, "problem.atsp")
+            parameter_file = os.path.join(directory, "parameters.par")
+            tour_file = os.path.join(directory, "solution.tour")
+            self._write_problem(problem_file, distance_matrix, name)
+            self._write_parameters(parameter_file, problem_file, tour_file)
+            try:
+                process = subprocess.run(
+                    [self.executable, parameter_file],
+                    cwd=directory,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    text=True,
+                    timeout=self.timeout
+                )
+            except (OSError, subprocess.TimeoutExpired) as error:
+                raise LKHError(f"LKH could not be run: {error}") from error
+            if process.returncode != 0 or not os.path.isfile(tour_file):
+                output = "\n".join(process.stdout.splitlines()[-10:])
+                raise LKHError(f"LKH exited with code {process.returncode} without a tour:\n{output}")
+            tour = self.read_tour(tour_file)
+        return self.rotate_tour(tour, dimension)
+
+    @staticmethod
+    def rotate_tour(tour: List[int], dimension: int) -> List[int]:
+        """
+        Returns:
+            List[int]: the tour starting from node 0, LKHError is raised if it is not a permutation of the nodes
+                0, ..., dimension - 1.
+        """
+        if sorted(tour) != list(range(dimension)):
+            raise LKHError(f"the tour of LKH is not a permutation of the {dimension} nodes")
+        start = tour.index(0)
+        return tour[start:] + tour[:start]
+
+    @staticmethod
+    def read_tour(tour_file: str) -> List[int]:
+        """
+        Returns:
+            List[int]: the 0-based nodes listed in the TOUR_SECTION of a tour file, until -1 or EOF.
+        """
+        tour = []
+        with open(tour_file, "r") as solution_file:
+            for line in solution_file:
+                if line.strip().startswith("TOUR_SECTION"):
+                    break
+            else:
+                raise LKHError(f"no TOUR_SECTION in {tour_file}")
+            for line in solution_file:
+                for token in line.split():
+                    if token == "-1" or token == "EOF":
+                        return tour
+                    tour.append(int(token) - 1)
+        return tour
+
+    def _write_parameters(self, parameter_file: str, problem_file: str, tour_file: str) -> None:
+        parameters = {
+            "PROBLEM_FILE": problem_file,
+            "TOUR_FILE": tour_file,
+            "TIME_LIMIT": str(self.time_limit),
+            "SEED": str(self.seed),
+            **self.parameters
+        }
+        with open(parameter_file, "w") as file:
+            for key, value in parameters.items():
+                file.write(f"{key} = {value}\n")
+
+    @staticmethod
+    def _write_problem(problem_file: str, distance_matrix: Sequence[Sequence[int]], name: str) -> None:
+        with open(problem_file, "w") as file:
+            file.write(f"NAME : {name}\n")
+            file.write(f"COMMENT : {name}\n")
+            file.write("TYPE : ATSP\n")
+            file.write(f"DIMENSION : {len(distance_matrix)}\n")
+            file.write("EDGE_WEIGHT_TYPE : EXPLICIT\n")
+            file.write("EDGE_WEIGHT_FORMAT : FULL_MATRIX\n")
+            file.write("EDGE_WEIGHT_SECTION\n")
+            for row in distance_matrix:
+                file.write(" ".join(str(int(value)) for value in row) + "\n")
+            file.write("EOF\n")
@@ -0,0 +1,181 @@
+from enum import IntEnum
+from typing import Callable, Dict, FrozenSet, Hashable, List, Optional, Set, Tuple
+from simulator import Grid
+from .a_star_planner import manhattan_distance
+from .conflict_detection import Conflict, ConflictType
+from .reservation_table import ReservationTable
+
+
+class Cardinality(IntEnum):
+    """
+    Classification of a conflict: it is cardinal if resolving it delays both agents, semi-cardinal if it delays
+    only one of them, non-cardinal otherwise. Higher values are resolved first.
+    """
+    NON_CARDINAL = 0
+    SEMI_CARDINAL = 1
+    CARDINAL = 2
+
+
+class MDD:
+    """
+    Multi-valued decision diagram of an agent: level t holds every position occupied at timestep t by at least one
+    of the shortest paths from start to target that respect the constraints of the agent, where a path is shortest
+    if it reaches the target at the same timestep of the path found by the low-level planner.
+
+    A level with a single position means that every shortest path of the agent goes through that position at that
+    timestep, so a conflict there can not be avoided without delaying the agent.
+    """
+
+    def __init__(self, levels: List[Set[Tuple]], timestep: int):
+        self.levels = levels
+        self.timestep = timestep
+
+    @classmethod
+    def build(
+        cls,
+        start_position: Tuple,
+        target_position: Tuple,
+        grid: Grid,
+        constraints: ReservationTable,
+        timestep: int,
+        arrival: int,
+        heuristic: Optional[Callable[[Tuple, Tuple], int]] = None
+    ) -> "MDD":
+        """
+        Args:
+            constraints: the reservations the paths have to respect.
+            timestep: the timestep of the start position.
+            arrival: the timestep at which the shortest paths reach the target.
+            heuristic: admissible distance estimate, used to prune the positions that can not reach the target in
+                time.
+
+        Returns:
+            MDD: the diagram of the shortest paths, with arrival - timestep + 1 levels.
+        """
+        heuristic = heuristic if heuristic is not None else manhattan_distance
+        start_position, target_position = tuple(start_position), tuple(target_position)
+
+        # forward pass: positions reachable at every timestep that can still reach the target in time
+        reachable = [{start_position}]
+        for t in range(timestep, arrival):
+            level = set()
+            for position in reachable[-1]:
+                for adj_position in cls._successors(position, grid, constraints, t):
+                    if adj_position not in level and heuristic(adj_position, target_position) <= arrival - t - 1:
+                        level.add(adj_position)
+            reachable.append(level)
+        if target_position not in reachable[-1]:
+            return cls([set() for _ in reachable], timestep)
+
+        # backward pass: keep only the positions from which the target is reached at the arrival timestep
+        levels = [{target_position}]
+        for t in range(arrival - 1, timestep - 1, -1):
+            next_level = levels[-1]
+            levels.append({
+                position for position in reachable[t - timestep]
+                if not next_level.isdisjoint(cls._successors(position, grid, constraints, t))
+            })
+        levels.reverse()
+        return cls(levels, timestep)
+
+    @property
+    def arrival(self) -> int:
+        return self.timestep + len(self.levels) - 1
+
+    def positions(self, timestep: int) -> Set[Tuple]:
+        """
+        Returns:
+            Set[Tuple]: the positions of the level at timestep, empty outside of the diagram.
+        """
+        if self.timestep <= timestep <= self.arrival:
+            return self.levels[timestep - self.timestep]
+        return set()
+
+    def is_singleton(self, position: Tuple, timestep: int) -> bool:
+        """
+        Returns:
+            bool: True if every shortest path occupies position at timestep.
+        """
+        return self.positions(timestep) == {position}
+
+    def is_forced_move(self, position1: Tuple, position2: Tuple, timestep: int) -> bool:
+        """
+        Returns:
+            bool: True if every shortest path moves from position1 at timestep to position2 at timestep + 1.
+        """
+        return self.is_singleton(position1, timestep) and self.is_singleton(position2, timestep + 1)
+
+    @staticmethod
+    def _successors(position: Tuple, grid: Grid, constraints: ReservationTable, timestep: int) -> List[Tuple]:
+        # the same moves (waiting included) allowed to the low-level planner
+        return [
+            adj_position
+            for adj_position in grid.successors(position)
+            if not (
+                constraints.is_vertex_reserved(adj_position, timestep + 1) or
+                constraints.is_edge_reserved(position, adj_position, timestep)
+            )
+        ]
+
+
+class MDDCache:
+    """
+    Cache of the MDDs built during a CBS search, keyed by agent and by the constraints of the agent: the start,
+    the target and the shared obstacles of an agent do not change within a search, so nodes of the constraint
+    tree with the same constraints for an agent share its MDD.
+    """
+
+    def __init__(
+        self,
+        agents_tasks: Dict[Hashable, Tuple[Tuple, Tuple]],
+        grid: Grid,
+        timestep: int,
+        obstacles: ReservationTable,
+        heuristic: Optional[Callable[[Tuple, Tuple], int]] = None
+    ):
+        self.agents_tasks = agents_tasks
+        self.grid = grid
+        self.timestep = timestep
+        self.obstacles = obstacles
+        self.heuristic = heuristic
+        self.mdds: Dict[Tuple[Hashable, FrozenSet[Tuple]], MDD] = {}
+
+    def get(self, agent: Hashable, agent_constraints: FrozenSet[Tuple], path: List[Tuple]) -> MDD:
+        """
+        Args:
+            agent_constraints: the constraints of the agent, the key of the cache.
+            path: the path of the agent found under agent_constraints, in the reversed format.
+        """
+        key = (agent, agent_constraints)
+        if key not in self.mdds:
+            start_position, target_position = self.agents_tasks[agent]
+            self.mdds[key] = MDD.build(
+                start_position,
+                target_position,
+                self.grid,
+                ReservationTable.from_constraints(agent_constraints, base=self.obstacles),
+                self.timestep,
+                path[0][1],
+                self.heuristic
+            )
+        return self.mdds[key]
+
+    def __len__(self):
+        return len(self.mdds)
+
+
+def classify_conflict(conflict: Conflict, mdd1: MDD, mdd2: MDD) -> Cardinality:
+    """
+    Args:
+        conflict: a conflict between the agents of mdd1 and mdd2.
+
+    Returns:
+        Cardinality: the classification of the conflict.
+    """
+    if conflict.type == ConflictType.VERTEX:
+        forced1 = mdd1.is_singleton(conflict.position1, conflict.timestep)
+        forced2 = mdd2.is_singleton(conflict.position1, conflict.timestep)
+    else:
+        forced1 = mdd1.is_forced_move(conflict.position1, conflict.position2, conflict.timestep)
+        forced2 = mdd2.is_forced_move(conflict.position2, conflict.position1, conflict.timestep)
+    return Cardinality(forced1 + forced2)
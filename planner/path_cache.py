@@ -0,0 +1,91 @@
+from collections import OrderedDict
+from typing import Tuple, Set, Callable, Union, Optional
+from simulator import Grid
+from .a_star_planner import manhattan_distance
+from .budget import PlanningBudget
+from .reservation_table import ReservationTable, as_reservation_table
+
+
+class PathCache:
+    """
+    LRU cache of spatial routes in front of a single-agent planner, with the same contract of planner.plan.
+
+    Routes are keyed by (start, target) and stored as the sequence of positions, without timesteps. A route is
+    stored only if it is known to be a shortest route, i.e. its length is equal to the heuristic distance (the
+    heuristic is admissible, so no route can be shorter). A cached route is returned, shifted to the requested
+    start timestep, if it violates none of the constraints: being a shortest route it is also an optimal answer to
+    the request. Otherwise, or if the route is not cached, the planner is called.
+    """
+    DEFAULT_SIZE = 4096
+
+    def __init__(self, planner, max_routes: int = DEFAULT_SIZE):
+        """
+        Args:
+            planner: planner class, e.g. AStarPlanner.
+            max_routes (int, optional): maximum number of routes kept in cache. Default is 4096.
+        """
+        self.planner = planner
+        self.max_routes = max_routes
+        self.routes: OrderedDict[Tuple[Tuple, Tuple], Tuple[Tuple, ...]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def plan(
+        self,
+        start_position: Tuple,
+        target_position: Tuple,
+        grid: Grid,
+        constraints: Union[ReservationTable, Set[tuple]] = None,
+        timestep=0,
+        get_time: bool = True,
+        heuristic: Callable[[Tuple, Tuple], int] = None,
+        budget: Optional[PlanningBudget] = None
+    ):
+        if not get_time:  # only time-expanded paths are cached
+            return self.planner.plan(
+                start_position, target_position, grid, constraints, timestep, get_time, heuristic, budget
+            )
+        heuristic = heuristic if heuristic is not None else manhattan_distance
+        reservations = as_reservation_table(constraints)
+        key = (tuple(start_position), tuple(target_position))
+        route = self.routes.get(key)
+        if route is not None and self._is_free(route, reservations, timestep):
+            self.routes.move_to_end(key)
+            self.hits += 1
+            return [(position, timestep + i) for i, position in reversed(list(enumerate(route)))]
+        self.misses += 1
+        path = self.planner.plan(
+            start_position, target_position, grid, reservations, timestep, get_time, heuristic, budget
+        )
+        if path[0][0] == key[1] and len(path) - 1 == heuristic(*key):
+            self.routes[key] = tuple(position for position, _ in reversed(path))
+            self.routes.move_to_end(key)
+            if len(self.routes) > self.max_routes:
+                self.routes.popitem(last=False)
+        return path
+
+    @property
+    def hit_rate(self) -> float:
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+    def clear(self) -> None:
+        self.routes.clear()
+        self.hits = self.misses = 0
+
+    def __getstate__(self):
+        # the routes are local to a process, e.g. planners sent to the workers of a PlanningPool start empty
+        state = self.__dict__.copy()
+        state["routes"] = OrderedDict()
+        return state
+
+    @staticmethod
+    def _is_free(route: Tuple[Tuple, ...], reservations: ReservationTable, timestep: int) -> bool:
+        # the same checks of the planners, the start position is not checked
+        for i in range(1, len(route)):
+            if (
+                reservations.is_vertex_reserved(route[i], timestep + i) or
+                reservations.is_edge_reserved(route[i - 1], route[i], timestep + i - 1)
+            ):
+                return False
+        return True
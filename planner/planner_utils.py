@@ -0,0 +1,17 @@
+from .a_star_planner import AStarPlanner
+from .sipp_planner import SIPPPlanner
+
+PLANNERS = [
+    "a_star",
+    "sipp"
+]
+
+
+def get_planner(planner_name: str):
+    match planner_name:
+        case "a_star":
+            return AStarPlanner
+        case "sipp":
+            return SIPPPlanner
+        case _:
+            raise NotImplementedError(f"The desired planner [{planner_name}] was not implemented")
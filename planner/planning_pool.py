@@ -0,0 +1,176 @@
+import atexit
+import os
+import pickle
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import count
+from typing import Any, Callable, FrozenSet, Hashable, List, Optional, Set, Tuple
+from simulator import Grid
+from .reservation_table import ReservationTable
+
+# state of the worker processes, set once by the initializer
+_worker_grid: Optional[Grid] = None
+_worker_heuristic: Optional[Callable[[Tuple, Tuple], int]] = None
+_worker_obstacles: Tuple[Hashable, Optional[ReservationTable]] = (None, None)
+_worker_snapshot: Tuple[Hashable, Any] = (None, None)
+
+
+def _initialize_worker(grid: Grid, heuristic: Optional[Callable[[Tuple, Tuple], int]]) -> None:
+    global _worker_grid, _worker_heuristic
+    _worker_grid = grid
+    _worker_heuristic = heuristic
+
+
+def _plan(
+    planner,
+    start_position: Tuple,
+    target_position: Tuple,
+    constraints: FrozenSet[Tuple],
+    obstacles_key: Hashable,
+    obstacles_file: str,
+    timestep: int
+) -> List[Tuple]:
+    global _worker_obstacles
+    # the obstacles are shared by every request of a search, they are loaded and the table is built once per worker
+    if _worker_obstacles[0] != obstacles_key:
+        with open(obstacles_file, "rb") as file:
+            _worker_obstacles = (obstacles_key, ReservationTable.from_constraints(pickle.load(file)))
+    return planner.plan(
+        start_position=start_position,
+        target_position=target_position,
+        grid=_worker_grid,
+        constraints=ReservationTable.from_constraints(constraints, base=_worker_obstacles[1]),
+        timestep=timestep,
+        heuristic=_worker_heuristic
+    )
+
+
+def _map(function: Callable, snapshot_key: Hashable, snapshot: bytes, requests: List[Tuple]) -> List:
+    global _worker_snapshot
+    # the snapshot is shared by every request of a call to map, it is unpickled once per process
+    if _worker_snapshot[0] != snapshot_key:
+        _worker_snapshot = (snapshot_key, pickle.loads(snapshot))
+    return [function(_worker_grid, _worker_heuristic, _worker_snapshot[1], *request) for request in requests]
+
+
+class PlanningPool:
+    """
+    Persistent pool of processes running single-agent planners.
+
+    The grid and the heuristic are sent to every worker once, when the pool is created. The obstacles of a search
+    are pickled once, in a file of the pool, and every worker loads them on its first request of the search, so
+    the requests only carry the start, the target and the constraints of the agent. Planners are deterministic,
+    and the paths are returned in the order of the requests, so the results do not depend on the number of
+    workers. Other planning functions (e.g. the chain of searches of an agent) can be run with map.
+    """
+    _searches = count()
+
+    def __init__(self, grid: Grid, workers: int, heuristic: Optional[Callable[[Tuple, Tuple], int]] = None):
+        self.grid = grid
+        self.workers = workers
+        self.heuristic = heuristic
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_initialize_worker,
+            initargs=(grid, heuristic)
+        )
+        self.directory = tempfile.TemporaryDirectory(prefix="planning-pool-")
+        self.obstacles_file: Optional[str] = None
+
+    def new_search(self, obstacles: Optional[Set[Tuple]]) -> Tuple[int, str]:
+        """
+        Write the obstacles of a new search, the ones of the previous search (whose requests are all planned) are
+        removed.
+
+        Returns:
+            Tuple[int, str]: the key and the obstacles file of a new search, to be passed to plan_all.
+        """
+        if self.obstacles_file is not None:
+            os.remove(self.obstacles_file)
+        key = next(self._searches)
+        self.obstacles_file = os.path.join(self.directory.name, f"obstacles-{key}.pickle")
+        with open(self.obstacles_file, "wb") as file:
+            pickle.dump(frozenset(obstacles if obstacles else ()), file, protocol=pickle.HIGHEST_PROTOCOL)
+        return key, self.obstacles_file
+
+    def plan_all(
+        self,
+        planner,
+        requests: List[Tuple[Tuple, Tuple, FrozenSet[Tuple]]],
+        search: Tuple[int, str],
+        timestep: int
+    ) -> List[List[Tuple]]:
+        """
+        Args:
+            planner: planner class, e.g. AStarPlanner.
+            requests: list of (start position, target position, constraints).
+            search: the key and the obstacles file returned by new_search.
+            timestep: the timestep of the start positions.
+
+        Returns:
+            List[List[Tuple]]: the paths, in the order of the requests.
+        """
+        obstacles_key, obstacles_file = search
+        futures = [
+            self.executor.submit(
+                _plan, planner, start_position, target_position, constraints, obstacles_key, obstacles_file, timestep
+            )
+            for start_position, target_position, constraints in requests
+        ]
+        return [future.result() for future in futures]
+
+    def map(self, function: Callable, requests: List[Tuple], snapshot: Any) -> List:
+        """
+        Call function(grid, heuristic, snapshot, *request) for every request in the workers.
+
+        The requests are split into (at most) workers shares, request i in share i % workers, and the executor runs
+        every share in any of its processes (a process may run several shares). The snapshot (e.g. the reservations
+        every request of a round is planned against) is pickled once and sent with every share, each process
+        unpickles it at most once per call.
+
+        Args:
+            function: picklable (module-level) function.
+            requests: list of the other arguments of function, they must be picklable.
+            snapshot: picklable object shared by every request, it must not be modified by function.
+
+        Returns:
+            List: the results, in the order of the requests.
+        """
+        snapshot_key = next(self._searches)
+        data = pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+        shares = [requests[i::self.workers] for i in range(min(self.workers, len(requests)))]
+        futures = [self.executor.submit(_map, function, snapshot_key, data, share) for share in shares]
+        results = [None] * len(requests)
+        for i, future in enumerate(futures):
+            results[i::self.workers] = future.result()
+        return results
+
+    def close(self) -> None:
+        self.executor.shutdown()
+        self.directory.cleanup()
+
+
+_pool: Optional[PlanningPool] = None
+
+
+def get_planning_pool(
+    grid: Grid,
+    workers: int,
+    heuristic: Optional[Callable[[Tuple, Tuple], int]] = None
+) -> PlanningPool:
+    """
+    Returns the persistent pool for grid and heuristic, a new pool replaces the previous one only if the grid, the
+    heuristic or the number of workers change.
+    """
+    global _pool
+    if _pool is None or _pool.grid is not grid or _pool.heuristic is not heuristic or _pool.workers != workers:
+        if _pool is not None:
+            _pool.close()
+        _pool = PlanningPool(grid, workers, heuristic)
+    return _pool
+
+
+@atexit.register
+def _close_planning_pool() -> None:
+    if _pool is not None:
+        _pool.close()
@@ -1,13 +1,19 @@
 from enum import Enum, auto 
-from typing import Set, List, Tuple, Dict
+from typing import List, Tuple, Dict, Optional
 from .task import Task
-from .task_agent_graph import TaskAgentGraph, TaskAgentVertex, TaskAgentEdge
-from itertools import product
+from .task_agent_graph import TaskAgentGraph
 from simulator import Agent, Grid
-from .a_star_planner import AStarPlanner, manhattan_distance
+from .planner_utils import get_planner
+from .path_cache import PathCache
+from .budget import PlanningBudget
+from .distance_oracle import DistanceOracle
+from .lkh_runner import LKHError, LKHRunner
+from .atsp_solver import ATSPSolver
+from .reservation_table import ReservationTable
+from .planning_pool import PlanningPool, get_planning_pool
 from .algorithm import Algorithm
 from .timing import timeit
-import os
+import numpy as np
 
 class AgentStatus(Enum):
     pickup = auto()
@@ -51,76 +57,186 @@ class PrioritizedAgent:
         return self.agent.starting_position
 
 
+def plan_path(
+    planner,
+    grid: Grid,
+    heuristic: DistanceOracle,
+    constraints: ReservationTable,
+    start_position: Tuple,
+    target_position: Tuple,
+    timestep: int
+) -> List[Tuple]:
+    """
+    Plan a (reversed) path that is followed by another one: the next path starts in target_position at the timestep
+    after the end of this one, and the planners do not check the start of a path, so an arrival whose next
+    timestep is reserved is rejected and the path is planned again without it.
+    """
+    arrivals = ReservationTable(base=constraints)
+    while True:
+        path = planner.plan(
+            start_position=start_position,
+            target_position=target_position,
+            grid=grid,
+            constraints=arrivals,
+            timestep=timestep,
+            heuristic=heuristic
+        )
+        position, arrival = path[0]
+        if position != target_position or not constraints.is_vertex_reserved(position, arrival + 1):
+            return path
+        arrivals.add_constraints(None, [(position, arrival)])
+
+
+def plan_task_paths(
+    planner,
+    grid: Grid,
+    heuristic: DistanceOracle,
+    constraints: ReservationTable,
+    task: Task,
+    start_position: Tuple,
+    timestep: int,
+    picked_up: bool = False
+) -> List[List[Tuple]]:
+    """
+    Args:
+        picked_up: if True the task has already been picked up, only the path to its goal is planned.
+
+    Returns:
+        List[List[Tuple]]: the (reversed) paths from start_position to the pickup of the task and from the pickup
+        to its goal, or only the path from start_position to the goal if picked_up.
+    """
+    if picked_up:
+        return [plan_path(planner, grid, heuristic, constraints, start_position, task.g, timestep)]
+    pos_to_pickup = plan_path(planner, grid, heuristic, constraints, start_position, task.s, timestep)
+    timestep += len(pos_to_pickup)
+    pickup_to_delivery = plan_path(planner, grid, heuristic, constraints, task.s, task.g, timestep)
+    return [pos_to_pickup, pickup_to_delivery]
+
+
+def plan_legs(
+    grid: Grid,
+    heuristic: DistanceOracle,
+    constraints: ReservationTable,
+    planner,
+    start_position: Tuple,
+    parking_position: Tuple,
+    tasks: List[Task],
+    timestep: int,
+    picked_up: bool = False
+) -> List[List[List[Tuple]]]:
+    """
+    Plan the legs of an agent that is in start_position at timestep: one leg per task (to its pickup and then to
+    its goal, only to its goal for the first task if picked_up) and the last one back to the parking position.
+    Every leg is the list of the (reversed) paths returned by the planner. The arguments are ordered as
+    PlanningPool.map expects them.
+
+    Returns:
+        List[List[List[Tuple]]]: the legs, in order.
+    """
+    legs = []
+    for index, task in enumerate(tasks):
+        task_paths = plan_task_paths(
+            planner, grid, heuristic, constraints, task, start_position, timestep, picked_up and index == 0
+        )
+        start_position = task.g
+        timestep += sum(len(path) for path in task_paths)
+        legs.append(task_paths)
+    legs.append([
+        planner.plan(
+            start_position=start_position,
+            target_position=parking_position,
+            grid=grid,
+            constraints=constraints,
+            timestep=timestep,
+            heuristic=heuristic
+        )
+    ])
+    return legs
+
+
 class PrioritizedTaskPlanning(Algorithm):
-    LKH_PATH = "planner/LKH-3.0.9"
-    PROBLEM_FILE_NAME = "problem.tsp"
-    PARAMETER_FILE_NAME = "parameters.par"
-    TOUR_FILE_NAME = "solution.tour"
-    OUTPUT_TOUR_FILE_NAME = "out_solution.tour"
-    PROBLEM_FILE = os.path.join(LKH_PATH, PROBLEM_FILE_NAME) 
-    PARAMETER_FILE = os.path.join(LKH_PATH, PARAMETER_FILE_NAME)
-    TOUR_FILE = os.path.join(LKH_PATH, TOUR_FILE_NAME)
-    OUTPUT_TOUR_FILE = os.path.join(LKH_PATH, OUTPUT_TOUR_FILE_NAME)
-    LKH_EXECUTABLE = os.path.join(LKH_PATH, "LKH")
-
-    PARAMETER_VALUES = {
-        "PROBLEM_FILE": f"{PROBLEM_FILE}",
-        "TIME_LIMIT": "100",
-        "TRACE_LEVEL": "1",
-        "TOUR_FILE": f"{TOUR_FILE}",
-        "OUTPUT_TOUR_FILE": f"{OUTPUT_TOUR_FILE}",
-        "RUNS" : "10",
-        "SEED": "123",
-        "MOVE_TYPE": "5",
-        "PATCHING_C": "3",
-        "MAKESPAN" : "YES",
-        "POPULATION_SIZE" : "10"
-    }
-    PROBLEM_VALUES = {
-        "NAME": "TA-Prioritized",
-        "COMMENT": "TA-prioritized",
-        "TYPE": "ATSP",
-        "DIMENSION": "", # this has to be changed with len(agents) + len(tasks)
-        "EDGE_WEIGHT_TYPE": "EXPLICIT",
-        "EDGE_WEIGHT_FORMAT": "FULL_MATRIX",
-    }
-
-    def __init__(self, agents: List[Agent], grid: Grid, tasks: List[Task]):
+    LOCAL_SEARCH_SIZE = 200  # largest ATSP solved by the local search when the solver is "auto"
+
+    def __init__(
+        self,
+        agents: List[Agent],
+        grid: Grid,
+        tasks: List[Task],
+        path_planner: str = "a_star",
+        lkh: Optional[LKHRunner] = None,
+        atsp_solver: str = "auto",
+        local_search: Optional[ATSPSolver] = None,
+        workers: int = 0,
+        online: bool = False,
+        reoptimize_interval: Optional[int] = None,
+        reoptimize_imbalance: Optional[float] = 1.5
+    ):
+        """
+        lkh: runner of the LKH solver used to assign the tasks, LKHRunner() (time limit 100s, seed 123) if None.
+        atsp_solver: solver of the ATSP that assigns the tasks, "lkh", "local_search" or "auto" (the default): the
+            local search for instances of at most LOCAL_SEARCH_SIZE nodes, LKH for larger ones. The local search
+            is also used if the LKH executable is missing or fails.
+        local_search: the in-process solver, ATSPSolver() (makespan objective, 50 kicks, no time limit) if None.
+        workers: if greater than 1, the agents planned in the same round of prioritized planning (against the same
+            reservations) are planned in parallel by a persistent pool of `workers` processes. These legs are planned
+            without the route cache in every mode, so the paths are the same for any number of workers.
+        online: if True, the tasks given to add_tasks are inserted in the tours of the agents at the cheapest
+            position (see insert_task) and only the agents whose tours changed are replanned, from their current
+            positions. Otherwise the algorithm is offline, every task must be given when it is created.
+        reoptimize_interval: in online mode, the tasks not started yet are assigned again with the ATSP (and every
+            agent is replanned) when tasks arrive at least this many timesteps after the last assignment, None to
+            never do it periodically. Default is None.
+        reoptimize_imbalance: in online mode, the tasks not started yet are also assigned again when the longest
+            estimated remaining tour is longer than this factor times the average one, and it has tasks that can be
+            moved, None to never do it. Default is 1.5.
+        """
+        if atsp_solver not in ("auto", "lkh", "local_search"):
+            raise ValueError(f"Unknown ATSP solver [{atsp_solver}]")
+        self.lkh = lkh if lkh is not None else LKHRunner()
+        self.atsp_solver = atsp_solver
+        self.local_search = local_search if local_search is not None else ATSPSolver()
         self.agents = {i: PrioritizedAgent(agent) for i, agent in enumerate(agents)}
         self.grid = grid
+        self.path_planner = PathCache(get_planner(path_planner))
+        self.distance_oracle = DistanceOracle(grid)
         self.tasks = tasks
-        self.graph = self.build_graph()
+        self.online = online
+        self.reoptimize_interval = reoptimize_interval
+        self.reoptimize_imbalance = reoptimize_imbalance
         self.timestep = 0
         self.makespan = -1
+        self.last_assignment = 0
+        self.graph = self.build_graph()
         task_assignment = self.assign_tasks_to_agents()
         for ag_k in task_assignment:
             if task_assignment[ag_k]:
                 self.agents[ag_k].assigned_tasks = task_assignment[ag_k]
                 first_task = task_assignment[ag_k][0]
                 self.agents[ag_k].agent.assign_pickup_delivery(first_task.s, first_task.g)
-        constraint_set = set()
-        cur_agents_paths = {
-            agent_key: self.find_path_for_agent(
-                    self.agents[agent_key], 
-                    self.timestep,
-                    task_assignment[agent_key],
-                    set()
-                ) 
-                for agent_key in task_assignment
-        }
+        pool = get_planning_pool(grid, workers, self.distance_oracle) if workers > 1 else None
+        constraint_set = ReservationTable()
+        agents_legs = self.find_legs_for_agents(
+            task_assignment, {agent_key: [] for agent_key in task_assignment}, constraint_set, pool
+        )
+        cur_agents_paths = {agent_key: self.join_legs(agents_legs[agent_key]) for agent_key in agents_legs}
         open_agent_set = set(cur_agents_paths.keys())
         while open_agent_set:
             cur_agent = max(open_agent_set, key=lambda ag : len(cur_agents_paths[ag]))
-            constraint_set |= set(pos for pos in cur_agents_paths[cur_agent])
-            constraint_set |= set((pos, t + 1) for pos, t in cur_agents_paths[cur_agent])
+            constraint_set.add_path(cur_agent, cur_agents_paths[cur_agent])
             open_agent_set.remove(cur_agent)
-            for agent_key in open_agent_set:
-                cur_agents_paths[agent_key] = self.find_path_for_agent(
-                    self.agents[agent_key],
-                    self.timestep,
-                    task_assignment[agent_key],
-                    constraint_set
-                ) 
+            # the other paths already avoid the agents fixed before, only the new reservations are checked and
+            # an agent is replanned from its first leg that conflicts with them
+            new_reservations = ReservationTable()
+            new_reservations.add_path(cur_agent, cur_agents_paths[cur_agent])
+            kept_legs = {}
+            for agent_key in sorted(open_agent_set):
+                first_leg = self.first_conflicting_leg(agents_legs[agent_key], new_reservations)
+                if first_leg is not None:
+                    kept_legs[agent_key] = agents_legs[agent_key][:first_leg]
+            replanned = self.find_legs_for_agents(task_assignment, kept_legs, constraint_set, pool)
+            for agent_key, legs in replanned.items():
+                agents_legs[agent_key] = legs
+                cur_agents_paths[agent_key] = self.join_legs(legs)
         for agent_key in cur_agents_paths:
             self.agents[agent_key].assign_path(cur_agents_paths[agent_key])
          
@@ -131,99 +247,349 @@ class PrioritizedTaskPlanning(Algorithm):
         agent: PrioritizedAgent,
         cur_timestep: int,
         task_list: List[Task],
-        constraint_set: Set[Tuple[Tuple,int]],
-        current_position: Tuple = ()
+        constraint_set: ReservationTable,
+        current_position: Tuple = (),
+        picked_up: bool = False
     ) -> List[Tuple]: 
-        timestep = cur_timestep
-        cur_agent_position = current_position if current_position else agent.parking_position
-        path_for_cur_agent = []
-        for task in task_list:
-            task_path = self.find_path_for_task(task,cur_agent_position,timestep,constraint_set)
-            cur_agent_position = task.g
-            timestep += len(task_path)
-            path_for_cur_agent = task_path + path_for_cur_agent
-
-        path_to_park = self.find_path_for_parking_location(agent.parking_position, cur_agent_position, timestep, constraint_set)
-        path_for_cur_agent = path_to_park + path_for_cur_agent
-        return path_for_cur_agent
+        return self.join_legs(
+            self.find_legs_for_agent(
+                agent, cur_timestep, task_list, constraint_set, current_position, picked_up=picked_up
+            )
+        )
+
+    def find_legs_for_agent(
+        self,
+        agent: PrioritizedAgent,
+        cur_timestep: int,
+        task_list: List[Task],
+        constraint_set: ReservationTable,
+        current_position: Tuple = (),
+        kept_legs: List[List[List[Tuple]]] = (),
+        picked_up: bool = False
+    ) -> List[List[List[Tuple]]]:
+        """
+        Plan the path of an agent as a list of legs, one per task (to its pickup and then to its goal) and the last
+        one back to the parking position. Every leg is the list of the (reversed) paths returned by the planner.
+
+        Args:
+            kept_legs: legs already planned for the first tasks, they are kept and the following legs are planned
+                from where they end.
+            picked_up: if True the first task has already been picked up, its leg only goes to its goal.
+
+        Returns:
+            List[List[List[Tuple]]]: the legs of the path, in order.
+        """
+        start_position, timestep = self.legs_end(agent, cur_timestep, task_list, kept_legs, current_position)
+        return list(kept_legs) + plan_legs(
+            self.grid,
+            self.distance_oracle,
+            constraint_set,
+            self.path_planner,
+            start_position,
+            agent.parking_position,
+            task_list[len(kept_legs):],
+            timestep,
+            picked_up and not kept_legs
+        )
+
+    def find_legs_for_agents(
+        self,
+        task_assignment: Dict[int, List[Task]],
+        kept_legs: Dict[int, List[List[List[Tuple]]]],
+        constraint_set: ReservationTable,
+        pool: Optional[PlanningPool] = None
+    ) -> Dict[int, List[List[List[Tuple]]]]:
+        """
+        Plan the legs of every agent in kept_legs after the legs kept for it, against the same reservations,
+        serially or in the workers of pool (which receive constraint_set once), with the same planner.
+
+        Returns:
+            Dict[int, List[List[List[Tuple]]]]: the legs of every agent in kept_legs.
+        """
+        # the legs are planned without the route cache in both modes, so that they do not depend on the number of
+        # workers (a cached route may differ from the one the planner returns among equally short routes)
+        requests = []
+        for agent_key, kept in kept_legs.items():
+            agent = self.agents[agent_key]
+            start_position, timestep = self.legs_end(agent, self.timestep, task_assignment[agent_key], kept)
+            requests.append((
+                self.path_planner.planner,
+                start_position,
+                agent.parking_position,
+                task_assignment[agent_key][len(kept):],
+                timestep
+            ))
+        if pool is None:
+            planned = [plan_legs(self.grid, self.distance_oracle, constraint_set, *request) for request in requests]
+        else:
+            planned = pool.map(plan_legs, requests, constraint_set)
+        return {agent_key: kept_legs[agent_key] + legs for agent_key, legs in zip(kept_legs, planned)}
+
+    @staticmethod
+    def legs_end(
+        agent: PrioritizedAgent,
+        cur_timestep: int,
+        task_list: List[Task],
+        legs: List[List[List[Tuple]]],
+        current_position: Tuple = ()
+    ) -> Tuple[Tuple, int]:
+        """
+        Returns:
+            Tuple[Tuple, int]: the position and the timestep where the legs planned for the first tasks of
+            task_list end, the position of the agent and cur_timestep if there are no legs.
+        """
+        timestep = cur_timestep + sum(len(path) for leg in legs for path in leg)
+        if legs:
+            return task_list[len(legs) - 1].g, timestep
+        return (current_position if current_position else agent.parking_position), timestep
+
+    @staticmethod
+    def join_legs(legs: List[List[List[Tuple]]]) -> List[Tuple]:
+        """
+        Returns:
+            List[Tuple]: the (reversed) path made of the given legs.
+        """
+        path = []
+        for leg in reversed(legs):
+            for leg_path in reversed(leg):
+                path.extend(leg_path)
+        return path
+
+    @staticmethod
+    def first_conflicting_leg(legs: List[List[List[Tuple]]], reservations: ReservationTable) -> Optional[int]:
+        """
+        Returns:
+            Optional[int]: index of the first leg that violates the reservations, with the same checks of the
+            planners and of plan_path: the start of a path is checked, except the first one (the position of the
+            agent), and if it is reserved the leg arriving there is the conflicting one. None if there is no such
+            leg.
+        """
+        for index, leg in enumerate(legs):
+            for path_index, leg_path in enumerate(leg):
+                start, start_timestep = leg_path[-1]
+                if (index or path_index) and reservations.is_vertex_reserved(start, start_timestep):
+                    return index if path_index else index - 1
+                for (position, timestep), (previous, _) in zip(leg_path, leg_path[1:]):
+                    if (
+                        reservations.is_vertex_reserved(position, timestep) or
+                        reservations.is_edge_reserved(previous, position, timestep - 1)
+                    ):
+                        return index
+        return None
         
     def find_path_for_task(
         self,
         task: Task,
         cur_agent_position: Tuple,
         timestep: int,
-        constraint_set: Set[Tuple[Tuple, int]],
+        constraint_set: ReservationTable,
     ) -> List[Tuple]:
-        pos_to_pickup = AStarPlanner.plan(
-        start_position=cur_agent_position,
-            target_position=task.s,
-            grid=self.grid,
-            constraints=constraint_set,
-            timestep=timestep
+        pos_to_pickup, pickup_to_delivery = self.find_paths_for_task(
+            task, cur_agent_position, timestep, constraint_set
         )
-        timestep += len(pos_to_pickup)
-        pickup_to_delivery = AStarPlanner.plan(
-            start_position=task.s,
-            target_position=task.g,
-            grid=self.grid,
-            constraints=constraint_set,
-            timestep=timestep
+        return pickup_to_delivery + pos_to_pickup
+
+    def find_paths_for_task(
+        self,
+        task: Task,
+        cur_agent_position: Tuple,
+        timestep: int,
+        constraint_set: ReservationTable,
+    ) -> List[List[Tuple]]:
+        """
+        Returns:
+            List[List[Tuple]]: the (reversed) paths to the pickup of the task and from the pickup to its goal.
+        """
+        return plan_task_paths(
+            self.path_planner, self.grid, self.distance_oracle, constraint_set, task, cur_agent_position, timestep
         )
-        return pickup_to_delivery + pos_to_pickup 
 
     def find_path_for_parking_location(
             self,
             parking_position: Tuple,
             cur_agent_position: Tuple,
             timestep: int,
-            constraint_set: Set[Tuple[Tuple, int]],
+            constraint_set: ReservationTable,
             ) -> List[Tuple]:
         
-        return AStarPlanner.plan(
+        return self.path_planner.plan(
             start_position=cur_agent_position,
             target_position=parking_position,
             grid=self.grid,
             constraints=constraint_set,
-            timestep=timestep
+            timestep=timestep,
+            heuristic=self.distance_oracle
         )
 
     def add_tasks(self, tasks: List[Task]):
         self.tasks += tasks
+        if not self.online or not tasks:
+            return
+        self.makespan = -1
+        # time every agent needs to complete its path, the cost of every insertion is added to it
+        remaining = {agent_key: len(agent.agent.command_queue) for agent_key, agent in self.agents.items()}
+        changed_agents = set()
+        for task in tasks:
+            agent_key, cost = self.insert_task(task, remaining)
+            remaining[agent_key] += cost
+            changed_agents.add(agent_key)
+        if self.should_reassign(remaining):
+            self.reassign_tasks()
+        else:
+            self.replan_agents(sorted(changed_agents))
 
-    def lkh_solve(self, distance_matrix) -> List[int]:
-        import time
-        # writing parameter file
-        with open(self.PARAMETER_FILE, 'w+') as parameter_file:
-            #parameter_file.write("SPECIAL\n")
-            for key, value in self.PARAMETER_VALUES.items():
-                parameter_file.write(key + " = " + value + "\n")
-        # writing problem file
-        with open(self.PROBLEM_FILE, 'w+') as problem_file:
-            self.PROBLEM_VALUES["DIMENSION"] = str(len(distance_matrix))
-            for key, value in self.PROBLEM_VALUES.items():
-                problem_file.write(key + " : " + value + "\n")
-            problem_file.write("EDGE_WEIGHT_SECTION\n")
-            for row in distance_matrix:
-                problem_file.write(" ".join(str(int(val)) for val in row) + "\n")
-            #problem_file.write("TIME_WINDOW_SECTION\n")
-            #for i in range(len(self.agents)):
-            #    problem_file.write(f"{i+1} {-1} {10000}\n")
-            #for i, task in enumerate(self.tasks):
-            #    problem_file.write(f"{i + len(self.agents) + 1} {task.r} {10000}\n")
-
-            problem_file.write("EOF\n")
+    def insert_task(self, task: Task, remaining: Dict[int, int]) -> Tuple[int, int]:
+        """
+        Insert a released task in the tour of an agent, after the task the agent is executing. The position is
+        the one giving the smallest estimated makespan (the longest remaining time of the agents), ties broken by
+        the smallest cost, the increase of the weight of the tour in the task-agent graph (see build_graph).
+
+        Args:
+            remaining: estimated time every agent needs to complete its path.
+
+        Returns:
+            Tuple[int, int]: the agent the task has been assigned to and the cost of the insertion.
+        """
+        candidates = []  # (agent, index of the task in its tour, goal of the previous task, next task)
+        for agent_key, agent in self.agents.items():
+            agent_tasks = agent.assigned_tasks
+            if agent.current_task_index >= len(agent_tasks):
+                candidates.append((agent_key, len(agent_tasks), agent.position, None))
+            for index in range(agent.current_task_index + 1, len(agent_tasks) + 1):
+                next_task = agent_tasks[index] if index < len(agent_tasks) else None
+                candidates.append((agent_key, index, agent_tasks[index - 1].g, next_task))
+        previous = np.array([candidate[2] for candidate in candidates], dtype=np.int64).reshape(-1, 2)
+        has_next = np.array([candidate[3] is not None for candidate in candidates])
+        cost = self.distance_oracle.distances(previous, task.s) + self.distance_oracle.distance(task.s, task.g)
+        if has_next.any():
+            next_pickups = np.array([c[3].s for c in candidates if c[3] is not None], dtype=np.int64).reshape(-1, 2)
+            cost[has_next] += (
+                self.distance_oracle.pairwise_distances(np.array([task.g]), next_pickups)[0] -
+                self.distance_oracle.paired_distances(previous[has_next], next_pickups)
+            )
+        agent_remaining = np.array([remaining[candidate[0]] for candidate in candidates]) + cost
+        best = np.lexsort((cost, np.maximum(max(remaining.values()), agent_remaining)))[0]
+        agent_key, index, _, _ = candidates[best]
+        agent = self.agents[agent_key]
+        agent.assigned_tasks.insert(index, task)
+        if index == agent.current_task_index:
+            agent.has_finished_all_tasks = False
+            agent.agent.assign_pickup_delivery(task.s, task.g)
+        return agent_key, int(cost[best])
 
+    def should_reassign(self, remaining: Dict[int, int]) -> bool:
+        """
+        Returns:
+            bool: True if the tasks not started yet have to be assigned again, periodically or because the tours
+            built by insert_task are unbalanced.
+        """
+        if self.reoptimize_interval is not None and self.timestep - self.last_assignment >= self.reoptimize_interval:
+            return True
+        if self.reoptimize_imbalance is None:
+            return False
+        longest = max(remaining, key=remaining.get)
+        agent = self.agents[longest]
+        average = sum(remaining.values()) / len(remaining)
+        # only the tasks after the one the agent is executing can be moved to other agents
+        return (
+            remaining[longest] > self.reoptimize_imbalance * average and
+            len(agent.assigned_tasks) - agent.current_task_index > 1
+        )
+
+    def reassign_tasks(self) -> None:
+        """
+        Assign again the tasks not started yet, solving the ATSP of the task-agent graph built from the current
+        state: an agent executing a task keeps it and starts from its goal, once it has completed it. Then every
+        agent is replanned.
+        """
+        print("Assigning again the tasks not started")
+        kept_tasks, pending, starts, ready_times = {}, [], [], []
+        for agent_key, agent in self.agents.items():
+            index = agent.current_task_index
+            kept_tasks[agent_key] = agent.assigned_tasks[:index + 1]
+            pending += agent.assigned_tasks[index + 1:]
+            if index < len(agent.assigned_tasks):
+                task = agent.assigned_tasks[index]
+                ready_time = self.distance_oracle.distance(agent.position, task.g)
+                if agent.status == AgentStatus.pickup:
+                    ready_time = self.distance_oracle.distance(agent.position, task.s) + \
+                        self.distance_oracle.distance(task.s, task.g)
+                starts.append(task.g)
+                ready_times.append(ready_time)
+            else:
+                starts.append(agent.position)
+                ready_times.append(0)
+        self.graph = self.build_graph(pending, starts, ready_times)
+        task_assignment = self.assign_tasks_to_agents()
+        for agent_key, agent in self.agents.items():
+            agent.assigned_tasks = kept_tasks[agent_key] + task_assignment.get(agent_key, [])
+            if agent.current_task_index < len(agent.assigned_tasks):
+                task = agent.assigned_tasks[agent.current_task_index]
+                agent.has_finished_all_tasks = False
+                agent.agent.assign_pickup_delivery(task.s, task.g)
+        self.last_assignment = self.timestep
+        self.replan_agents(list(self.agents))
+
+    def replan_agents(self, agent_keys: List[int]) -> None:
+        """
+        Replan the paths of the given agents, from their current positions, one after the other: each of them
+        avoids the paths of the other agents and of the agents replanned before it.
+        """
+        # the agents are where the previous timestep left them, the paths start there and their first step
+        # (the current position) is not executed
+        timestep = self.timestep - 1
+        reservations = ReservationTable()
+        for agent_key, agent in self.agents.items():
+            if agent_key not in agent_keys:
+                reservations.add_path(agent_key, self.remaining_path(agent))
+        for agent_key in agent_keys:
+            agent = self.agents[agent_key]
+            agent_tasks = agent.assigned_tasks[agent.current_task_index:]
+            # a task that has been picked up only has to be delivered, from the current position
+            picked_up = bool(agent_tasks) and agent.status == AgentStatus.delivery
+            path = self.find_path_for_agent(agent, timestep, agent_tasks, reservations, agent.position, picked_up)
+            reservations.add_path(agent_key, path)
+            agent.assign_path(path[:-1])
+
+    def remaining_path(self, agent: PrioritizedAgent) -> List[Tuple]:
+        """
+        Returns:
+            List[Tuple]: the (reversed) path the agent has not executed yet, starting from its current position at
+            the previous timestep.
+        """
+        queue = agent.agent.command_queue
+        path = [(command["move_to"], self.timestep + len(queue) - 1 - i) for i, command in enumerate(queue)]
+        return path + [(agent.position, self.timestep - 1)]
+
+    def lkh_solve(self, distance_matrix) -> List[int]:
         print("solving using LKH")
-        os.system(self.LKH_EXECUTABLE + " " + self.PARAMETER_FILE)
-        print("LKH solver returned, waiting 2 seconds for file to write...")
-        time.sleep(2)
-        print("Opening generated tour file...")
-        with open(self.TOUR_FILE, 'r') as solution_file:
-            while not "TOUR_SECTION" in solution_file.readline():
-                pass
-            tour = [int(s) - 1 for s in solution_file.readlines()[:-2]]
-            tour += [tour[0]]
-        return tour
+        tour = self.lkh.solve(distance_matrix)
+        return tour + [tour[0]]
+
+    def local_search_solve(self, distance_matrix) -> List[int]:
+        print("solving using local search")
+        tour = self.local_search.solve(distance_matrix, num_agents=len(self.agents))
+        return tour + [tour[0]]
+
+    def atsp_solve(self, distance_matrix) -> List[int]:
+        """
+        Solve the ATSP with the configured solver, falling back to the local search if LKH is not available.
+
+        Returns:
+            List[int]: the hamiltonian cycle, starting and ending at node 0.
+        """
+        use_lkh = self.atsp_solver == "lkh" or (
+            self.atsp_solver == "auto" and len(distance_matrix) > self.LOCAL_SEARCH_SIZE
+        )
+        if use_lkh and not self.lkh.is_available():
+            print(f"LKH executable {self.lkh.executable} not found, falling back to local search")
+            use_lkh = False
+        if use_lkh:
+            try:
+                return self.lkh_solve(distance_matrix)
+            except LKHError as error:
+                print(f"LKH failed, falling back to local search: {error}")
+        return self.local_search_solve(distance_matrix)
 
     @timeit
     def assign_tasks_to_agents(self) -> Dict[int, List[Task]]:
@@ -237,7 +603,7 @@ class PrioritizedTaskPlanning(Algorithm):
 
         distance_matrix = distance_matrix.tolist()
 
-        hamiltonian_cycle = self.lkh_solve(distance_matrix)
+        hamiltonian_cycle = self.atsp_solve(distance_matrix)
         current_agent = -1
         task_assignment = {}
         for node in hamiltonian_cycle:
@@ -251,43 +617,51 @@ class PrioritizedTaskPlanning(Algorithm):
         print({agent: len(task_assignment[agent]) for agent in task_assignment})
         return task_assignment 
 
-    def compute_weight(self, vertex1: TaskAgentVertex, vertex2: TaskAgentVertex):
-        vertex1_is_agent = isinstance(vertex1.data, int)
-        vertex2_is_agent = isinstance(vertex2.data, int)
-        if not vertex2_is_agent:
-            if vertex1_is_agent:  # vertex1 is an agent, vertex2 is a task
-                assert isinstance(vertex1.data, int)
-                assert isinstance(vertex2.data, Task)
-                return max(
-                    manhattan_distance(self.agents[vertex1.data].parking_position, vertex2.data.s),
-                    vertex2.data.r
-                )
-            assert isinstance(vertex1.data, Task)
-            assert isinstance(vertex2.data, Task)
-            return (  # vertex1 is a task, vertex2 is a task
-                    manhattan_distance(vertex1.data.s, vertex1.data.g) +
-                    manhattan_distance(vertex1.data.g, vertex2.data.s) 
-            )
-        if not vertex1_is_agent:  # vertex1 is a task , vertex2 is an agent
-            assert isinstance(vertex1.data, Task)
-            return manhattan_distance(vertex1.data.s, vertex1.data.g)
-        # vertex1 is an agent, vertex2 is an agent
-        return 0
-
-    def build_graph(self) -> TaskAgentGraph:
-        graph = TaskAgentGraph()
-        nodes = 0
-        for agent in self.agents:
-            graph.add_vertex(TaskAgentVertex(nodes, agent))
-            nodes += 1
-        for task in self.tasks:
-            graph.add_vertex(TaskAgentVertex(nodes, task))
-            nodes += 1
-        for vertex1, vertex2 in product(graph.vertices, repeat=2):
-            graph.add_edge(TaskAgentEdge(vertex1, vertex2, self.compute_weight(vertex1, vertex2)))
-        return graph
+    def build_graph(
+        self,
+        tasks: Optional[List[Task]] = None,
+        starts: Optional[List[Tuple]] = None,
+        ready_times: Optional[List[int]] = None
+    ) -> TaskAgentGraph:
+        """
+        Build the graph of the ATSP whose tour assigns the tasks: the weight of the edge
+        - from an agent to a task is the time the agent needs to reach the pickup from its parking position, not
+          less than the release time of the task;
+        - from a task to a task is the time needed to deliver the first task and reach the pickup of the second;
+        - from a task to an agent is the time needed to deliver the task;
+        - from an agent to an agent is 0.
+        The matrix is computed from the arrays of the parking positions and of the pickups, goals and release times
+        of the tasks, a distance field is looked up once per distinct pickup and goal.
 
-    def update(self):
+        Args:
+            tasks: the tasks to assign, self.tasks if None.
+            starts: the positions the agents start from, their parking positions if None.
+            ready_times: the time (from the current timestep) after which the agents are at their start positions,
+                0 if None. The release times are also taken from the current timestep.
+        """
+        tasks = self.tasks if tasks is None else tasks
+        agents = list(self.agents)
+        if starts is None:
+            starts = [self.agents[agent].parking_position for agent in agents]
+        starts = np.array(starts, dtype=np.int64).reshape(-1, 2)
+        ready_times = np.zeros(len(agents), dtype=np.int64) if ready_times is None else np.array(ready_times)
+        pickups = np.array([task.s for task in tasks], dtype=np.int64).reshape(-1, 2)
+        goals = np.array([task.g for task in tasks], dtype=np.int64).reshape(-1, 2)
+        releases = np.array([task.r for task in tasks], dtype=np.int64)
+        delivery = self.distance_oracle.paired_distances(pickups, goals)
+        distance_matrix = np.zeros((len(agents) + len(tasks),) * 2, dtype=np.int64)
+        distance_matrix[:len(agents), len(agents):] = np.maximum(
+            ready_times[:, None] + self.distance_oracle.pairwise_distances(starts, pickups),
+            releases[None, :] - self.timestep
+        )
+        distance_matrix[len(agents):, len(agents):] = (
+            delivery[:, None] + self.distance_oracle.pairwise_distances(goals, pickups)
+        )
+        distance_matrix[len(agents):, :len(agents)] = delivery[:, None]
+        return TaskAgentGraph(agents, tasks, distance_matrix)
+
+    def update(self, budget: Optional[PlanningBudget] = None):
+        # every path is planned when the algorithm is created, the ticks do not plan
         if self.makespan == -1:
             if all([agent.has_finished_all_tasks for agent in self.agents.values()]):
                 self.makespan = self.timestep
@@ -0,0 +1,141 @@
+from typing import Dict, Hashable, Iterable, List, Tuple, Union, Set, Optional
+
+
+class ReservationTable:
+    """
+    Time-indexed table of vertex and edge reservations.
+
+    Vertex reservations are stored as {timestep: {position: count}}, edge reservations as
+    {timestep: {(position1, position2): count}}, where an edge reserved at timestep t forbids moving from
+    position1 (at time t) to position2 (at time t + 1). Reservations are counted, so that the same cell can be
+    reserved by more than one owner, and the reservations made by each owner are remembered so that they can be
+    removed incrementally when the owner's path changes.
+    The vertex reservations are also indexed by position, {position: {timestep: count}}, so that the reserved
+    timesteps of a cell (e.g. to compute its safe intervals) can be retrieved without scanning the table.
+    A table can be layered on top of a base table, whose reservations are then shared and never modified, e.g. the
+    constraints of a single agent on top of the obstacles shared by every agent.
+    """
+
+    def __init__(self, base: Optional["ReservationTable"] = None):
+        self.base = base
+        self.vertices: Dict[int, Dict[Tuple, int]] = {}
+        self.edges: Dict[int, Dict[Tuple[Tuple, Tuple], int]] = {}
+        self.positions: Dict[Tuple, Dict[int, int]] = {}
+        self.owners: Dict[Hashable, List[Tuple]] = {}
+
+    @classmethod
+    def from_constraints(
+        cls,
+        constraints: Iterable[Tuple],
+        base: Optional["ReservationTable"] = None
+    ) -> "ReservationTable":
+        """
+        Build a table from a collection of constraints, (position, timestep) for vertex constraints and
+        (position1, position2, timestep) for edge constraints, optionally layered on top of base.
+        """
+        table = cls(base)
+        for constraint in constraints:
+            table._reserve(constraint)
+        return table
+
+    def is_vertex_reserved(self, position: Tuple, timestep: int) -> bool:
+        reserved = self.vertices.get(timestep)
+        if reserved is not None and position in reserved:
+            return True
+        return self.base is not None and self.base.is_vertex_reserved(position, timestep)
+
+    def is_edge_reserved(self, position1: Tuple, position2: Tuple, timestep: int) -> bool:
+        reserved = self.edges.get(timestep)
+        if reserved is not None and (position1, position2) in reserved:
+            return True
+        return self.base is not None and self.base.is_edge_reserved(position1, position2, timestep)
+
+    def reserved_timesteps(self, position: Tuple) -> List[int]:
+        """
+        Returns:
+            List[int]: sorted list of the timesteps at which position is reserved.
+        """
+        if self.base is None:
+            return sorted(self.positions.get(position, ()))
+        return sorted(set(self.positions.get(position, ())).union(self.base.reserved_timesteps(position)))
+
+    def add_constraints(self, owner: Hashable, constraints: Iterable[Tuple]) -> None:
+        """
+        Reserve the given vertex/edge constraints on behalf of owner.
+        """
+        reservations = self.owners.setdefault(owner, [])
+        for constraint in constraints:
+            self._reserve(constraint)
+            reservations.append(constraint)
+
+    def add_path(self, owner: Hashable, path: List[Tuple]) -> None:
+        """
+        Reserve the (reversed) path [(position, timestep), ...] of owner, replacing its previous reservations.
+        Every position is reserved at its timestep and at the following one, so that other agents can neither
+        occupy the same cell nor swap with (or follow) the owner.
+        """
+        self.remove_path(owner)
+        self.add_constraints(
+            owner,
+            [(pos, t + dt) for pos, t in path for dt in (0, 1)]
+        )
+
+    def remove_path(self, owner: Hashable) -> None:
+        """
+        Remove every reservation made by owner, if any.
+        """
+        for constraint in self.owners.pop(owner, []):
+            self._release(constraint)
+
+    def __len__(self):
+        return (
+            sum(len(v) for v in self.vertices.values()) +
+            sum(len(e) for e in self.edges.values()) +
+            (len(self.base) if self.base is not None else 0)
+        )
+
+    def _reserve(self, constraint: Tuple) -> None:
+        table, timestep, key = self._locate(constraint)
+        self._increment(table, timestep, key)
+        if table is self.vertices:
+            self._increment(self.positions, key, timestep)
+
+    def _release(self, constraint: Tuple) -> None:
+        table, timestep, key = self._locate(constraint)
+        self._decrement(table, timestep, key)
+        if table is self.vertices:
+            self._decrement(self.positions, key, timestep)
+
+    @staticmethod
+    def _increment(table: Dict, index: Hashable, key: Hashable) -> None:
+        reserved = table.setdefault(index, {})
+        reserved[key] = reserved.get(key, 0) + 1
+
+    @staticmethod
+    def _decrement(table: Dict, index: Hashable, key: Hashable) -> None:
+        reserved = table[index]
+        if reserved[key] > 1:
+            reserved[key] -= 1
+        else:
+            del reserved[key]
+            if not reserved:
+                del table[index]
+
+    def _locate(self, constraint: Tuple) -> Tuple[Dict, int, Tuple]:
+        if len(constraint) == 2:  # VERTEX
+            position, timestep = constraint
+            return self.vertices, timestep, position
+        elif len(constraint) == 3:  # EDGE
+            position1, position2, timestep = constraint
+            return self.edges, timestep, (position1, position2)
+        raise ValueError(f"Invalid constraint {constraint}")
+
+
+def as_reservation_table(constraints: Union[ReservationTable, Set[tuple], None]) -> ReservationTable:
+    """
+    Returns the given constraints as a ReservationTable, sets of (position, timestep) and
+    (position1, position2, timestep) constraints are converted.
+    """
+    if isinstance(constraints, ReservationTable):
+        return constraints
+    return ReservationTable.from_constraints(constraints if constraints is not None else ())
@@ -0,0 +1,157 @@
+from heapq import heappush, heappop
+from itertools import count
+from math import inf
+from typing import Tuple, Set, Dict, Callable, Union, List, Optional
+from simulator import Grid
+from .a_star_planner import AStarPlanner, manhattan_distance
+from .budget import PlanningBudget
+from .reservation_table import ReservationTable, as_reservation_table
+
+
+class SIPPNode:
+    """
+    Search node of SIPP: the agent arrives in position at timestep, within the safe interval interval_index
+    of that position.
+    """
+
+    def __init__(self, position: Tuple, interval_index: int, timestep: int, parent: Optional["SIPPNode"] = None):
+        self.position = position
+        self.interval_index = interval_index
+        self.timestep = timestep
+        self.parent = parent
+
+    @property
+    def state(self) -> Tuple[Tuple, int]:
+        return self.position, self.interval_index
+
+
+class SIPPPlanner:
+    """
+    Safe Interval Path Planning.
+
+    The free time of every cell is collapsed into safe intervals, maximal contiguous ranges of timesteps in which
+    the cell is not reserved, and the search is performed over (cell, safe interval) states, where the cost of a
+    state is the earliest arrival time in the interval. Waiting is implicit, so the number of states does not grow
+    with the time the agent has to wait. It has the same contract of AStarPlanner.plan and returns paths in the same
+    reversed [(position, timestep), ...] format.
+    """
+
+    @classmethod
+    def plan(
+        cls,
+        start_position: Tuple,
+        target_position: Tuple,
+        grid: Grid,
+        constraints: Union[ReservationTable, Set[tuple]] = None,
+        timestep=0,
+        get_time: bool = True,
+        heuristic: Callable[[Tuple, Tuple], int] = None,
+        budget: Optional[PlanningBudget] = None
+    ):
+        if not get_time:  # safe intervals are meaningless without time
+            return AStarPlanner.plan(
+                start_position, target_position, grid, constraints, timestep, get_time, heuristic, budget
+            )
+        heuristic = heuristic if heuristic is not None else manhattan_distance
+        reservations = as_reservation_table(constraints)
+        start_position, target_position = tuple(start_position), tuple(target_position)
+        intervals_cache: Dict[Tuple, List[Tuple[int, float]]] = {}
+
+        def safe_intervals(position: Tuple) -> List[Tuple[int, float]]:
+            if position not in intervals_cache:
+                reserved = reservations.reserved_timesteps(position)
+                if position == start_position:
+                    # the agent is already in the start position, its reservation at the start timestep is ignored
+                    reserved = [t for t in reserved if t != timestep]
+                intervals_cache[position] = cls._safe_intervals(reserved, timestep)
+            return intervals_cache[position]
+
+        start = SIPPNode(start_position, 0, timestep)
+        start_h = heuristic(start_position, target_position)
+        tie_breaker = count()
+        fringe = [(timestep + start_h, start_h, next(tie_breaker), start)]
+        best_g: Dict[Tuple, int] = {start.state: timestep}
+        closed = set()
+
+        while fringe:
+            if budget is not None:  # the search is aborted with PlanningTimeout once the deadline has passed
+                budget.check()
+            *_, n = heappop(fringe)
+            if n.state in closed or n.timestep > best_g[n.state]:  # outdated entry
+                continue
+            closed.add(n.state)
+            if n.position == target_position:
+                return cls._get_path(n)
+            _, interval_end = safe_intervals(n.position)[n.interval_index]
+            for adj_position in grid.neighbors(n.position):
+                for interval_index, (adj_start, adj_end) in enumerate(safe_intervals(adj_position)):
+                    if adj_start > interval_end + 1:
+                        break
+                    if adj_end < n.timestep + 1:
+                        continue
+                    arrival = cls._earliest_arrival(
+                        reservations,
+                        n.position,
+                        adj_position,
+                        max(n.timestep + 1, adj_start),
+                        min(interval_end + 1, adj_end)
+                    )
+                    if arrival is None:
+                        continue
+                    adj_state = (adj_position, interval_index)
+                    if adj_state in closed or (adj_state in best_g and best_g[adj_state] <= arrival):
+                        continue
+                    best_g[adj_state] = arrival
+                    adj_h = heuristic(adj_position, target_position)
+                    heappush(
+                        fringe,
+                        (arrival + adj_h, adj_h, next(tie_breaker), SIPPNode(adj_position, interval_index, arrival, n))
+                    )
+        return [(start_position, timestep)]
+
+    @staticmethod
+    def _safe_intervals(reserved_timesteps: List[int], first_timestep: int) -> List[Tuple[int, float]]:
+        """
+        Returns:
+            List[Tuple[int, float]]: sorted list of the (first, last) timesteps of the safe intervals, starting
+                from first_timestep, the last interval ends at infinity.
+        """
+        intervals = []
+        interval_start = first_timestep
+        for reserved in reserved_timesteps:
+            if reserved < interval_start:
+                continue
+            if reserved > interval_start:
+                intervals.append((interval_start, reserved - 1))
+            interval_start = reserved + 1
+        intervals.append((interval_start, inf))
+        return intervals
+
+    @staticmethod
+    def _earliest_arrival(
+        reservations: ReservationTable,
+        position: Tuple,
+        adj_position: Tuple,
+        earliest: int,
+        latest: float
+    ) -> Optional[int]:
+        """
+        Returns the earliest timestep in [earliest, latest] at which the agent can enter adj_position coming from
+        position, or None if every move in the range is forbidden by an edge reservation.
+        """
+        arrival = earliest
+        while arrival <= latest:
+            if not reservations.is_edge_reserved(position, adj_position, arrival - 1):
+                return arrival
+            arrival += 1
+        return None
+
+    @staticmethod
+    def _get_path(node: SIPPNode) -> List[Tuple]:
+        path = [(node.position, node.timestep)]
+        while node.parent:
+            parent = node.parent
+            # the agent waits in the parent position until it moves to the node position
+            path.extend((parent.position, t) for t in range(node.timestep - 1, parent.timestep - 1, -1))
+            node = parent
+        return path
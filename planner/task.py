@@ -1,12 +1,16 @@
 from typing import List, Tuple, Union
 
 class Task:
+    __slots__ = ("s", "g", "r", "_hash")
+
     def __init__(self, s: Tuple | List, g: Tuple | List, r: int = 0):
         self.s: Tuple = tuple(s)
         self.g: Tuple = tuple(g)
         self.r: int = r
+        self._hash = hash((self.s, self.g, self.r))
+
     def __hash__(self):
-        return hash(str(self.s) + str(self.g) + str(self.r))
+        return self._hash
 
     def __eq__(self, other):
         if other:
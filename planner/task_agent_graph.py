@@ -1,8 +1,11 @@
-from typing import Union, List
+from typing import Union, List, Sequence
+import numpy as np
 from .task import Task
 
 
 class TaskAgentVertex:
+    __slots__ = ("vertex_id", "data")
+
     def __init__(self, vertex_id: int, data: Union[int, Task]):
         self.vertex_id: int = vertex_id
         self.data = data
@@ -21,16 +24,19 @@ class TaskAgentVertex:
 
 
 class TaskAgentEdge:
+    __slots__ = ("v1", "v2", "weight", "_hash")
+
     def __init__(self, v1: TaskAgentVertex, v2: TaskAgentVertex, weight: float = 0):
         self.v1 = v1
         self.v2 = v2
         self.weight = weight
+        self._hash = hash((v1.vertex_id, v2.vertex_id, weight))
 
     def get_components(self):
         return self.v1, self.v2, self.weight
 
     def __hash__(self):
-        return hash(f"{self.v1.vertex_id},{self.v2.vertex_id},{self.weight}")
+        return self._hash
 
     def __eq__(self, other):
         return (
@@ -42,32 +48,31 @@ class TaskAgentEdge:
 
 
 class TaskAgentGraph:
-    def __init__(self):
-        self.vertices: List[TaskAgentVertex] = []
-        self.edges: List[TaskAgentEdge] = []
-
-    def add_vertex(self, vertex: TaskAgentVertex):
-        self.vertices.append(vertex)
-
-    def add_edge(self, edge: TaskAgentEdge):
-        if edge.v1 in self.vertices and edge.v2 in self.vertices:
-            self.edges.append(edge)
-        else:
-            raise RuntimeError("In order to add an edge, its vertices must first be added to the graph")
-
-    def get_distance_matrix(self):
-        # empty_matrix = [[0 for _ in self.vertices] for _ in self.vertices]
-        import numpy as np
-        distance_matrix = np.zeros((len(self.vertices), len(self.vertices)))
-
-        for edge in self.edges:
-            v1, v2, weight = edge.get_components()
-            distance_matrix[v1.vertex_id][v2.vertex_id] = weight
-        # print(distance_matrix)
-        return distance_matrix
-
-    # def __getitem__(self, item):
-    #     if item in self.vertices:
-    #         return self.vertices[item]
-    #     else:
-    #         raise IndexError("The specified node is not present in the graph")
+    """
+    Complete directed graph over the agents and the tasks, backed by its (vertices, vertices) distance matrix.
+
+    The first vertices are the agents, the others are the tasks, in order: vertex i holds the key of the agent or
+    the task it stands for, the weight of the edge from vertex i to vertex j is distance_matrix[i][j].
+    """
+
+    def __init__(self, agents: Sequence[int], tasks: Sequence[Task], distance_matrix: np.ndarray):
+        if distance_matrix.shape != (len(agents) + len(tasks),) * 2:
+            raise ValueError(f"a distance matrix of shape {distance_matrix.shape} does not match the vertices")
+        self.vertices: List[TaskAgentVertex] = [
+            TaskAgentVertex(vertex_id, data) for vertex_id, data in enumerate([*agents, *tasks])
+        ]
+        self.num_agents = len(agents)
+        self.distance_matrix = distance_matrix
+
+    def is_agent(self, vertex_id: int) -> bool:
+        return vertex_id < self.num_agents
+
+    def edge(self, vertex_id1: int, vertex_id2: int) -> TaskAgentEdge:
+        return TaskAgentEdge(
+            self.vertices[vertex_id1],
+            self.vertices[vertex_id2],
+            self.distance_matrix[vertex_id1, vertex_id2].item()
+        )
+
+    def get_distance_matrix(self) -> np.ndarray:
+        return self.distance_matrix
@@ -0,0 +1,157 @@
+from heapq import heapify, heappush, heappop
+from itertools import count
+from typing import Callable, Dict, Hashable, Iterable, Iterator, Optional, Set, Tuple
+from .a_star_planner import manhattan_distance
+from .task import Task
+
+
+class TaskIndex:
+    """
+    Incrementally maintained index of the pending tasks of token passing.
+
+    Tasks are bucketed by pickup and by goal cell, and the pickup cells are also bucketed in square spatial cells
+    of bucket_size x bucket_size, so that the nearest task to a position is found by a best-first search over the
+    buckets, using the Manhattan distance to a bucket and to a pickup cell as lower bounds of the true distance.
+    The index also keeps the multiset of the endpoints (last positions of the paths) reserved by the agents, to
+    tell whether a task is clear, i.e. neither its pickup nor its goal is the endpoint of another agent.
+    Tasks are kept in insertion order, ties between tasks at the same distance are broken in that order.
+    """
+    _BUCKET, _CELL, _TASK = range(3)
+
+    def __init__(self, tasks: Iterable[Task] = (), bucket_size: int = 8):
+        self.bucket_size = bucket_size
+        self.tasks: Dict[Task, int] = {}  # task -> number of copies
+        self.order: Dict[Task, int] = {}  # task -> insertion order
+        self.by_pickup: Dict[Tuple, Set[Task]] = {}
+        self.by_goal: Dict[Tuple, Set[Task]] = {}
+        self.buckets: Dict[Tuple[int, int], Set[Tuple]] = {}  # bucket -> pickup cells
+        self.endpoints: Dict[Hashable, Tuple] = {}  # agent -> endpoint
+        self.agents_at: Dict[Tuple, Set[Hashable]] = {}  # endpoint -> agents
+        self._insertion_order = count()
+        self.extend(tasks)
+
+    def add(self, task: Task) -> None:
+        if task in self.tasks:
+            self.tasks[task] += 1
+            return
+        self.tasks[task] = 1
+        self.order[task] = next(self._insertion_order)
+        self.by_pickup.setdefault(task.s, set()).add(task)
+        self.by_goal.setdefault(task.g, set()).add(task)
+        self.buckets.setdefault(self._bucket(task.s), set()).add(task.s)
+
+    def extend(self, tasks: Iterable[Task]) -> None:
+        for task in tasks:
+            self.add(task)
+
+    def remove(self, task: Task) -> None:
+        """
+        Remove a copy of task, raises ValueError if task is not pending (as list.remove).
+        """
+        if task not in self.tasks:
+            raise ValueError(f"{task} is not a pending task")
+        self.tasks[task] -= 1
+        if self.tasks[task] > 0:
+            return
+        del self.tasks[task]
+        del self.order[task]
+        self._discard(self.by_pickup, task.s, task)
+        self._discard(self.by_goal, task.g, task)
+        if task.s not in self.by_pickup:
+            self._discard(self.buckets, self._bucket(task.s), task.s)
+
+    def set_endpoint(self, agent: Hashable, position: Tuple) -> None:
+        """
+        Reserve position as the endpoint of agent, replacing its previous endpoint.
+        """
+        if agent in self.endpoints:
+            self._discard(self.agents_at, self.endpoints[agent], agent)
+        self.endpoints[agent] = tuple(position)
+        self.agents_at.setdefault(tuple(position), set()).add(agent)
+
+    def agents_with_endpoint(self, position: Tuple) -> Set[Hashable]:
+        return self.agents_at.get(tuple(position), set())
+
+    def is_clear(self, task: Task, exempt: Callable[[Hashable], bool]) -> bool:
+        """
+        Returns:
+            bool: True if every agent whose endpoint is the pickup or the goal of task is exempt.
+        """
+        return all(
+            exempt(agent)
+            for position in (task.s, task.g)
+            for agent in self.agents_at.get(position, ())
+        )
+
+    def has_goal(self, position: Tuple) -> bool:
+        """
+        Returns:
+            bool: True if a pending task has its goal in position.
+        """
+        return tuple(position) in self.by_goal
+
+    def nearest(
+        self,
+        position: Tuple,
+        distance: Callable[[Tuple, Tuple], int],
+        is_clear: Optional[Callable[[Task], bool]] = None
+    ) -> Iterator[Task]:
+        """
+        Iterate over the pending tasks accepted by is_clear, sorted by distance from position to their pickup (ties
+        in insertion order). The tasks are generated lazily, the distances are computed only for the pickup cells
+        that can be closer than the tasks already generated.
+
+        Args:
+            distance: true distance between two positions, never smaller than the Manhattan distance.
+        """
+        # entries are (distance, kind, order, item): buckets and pickup cells, whose distance is a lower bound,
+        # are expanded before the tasks at the same distance, so that a task is generated only when no closer task
+        # can be found, the tasks at the same distance are generated in insertion order
+        tie_breaker = count()
+        frontier = [
+            (self._distance_to_bucket(position, bucket), self._BUCKET, next(tie_breaker), bucket)
+            for bucket in self.buckets
+        ]
+        heapify(frontier)
+        while frontier:
+            _, kind, _, item = heappop(frontier)
+            if kind == self._TASK:
+                yield item
+            elif kind == self._BUCKET:
+                for cell in self.buckets.get(item, ()):
+                    heappush(frontier, (manhattan_distance(position, cell), self._CELL, next(tie_breaker), cell))
+            else:
+                cell_distance = distance(position, item)
+                for task in self.by_pickup.get(item, ()):
+                    if is_clear is None or is_clear(task):
+                        heappush(frontier, (cell_distance, self._TASK, self.order[task], task))
+
+    def __contains__(self, task: Task) -> bool:
+        return task in self.tasks
+
+    def __iter__(self) -> Iterator[Task]:
+        for task, copies in list(self.tasks.items()):
+            for _ in range(copies):
+                yield task
+
+    def __len__(self) -> int:
+        return sum(self.tasks.values())
+
+    def _bucket(self, position: Tuple) -> Tuple[int, int]:
+        return position[0] // self.bucket_size, position[1] // self.bucket_size
+
+    def _distance_to_bucket(self, position: Tuple, bucket: Tuple[int, int]) -> int:
+        # Manhattan distance from position to the closest cell of the bucket
+        distance = 0
+        for coordinate, bucket_coordinate in zip(position, bucket):
+            low = bucket_coordinate * self.bucket_size
+            high = low + self.bucket_size - 1
+            distance += max(low - coordinate, 0, coordinate - high)
+        return distance
+
+    @staticmethod
+    def _discard(index: Dict, key: Hashable, value: Hashable) -> None:
+        values = index[key]
+        values.discard(value)
+        if not values:
+            del index[key]
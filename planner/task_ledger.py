@@ -0,0 +1,107 @@
+from collections import Counter
+from enum import Enum, auto
+from typing import Dict, Hashable, Iterable, Iterator, Optional, Tuple
+from .task import Task
+
+
+class TaskState(Enum):
+    PENDING = auto()    # released, no agent is heading to it
+    ASSIGNED = auto()   # an agent is heading to its pickup
+    PICKED = auto()     # an agent took it at its pickup and is delivering it
+    DELIVERED = auto()
+
+
+class TaskLedger:
+    """
+    State of every task released to an algorithm, with O(1) state queries.
+
+    Open tasks (pending or assigned) are indexed by pickup cell, in release order, and the goals of the picked
+    tasks are counted, so that the goal cells in use can be checked in O(1). A task that has been delivered stops
+    using its goal.
+    """
+
+    def __init__(self, tasks: Iterable[Task] = ()):
+        self.states: Dict[Task, TaskState] = {}
+        self.agents: Dict[Task, Hashable] = {}  # assigned and picked tasks -> agent
+        self.open: Dict[Task, None] = {}  # pending and assigned tasks, in release order
+        self.by_pickup: Dict[Tuple, Dict[Task, None]] = {}  # open tasks by pickup cell
+        self.goals_in_use: Counter = Counter()
+        self.delivered = 0
+        self.extend(tasks)
+
+    def add(self, task: Task) -> None:
+        if task in self.states:  # the same task released twice
+            return
+        self.states[task] = TaskState.PENDING
+        self.open[task] = None
+        self.by_pickup.setdefault(task.s, {})[task] = None
+
+    def extend(self, tasks: Iterable[Task]) -> None:
+        for task in tasks:
+            self.add(task)
+
+    def state(self, task: Task) -> Optional[TaskState]:
+        return self.states.get(task)
+
+    def agent(self, task: Task) -> Optional[Hashable]:
+        """
+        Returns:
+            Optional[Hashable]: the agent the task is assigned to or picked by, None if there is no such agent.
+        """
+        return self.agents.get(task)
+
+    def assign(self, task: Task, agent: Hashable) -> None:
+        """
+        Record that agent is heading to the pickup of an open task, the task stays open.
+        """
+        self._expect(task, TaskState.PENDING, TaskState.ASSIGNED)
+        self.states[task] = TaskState.ASSIGNED
+        self.agents[task] = agent
+
+    def pick(self, task: Task, agent: Hashable) -> None:
+        """
+        Record that agent took an open task at its pickup, its goal is in use until it is delivered.
+        """
+        self._expect(task, TaskState.PENDING, TaskState.ASSIGNED)
+        self.states[task] = TaskState.PICKED
+        self.agents[task] = agent
+        del self.open[task]
+        pickup_tasks = self.by_pickup[task.s]
+        del pickup_tasks[task]
+        if not pickup_tasks:
+            del self.by_pickup[task.s]
+        self.goals_in_use[task.g] += 1
+
+    def deliver(self, task: Task) -> None:
+        self._expect(task, TaskState.PICKED)
+        self.states[task] = TaskState.DELIVERED
+        del self.agents[task]
+        self.goals_in_use[task.g] -= 1
+        if not self.goals_in_use[task.g]:
+            del self.goals_in_use[task.g]
+        self.delivered += 1
+
+    def open_tasks(self) -> Iterator[Task]:
+        """
+        Iterate over the pending and assigned tasks, in release order.
+        """
+        return iter(list(self.open))
+
+    def open_at(self, pickup: Tuple) -> Iterator[Task]:
+        """
+        Iterate over the pending and assigned tasks whose pickup is in the given cell, in release order.
+        """
+        return iter(list(self.by_pickup.get(tuple(pickup), ())))
+
+    def is_goal_in_use(self, position: Tuple) -> bool:
+        return tuple(position) in self.goals_in_use
+
+    def has_open_tasks(self) -> bool:
+        return bool(self.open)
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    def _expect(self, task: Task, *states: TaskState) -> None:
+        if self.states.get(task) not in states:
+            raise ValueError(f"{task} is {self.states.get(task)}, expected one of {[s.name for s in states]}")
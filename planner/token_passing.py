@@ -1,8 +1,13 @@
-from dataclasses import dataclass
-from typing import List, Set, Callable, Tuple
+from dataclasses import dataclass, field
+from typing import List, Callable, Tuple, Optional
 from simulator import Agent, Grid
-from .a_star_planner import AStarPlanner, manhattan_distance
+from .planner_utils import get_planner
+from .path_cache import PathCache
+from .budget import PlanningBudget, PlanningTimeout
+from .distance_oracle import DistanceOracle
+from .reservation_table import ReservationTable
 from .task import Task
+from .task_index import TaskIndex
 from .algorithm import Algorithm
 
 
@@ -31,13 +36,21 @@ class TPAgent:
 @dataclass
 class Token:
     paths: dict
-    tasks: List[Task]
+    tasks: TaskIndex
     assign: dict
+    reservations: ReservationTable = field(default_factory=ReservationTable)
+
+    def set_path(self, agent: int, path: List[Tuple]):
+        self.paths[agent] = path
+        self.reservations.add_path(agent, path)
+        self.tasks.set_endpoint(agent, path[0][0])
 
 
 class TokenPassing(Algorithm):
-    def __init__(self, agents: List[Agent], grid: Grid, tasks: List[Task]):
+    def __init__(self, agents: List[Agent], grid: Grid, tasks: List[Task], path_planner: str = "a_star"):
         self.grid = grid
+        self.path_planner = PathCache(get_planner(path_planner))
+        self.distance_oracle = DistanceOracle(grid)
         self.tp_agents = {ag: TPAgent(agent) for ag, agent in enumerate(agents)}
         self.timestep = 0
         self.makespan = -1
@@ -46,21 +59,16 @@ class TokenPassing(Algorithm):
                 ag: [(self.tp_agents[ag].agent.position, self.timestep)]
                 for ag in self.tp_agents
             },
-            tasks=tasks,
+            tasks=TaskIndex(tasks),
             assign={ag: None for ag in self.tp_agents}
         )
-
-    def create_constraints_for_agent(self, agent: int) -> Set[Tuple]:
-        constraints = set()
-        for ag in self.token.paths:
-            if agent != ag:
-                for pos, t in self.token.paths[ag]:
-                    constraints.add((pos, t))  # vertex conflict constraint
-                    constraints.add((pos, t + 1))  # edge conflict constraint
-        return constraints
+        for ag, path in self.token.paths.items():
+            self.token.set_path(ag, path)
 
     def assign_path_to_agent(self, agent: int, **kwargs):
-        constraints = self.create_constraints_for_agent(agent)
+        # the reservations of the other agents' paths are the constraints for the agent's new path
+        self.token.reservations.remove_path(agent)
+        constraints = self.token.reservations
         path_function = kwargs["path_function"] if "path_function" in kwargs else None
         if "path" in kwargs:
             path = kwargs["path"]
@@ -70,41 +78,74 @@ class TokenPassing(Algorithm):
             raise RuntimeError("Either specify a path or a path_function")
         if "task" in kwargs:
             self.tp_agents[agent].assign_task(kwargs["task"])
-        self.token.paths[agent] = path
+        self.token.set_path(agent, path)
         self.tp_agents[agent].assign_path(path)
 
     def add_tasks(self, tasks: List[Task]):
         if tasks:
             self.makespan = -1
-        self.token.tasks += tasks
-
-    def path1(self, agent: TPAgent, task: Task, constraints: Set[Tuple], **kwargs):
-        pos_to_pickup = AStarPlanner.plan(
+        self.token.tasks.extend(tasks)
+
+    def path1(
+        self,
+        agent: TPAgent,
+        task: Task,
+        constraints: ReservationTable,
+        budget: Optional[PlanningBudget] = None,
+        **kwargs
+    ):
+        pos_to_pickup = self.path_planner.plan(
             start_position=agent.agent.position,
             target_position=task.s,
             grid=self.grid,
             constraints=constraints,
-            timestep=self.timestep
+            timestep=self.timestep,
+            heuristic=self.distance_oracle,
+            budget=budget
         )
-        pickup_to_end = AStarPlanner.plan(
+        pickup_to_end = self.path_planner.plan(
             start_position=task.s,
             target_position=task.g,
             grid=self.grid,
             constraints=constraints,
-            timestep=self.timestep + len(pos_to_pickup)
+            timestep=self.timestep + len(pos_to_pickup),
+            heuristic=self.distance_oracle,
+            budget=budget
         )
         return pickup_to_end + pos_to_pickup
 
-    def path2(self, agent: TPAgent, constraints: Set[Tuple], **kwargs):
-        return AStarPlanner.plan(
+    def path2(self, agent: TPAgent, constraints: ReservationTable, budget: Optional[PlanningBudget] = None, **kwargs):
+        return self.path_planner.plan(
             start_position=agent.agent.position,
             target_position=agent.agent.starting_position,
             grid=self.grid,
             constraints=constraints,
-            timestep=self.timestep
+            timestep=self.timestep,
+            heuristic=self.distance_oracle,
+            budget=budget
         )
 
-    def update(self):
+    def fallback_path(self, agent: TPAgent, constraints: ReservationTable, **kwargs):
+        """
+        Single step planned without search, when the planning budget is exceeded: the agent waits in place if its
+        cell is free at the next timestep, otherwise it moves to the first free neighbor (if any).
+        """
+        position = agent.agent.position
+        for next_position in self.grid.successors(position):
+            if not (
+                constraints.is_vertex_reserved(next_position, self.timestep + 1) or
+                constraints.is_edge_reserved(position, next_position, self.timestep)
+            ):
+                if next_position == position:
+                    break
+                return [(next_position, self.timestep + 1), (position, self.timestep)]
+        return [(position, self.timestep)]
+
+    def update(self, budget: Optional[PlanningBudget] = None):
+        """
+        budget: the single-agent searches raise PlanningTimeout once the deadline has passed, then the agent only
+            makes the single step of fallback_path and asks for the token again, its task (if any) stays pending.
+        """
         while any([self.tp_agents[ag].requires_token for ag in self.tp_agents]):
             for agent in self.tp_agents:
                 cur_agent = self.tp_agents[agent]
@@ -112,35 +153,30 @@ class TokenPassing(Algorithm):
                     # Token is assigned to agent
                     cur_agent.requires_token = False
 
-                    endpoints = [
-                        self.token.paths[ag][0][0]
-                        for ag in self.token.paths
-                        if ag != agent
-                    ]
-                    clear_tasks = list(filter(
-                        lambda t : t.s not in endpoints and t.g not in endpoints,
-                        self.token.tasks
-                    ))
-
-                    tasks_with_goal_eq_agent_pos = set(filter(
-                        lambda t: t.g == cur_agent.agent.position,
-                        self.token.tasks
-                    ))
-
-                    if len(clear_tasks) > 0:
-                        task = min(
-                            clear_tasks,
-                            key=lambda t: manhattan_distance(cur_agent.agent.position, t.s)
-                        )
-                        self.token.assign[agent] = task
-                        self.token.tasks.remove(task)
-                        self.assign_path_to_agent(agent, path_function=self.path1, task=task)
-
-                    elif len(tasks_with_goal_eq_agent_pos) == 0 and cur_agent.agent.position not in endpoints:
-                        self.assign_path_to_agent(agent, path=[(cur_agent.agent.position, self.timestep)])
-
-                    else:
-                        self.assign_path_to_agent(agent, path_function=self.path2)
+                    # a task is clear if neither its pickup nor its goal is the endpoint of another agent
+                    task = next(self.token.tasks.nearest(
+                        cur_agent.agent.position,
+                        self.distance_oracle,
+                        lambda t: self.token.tasks.is_clear(t, exempt=lambda ag: ag == agent)
+                    ), None)
+                    position_is_endpoint = bool(
+                        self.token.tasks.agents_with_endpoint(cur_agent.agent.position) - {agent}
+                    )
+
+                    try:
+                        if task is not None:
+                            self.assign_path_to_agent(agent, path_function=self.path1, task=task, budget=budget)
+                            self.token.assign[agent] = task
+                            self.token.tasks.remove(task)
+
+                        elif not self.token.tasks.has_goal(cur_agent.agent.position) and not position_is_endpoint:
+                            self.assign_path_to_agent(agent, path=[(cur_agent.agent.position, self.timestep)])
+
+                        else:
+                            self.assign_path_to_agent(agent, path_function=self.path2, budget=budget)
+                    except PlanningTimeout:
+                        budget.report_fallback(self.timestep, f"TokenPassing (agent {agent})", "single step")
+                        self.assign_path_to_agent(agent, path_function=self.fallback_path)
         for agent in self.tp_agents:
             self.tp_agents[agent].update()
         if self.makespan == -1:
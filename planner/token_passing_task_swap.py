@@ -1,10 +1,14 @@
-from dataclasses import dataclass
-from typing import List, Set, Tuple
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
 from simulator import Agent, Grid 
-from .a_star_planner import AStarPlanner, manhattan_distance
+from .planner_utils import get_planner
+from .path_cache import PathCache
+from .budget import PlanningBudget, PlanningTimeout
+from .distance_oracle import DistanceOracle
+from .reservation_table import ReservationTable
 from .task import Task
+from .task_index import TaskIndex
 from .algorithm import Algorithm
-from copy import deepcopy
 
 class TPAgent:
     def __init__(self, agent: Agent):
@@ -33,14 +37,96 @@ class TPAgent:
 
 @dataclass
 class Token:
+    """
+    Token shared by the agents. The changes made after a savepoint are recorded in an undo log, so that a failed
+    chain of task swaps is rolled back in time proportional to the changes it made. Savepoints can be nested, the
+    log is discarded when the outermost one is committed.
+    The agent each task is assigned to is indexed in owners, the inverse of assign, which is kept in sync by
+    set_task and rollback.
+    """
     paths: dict
-    tasks: List[Task]
+    tasks: TaskIndex
     assign: dict
+    reservations: ReservationTable = field(default_factory=ReservationTable)
+    undo_log: List[Tuple] = field(default_factory=list, repr=False)
+    savepoints: int = field(default=0, repr=False)
+    owners: Dict[Task, int] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.owners = {task: agent for agent, task in self.assign.items() if task is not None}
+
+    def set_path(self, agent: int, path: List[Tuple]):
+        self.release_path(agent)
+        self._log(("path", agent, self.paths.get(agent)))
+        self.paths[agent] = path
+        self.reservations.add_path(agent, path)
+        self.tasks.set_endpoint(agent, path[0][0])
+
+    def release_path(self, agent: int):
+        """
+        Remove the reservations of the path of agent, the path is kept.
+        """
+        self._log(("reservations", agent, self.reservations.owners.get(agent)))
+        self.reservations.remove_path(agent)
+
+    def set_task(self, agent: int, task: Optional[Task]):
+        self._log(("assign", agent, self.assign.get(agent)))
+        self._assign(agent, task)
+
+    def owner(self, task: Task) -> Optional[int]:
+        """
+        Returns:
+            Optional[int]: the agent task is assigned to, None if it is not assigned.
+        """
+        return self.owners.get(task)
+
+    def savepoint(self) -> int:
+        self.savepoints += 1
+        return len(self.undo_log)
+
+    def rollback(self, savepoint: int):
+        """
+        Undo every change made after savepoint, and release it.
+        """
+        while len(self.undo_log) > savepoint:
+            kind, agent, old_value = self.undo_log.pop()
+            if kind == "path":
+                self.paths[agent] = old_value
+                self.tasks.set_endpoint(agent, old_value[0][0])
+            elif kind == "reservations":
+                self.reservations.remove_path(agent)
+                if old_value is not None:
+                    self.reservations.add_constraints(agent, old_value)
+            else:
+                self._assign(agent, old_value)
+        self.savepoints -= 1
+
+    def commit(self):
+        """
+        Keep the changes made after the last savepoint, and release it.
+        """
+        self.savepoints -= 1
+        if self.savepoints == 0:
+            self.undo_log.clear()
+
+    def _log(self, change: Tuple):
+        if self.savepoints:
+            self.undo_log.append(change)
+
+    def _assign(self, agent: int, task: Optional[Task]):
+        old_task = self.assign.get(agent)
+        if old_task is not None and self.owners.get(old_task) == agent:
+            del self.owners[old_task]
+        self.assign[agent] = task
+        if task is not None:
+            self.owners[task] = agent
 
 
 class TokenPassingTaskSwap(Algorithm):
-    def __init__(self, agents: List[Agent], grid: Grid, tasks: List[Task]):
+    def __init__(self, agents: List[Agent], grid: Grid, tasks: List[Task], path_planner: str = "a_star"):
         self.grid = grid
+        self.path_planner = PathCache(get_planner(path_planner))
+        self.distance_oracle = DistanceOracle(grid)
         self.tp_agents = {ag: TPAgent(agent) for ag, agent in enumerate(agents)}
         self.timestep = 0
         self.makespan = -1
@@ -49,21 +135,16 @@ class TokenPassingTaskSwap(Algorithm):
                 ag: [(self.tp_agents[ag].agent.position, self.timestep)]
                 for ag in self.tp_agents
             },
-            tasks=tasks if tasks else [],
+            tasks=TaskIndex(tasks if tasks else []),
             assign={ag: None for ag in self.tp_agents}
         )
-    @staticmethod
-    def create_constraints_for_agent(agent: int, current_token: Token) -> Set[Tuple]:
-        constraints = set()
-        for ag in current_token.paths:
-            if agent != ag:
-                for pos, t in current_token.paths[ag]:
-                    constraints.add((pos, t))  # vertex conflict constraint
-                    constraints.add((pos, t + 1))  # edge conflict constraint
-        return constraints
+        for ag, path in self.token.paths.items():
+            self.token.set_path(ag, path)
 
     def assign_path_to_agent(self, agent: int,current_token: Token, **kwargs):
-        constraints = self.create_constraints_for_agent(agent, current_token)
+        # the reservations of the other agents' paths are the constraints for the agent's new path
+        current_token.release_path(agent)
+        constraints = current_token.reservations
         path_function = kwargs["path_function"] if "path_function" in kwargs else None
         if "path" in kwargs:
             path = kwargs["path"]
@@ -73,121 +154,169 @@ class TokenPassingTaskSwap(Algorithm):
             raise RuntimeError("Either specify a path or a path_function")
         if "task" in kwargs:
             self.tp_agents[agent].assign_task(kwargs["task"])
-        current_token.paths[agent] = path
+        current_token.set_path(agent, path)
         self.tp_agents[agent].assign_path(path)
 
     def add_tasks(self, tasks: List[Task]):
         if tasks:
             self.makespan = -1
-        self.token.tasks += tasks
+        self.token.tasks.extend(tasks)
 
-    def path1(self, agent: TPAgent, task: Task, constraints: Set[Tuple], **kwargs):
-        pos_to_pickup = AStarPlanner.plan(
+    def path1(
+        self,
+        agent: TPAgent,
+        task: Task,
+        constraints: ReservationTable,
+        budget: Optional[PlanningBudget] = None,
+        **kwargs
+    ):
+        pos_to_pickup = self.path_planner.plan(
             start_position=agent.position,
             target_position=task.s,
             grid=self.grid,
             constraints=constraints,
-            timestep=self.timestep
+            timestep=self.timestep,
+            heuristic=self.distance_oracle,
+            budget=budget
         )
-        pickup_to_end = AStarPlanner.plan(
+        pickup_to_end = self.path_planner.plan(
             start_position=task.s,
             target_position=task.g,
             grid=self.grid,
             constraints=constraints,
-            timestep=self.timestep + len(pos_to_pickup)
+            timestep=self.timestep + len(pos_to_pickup),
+            heuristic=self.distance_oracle,
+            budget=budget
         )
         return pickup_to_end + pos_to_pickup
 
-    def path2(self, agent: TPAgent, constraints: Set[Tuple], **kwargs):
-        return AStarPlanner.plan(
+    def path2(self, agent: TPAgent, constraints: ReservationTable, budget: Optional[PlanningBudget] = None, **kwargs):
+        return self.path_planner.plan(
             start_position=agent.position,
             target_position=agent.agent.starting_position,
             grid=self.grid,
             constraints=constraints,
-            timestep=self.timestep
+            timestep=self.timestep,
+            heuristic=self.distance_oracle,
+            budget=budget
         )
 
-    def get_task(self, agent_key: int, current_token: Token) -> bool:
+    def fallback_path(self, agent: TPAgent, constraints: ReservationTable, **kwargs):
+        """
+        Single step planned without search, when the planning budget is exceeded: the agent waits in place if its
+        cell is free at the next timestep, otherwise it moves to the first free neighbor (if any).
+        """
+        position = agent.position
+        for next_position in self.grid.successors(position):
+            if not (
+                constraints.is_vertex_reserved(next_position, self.timestep + 1) or
+                constraints.is_edge_reserved(position, next_position, self.timestep)
+            ):
+                if next_position == position:
+                    break
+                return [(next_position, self.timestep + 1), (position, self.timestep)]
+        return [(position, self.timestep)]
+
+    def get_task(self, agent_key: int, current_token: Token, budget: Optional[PlanningBudget] = None) -> bool:
+        """
+        budget: once the deadline has passed no more swaps are explored, the agent takes the nearest unassigned
+            task (if any), the swaps already committed are kept. The single-agent searches raise PlanningTimeout
+            once the deadline has passed, the swap being explored is then rolled back and the exception is raised.
+        """
 
         self.tp_agents[agent_key].requires_token = False
         cur_agent = self.tp_agents[agent_key]
-        clear_tasks = set()
-
-        for t in current_token.tasks:
-            is_clear = True
-            for executing_agents_key in current_token.paths:
-                if is_clear and executing_agents_key != agent_key:
-                    endpoint = current_token.paths[executing_agents_key][0]
-                    if t != current_token.assign[executing_agents_key] and (t.s == endpoint or t.g == endpoint):
-                        is_clear = False
-            if is_clear:
-                clear_tasks.add(t)
-
-        tasks_with_goal_eq_agent_pos = set(filter(
-            lambda t: t.g == cur_agent.agent.position,
-            current_token.tasks
-        ))
-        while clear_tasks:
-            task = min(
-                clear_tasks,
-                key=lambda t: manhattan_distance(cur_agent.position, t.s)
-            )
-            clear_tasks.remove(task)
-            assigned_tasks = list(current_token.assign.values())
-            if task not in assigned_tasks:
-                current_token.assign[agent_key] = task
-                self.tp_agents[agent_key].assign_task(task)
+        # every pending task is a candidate, the nearest first: the clear-task check of this algorithm compared the
+        # tasks with the last steps (position, timestep) of the paths, so it never excluded a task, and that
+        # behaviour is kept. The candidates are generated lazily, the swaps change the paths and the assignments
+        # of the token but not its pending tasks
+        clear_tasks = current_token.tasks.nearest(cur_agent.position, self.distance_oracle)
+        has_goal_eq_agent_pos = current_token.tasks.has_goal(cur_agent.position)
+        swaps_skipped = False
+        for task in clear_tasks:
+            agent_assigned_to_task = current_token.owner(task)
+            if agent_assigned_to_task is None:
                 self.assign_path_to_agent(
                     agent=agent_key,
                     current_token=current_token,
                     path_function=self.path1,
-                    task=task
+                    task=task,
+                    budget=budget
                 )
+                current_token.set_task(agent_key, task)
                 return True
+            elif budget is not None and budget.expired():
+                if not swaps_skipped:
+                    budget.report_fallback(self.timestep, f"TokenPassingTaskSwap (agent {agent_key})", "no swaps")
+                    swaps_skipped = True
             else:
-                token_copy = deepcopy(current_token)
-                agents = list(current_token.assign.keys())
-                agent_assigned_to_task = agents[assigned_tasks.index(task)]
-                current_token.assign[agent_assigned_to_task] = None
-                _, old_timestep = current_token.paths[agent_assigned_to_task][0]
-                current_token.paths[agent_assigned_to_task] = [(self.tp_agents[agent_assigned_to_task].position, self.timestep)]
-                current_token.assign[agent_key] = task
-                #print(f"Checking if {agent_key} takes less time than {agent_assigned_to_task}")
-                new_path = self.path1(
-                    agent=cur_agent,
-                    task=task,
-                    constraints=self.create_constraints_for_agent(agent_key, current_token)
-                )
-                current_token.paths[agent_key] = new_path
-                _, new_timestep = new_path[0]
-                if new_timestep < old_timestep:
-                    if self.get_task(agent_assigned_to_task, current_token):
-                        self.tp_agents[agent_key].assign_path(new_path)
-                        print(f"TASK SWAPPED {agent_key}->{agent_assigned_to_task}")
-                        return True
-                    #print("Failed")
-                #else:
-                    #print("Takes longer")
+                savepoint = current_token.savepoint()
+                try:
+                    current_token.set_task(agent_assigned_to_task, None)
+                    _, old_timestep = current_token.paths[agent_assigned_to_task][0]
+                    current_token.set_path(
+                        agent_assigned_to_task,
+                        [(self.tp_agents[agent_assigned_to_task].position, self.timestep)]
+                    )
+                    current_token.set_task(agent_key, task)
+                    #print(f"Checking if {agent_key} takes less time than {agent_assigned_to_task}")
+                    current_token.release_path(agent_key)
+                    new_path = self.path1(
+                        agent=cur_agent,
+                        task=task,
+                        constraints=current_token.reservations,
+                        budget=budget
+                    )
+                    current_token.set_path(agent_key, new_path)
+                    _, new_timestep = new_path[0]
+                    if new_timestep < old_timestep:
+                        if self.get_task(agent_assigned_to_task, current_token, budget):
+                            current_token.commit()
+                            self.tp_agents[agent_key].assign_path(new_path)
+                            print(f"TASK SWAPPED {agent_key}->{agent_assigned_to_task}")
+                            return True
+                        #print("Failed")
+                    #else:
+                        #print("Takes longer")
+                except PlanningTimeout:
+                    current_token.rollback(savepoint)
+                    raise
                 #print("Restoring old token")
-                self.token = token_copy
-                current_token = self.token
+                current_token.rollback(savepoint)
 
         if cur_agent.position != cur_agent.agent.starting_position:
-            self.assign_path_to_agent(agent=agent_key, current_token=current_token, path_function=self.path2)
+            self.assign_path_to_agent(
+                agent=agent_key, current_token=current_token, path_function=self.path2, budget=budget
+            )
             return True
         else:
-            if not tasks_with_goal_eq_agent_pos: 
+            if not has_goal_eq_agent_pos:
                 self.assign_path_to_agent(agent=agent_key, current_token=current_token, path=[(cur_agent.position, self.timestep)])
             else:
-                self.assign_path_to_agent(agent=agent_key, current_token=current_token, path_function=self.path2)
+                self.assign_path_to_agent(
+                    agent=agent_key, current_token=current_token, path_function=self.path2, budget=budget
+                )
             return True
 
-    def update(self):
+    def update(self, budget: Optional[PlanningBudget] = None):
+        """
+        budget: if a single-agent search runs past the deadline, the token is restored and the agent only makes the
+            single step of fallback_path, then it asks for the token again.
+        """
         while any([self.tp_agents[ag].requires_token for ag in self.tp_agents]):
             for agent_key in self.tp_agents:
                 if self.tp_agents[agent_key].requires_token:
                     # Token is assigned to agent
-                    self.get_task(agent_key, self.token)
+                    savepoint = self.token.savepoint()
+                    try:
+                        self.get_task(agent_key, self.token, budget)
+                        self.token.commit()
+                    except PlanningTimeout:
+                        self.token.rollback(savepoint)
+                        budget.report_fallback(
+                            self.timestep, f"TokenPassingTaskSwap (agent {agent_key})", "single step"
+                        )
+                        self.assign_path_to_agent(agent_key, self.token, path_function=self.fallback_path)
         for agent_key in self.tp_agents:
             self.tp_agents[agent_key].update()
             task_assigned_to_agent = self.token.assign[agent_key]
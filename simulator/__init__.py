@@ -1,3 +1,3 @@
 from .agent import *
 from .grid import *
-from .simulation import *
+from .base_simulation import *
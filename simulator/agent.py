@@ -1,8 +1,10 @@
-from typing import Tuple, Dict, List, Any
+from typing import Tuple, Dict, List, Any, TYPE_CHECKING
 from abc import ABC, abstractmethod
-import tkinter as tk
 from .tkinter_utils import rect_pos_to_coordinates, move_from_to, eqt_pos_to_coordinates
 
+if TYPE_CHECKING:
+    import tkinter as tk
+
 
 class Agent(ABC):
     """
@@ -37,7 +39,7 @@ class TKAgent(Agent):
 
     """
 
-    def __init__(self, canvas: tk.Canvas, position: Tuple, color: str = "red") -> None:
+    def __init__(self, canvas: "tk.Canvas", position: Tuple, color: str = "red") -> None:
         self.starting_position = position
         self.position = position
         self.task = None
@@ -111,3 +113,48 @@ class TKAgent(Agent):
 
     def __str__(self):
         return self.color
+
+
+class HeadlessAgent(Agent):
+    """
+    GUI-free agent, it only keeps track of its position and of the assigned pickup/delivery locations.
+    """
+
+    def __init__(self, position: Tuple, name: str = "") -> None:
+        self.starting_position = position
+        self.position = position
+        self.task = None
+        self.name = name
+        self.pickup_location = self.position
+        self.delivery_location = self.position
+        self.command_queue: List[Dict[str, Any]] = []
+
+    def update(self) -> None:
+        if len(self.command_queue) > 0:
+            command = self.command_queue.pop()
+            action, arg = next(iter(command.items()))
+            match action:
+                case "move_to":
+                    self.move_to(arg)
+                case "pickup":
+                    self.pickup(arg)
+                case "unload":
+                    self.unload()
+                case _:
+                    pass
+
+    def move_to(self, position: Tuple) -> None:
+        self.position = position
+
+    def assign_pickup_delivery(self, pickup: Tuple, delivery: Tuple) -> None:
+        self.pickup_location = pickup
+        self.delivery_location = delivery
+
+    def pickup(self, shelf_position: Tuple) -> None:
+        pass
+
+    def unload(self) -> None:
+        pass
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,13 @@
+from abc import ABC, abstractmethod
+
+
+class Simulation(ABC):
+    DT: int = 100
+
+    @abstractmethod
+    def start(self) -> None:
+        ...
+
+    @abstractmethod
+    def update(self) -> None:
+        ...
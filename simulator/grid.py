@@ -1,4 +1,5 @@
 import pathlib
+from typing import List, Tuple
 import numpy as np
 
 
@@ -31,12 +32,64 @@ class Grid:
                         self.shelves_pos.append(((j,i),(j,i+1)))
                     else:
                         pass
+        self._build_neighbor_table()
+
+    def _build_neighbor_table(self) -> None:
+        """
+        Cells are identified by y * width + x. The passable neighbors (left, right, up, down) of cell c are
+        neighbor_cells[neighbor_offsets[c]:neighbor_offsets[c + 1]] (CSR layout), blocked cells have no neighbors.
+        The successors of every cell, the cell itself (wait) followed by its neighbors, are also kept as tuples of
+        positions, so that planners can expand a state without allocating or bound-checking candidate cells.
+        """
+        self.passable = self.grid != 0
+        offsets = [0]
+        cells = []
+        self._successors: List[Tuple[Tuple[int, int], ...]] = []
+        for y in range(self.height):
+            for x in range(self.width):
+                neighbors = [
+                    (adj_x, adj_y)
+                    for adj_x, adj_y in ((x - 1, y), (x + 1, y), (x, y + 1), (x, y - 1))
+                    if self.passable[y, x] and self.is_passable((adj_x, adj_y))
+                ]
+                cells.extend(adj_y * self.width + adj_x for adj_x, adj_y in neighbors)
+                offsets.append(len(cells))
+                self._successors.append(((x, y), *neighbors) if self.passable[y, x] else ())
+        self.neighbor_offsets = np.array(offsets, dtype=np.int64)
+        self.neighbor_cells = np.array(cells, dtype=np.int64)
+
+    def is_passable(self, position: Tuple[int, int]) -> bool:
+        x, y = position
+        return 0 <= x < self.width and 0 <= y < self.height and bool(self.passable[y, x])
+
+    def cell_id(self, position: Tuple[int, int]) -> int:
+        return position[1] * self.width + position[0]
+
+    def position(self, cell_id: int) -> Tuple[int, int]:
+        return cell_id % self.width, cell_id // self.width
+
+    def successors(self, position: Tuple[int, int]) -> Tuple[Tuple[int, int], ...]:
+        """
+        Returns:
+            Tuple[Tuple[int, int], ...]: the position itself (wait) followed by its passable neighbors, empty if
+                position is blocked.
+        """
+        return self._successors[position[1] * self.width + position[0]]
+
+    def neighbors(self, position: Tuple[int, int]) -> Tuple[Tuple[int, int], ...]:
+        """
+        Returns:
+            Tuple[Tuple[int, int], ...]: the passable neighbors of position.
+        """
+        return self._successors[position[1] * self.width + position[0]][1:]
 
     def save(self, path: pathlib.Path = "saved.map") -> None:
         np.save(path, self.grid)
 
     def load(self, path: pathlib.Path) -> None:
         self.grid = np.load(path)
+        self.height, self.width = self.grid.shape
+        self._build_neighbor_table()
 
     def __str__(self):
         return str(self.grid)
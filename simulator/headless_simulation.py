@@ -0,0 +1,137 @@
+import json
+import pathlib
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+from planner.algorithm_utils import get_algorithm, ONLINE_ALGORITHMS
+from planner.budget import PlanningBudget
+from planner import Algorithm, Task
+from .agent import HeadlessAgent
+from .base_simulation import Simulation
+from .grid import Grid
+from .task_feed import TaskFeed
+
+
+@dataclass
+class SimulationResult:
+    algorithm: str
+    scenario: str
+    makespan: int
+    timesteps: int
+    completed: bool
+    wall_time: float
+    fallbacks: int = 0
+
+
+class HeadlessSimulation(Simulation):
+    """
+        HeadlessSimulation class, runs a MAPF algorithm on a scenario as fast as possible,
+        without any graphical interface.
+    """
+
+    def __init__(
+        self,
+        scenario_path: pathlib.Path,
+        algorithm: str,
+        max_timesteps: Optional[int] = 10000,
+        tick_budget: Optional[float] = None,
+        **algorithm_kwargs
+    ):
+        """
+        Initialize the headless simulation
+        Args:
+            scenario_path (pathlib.Path): The path to the scenario JSON file.
+            algorithm (str): The algorithm to use for pathfinding.
+            max_timesteps (int, optional): Maximum number of timesteps to simulate,
+                None to run until the makespan is reached. Default is 10000.
+            tick_budget (float, optional): planning time allowed per timestep in seconds, the algorithm falls
+                back to cheaper plans when it is exceeded. None for no limit. Default is None.
+            **algorithm_kwargs: Additional keyword arguments forwarded to the algorithm.
+        """
+        self.scenario_path = scenario_path
+        self.algorithm_name = algorithm
+        self.max_timesteps = max_timesteps
+        self.algorithm_kwargs = algorithm_kwargs
+        self.budget = PlanningBudget(tick_budget)
+        with open(scenario_path, "r") as scenario:
+            self.scenario = json.load(scenario)
+        self.grid = Grid(self.scenario["map"])
+        self.online = self.algorithm_name in ONLINE_ALGORITHMS
+        self.agents: List[HeadlessAgent] = []
+        self.task_feed: Optional[TaskFeed] = None
+        self.result: Optional[SimulationResult] = None
+        self.initialize()
+
+    def initialize(self):
+        """
+        Initialize the simulation by creating the agents, the tasks and the algorithm.
+        """
+        self.agents = [
+            HeadlessAgent(tuple(position), str(i))
+            for i, position in enumerate(self.scenario["agents_positions"])
+        ]
+        self.task_feed = TaskFeed.from_scenario(self.scenario)
+        self.algorithm: Algorithm = get_algorithm(
+            algorithm_name=self.algorithm_name,
+            agents=self.agents,
+            grid=self.grid,
+            tasks=[] if self.online else self.task_feed.drain(),
+            **self.algorithm_kwargs
+        )
+
+    def update(self):
+        """
+        Advance the simulation by one timestep.
+        """
+        if self.online:
+            self.algorithm.add_tasks(self.get_new_tasks(self.algorithm.timestep))
+        self.budget.start()
+        self.algorithm.update(self.budget)
+
+    def is_finished(self) -> bool:
+        """
+        Returns:
+            bool: True if every task has been released and the algorithm reported a makespan.
+        """
+        return self.algorithm.makespan != -1 and self.task_feed.exhausted
+
+    def get_new_tasks(self, timestep: int) -> List[Task]:
+        """
+        Get new tasks available at the given timestep.
+
+        Args:
+            timestep (int): The current timestep.
+
+        Returns:
+            List[Task]: List of new tasks.
+        """
+        return self.task_feed.release(timestep)
+
+    def run(self) -> SimulationResult:
+        """
+        Run the simulation until the makespan is reached or until max_timesteps timesteps are simulated.
+
+        Returns:
+            SimulationResult: makespan and statistics of the run.
+        """
+        start_time = time.perf_counter()
+        while not self.is_finished():
+            if self.max_timesteps is not None and self.algorithm.timestep >= self.max_timesteps:
+                break
+            self.update()
+        self.result = SimulationResult(
+            algorithm=self.algorithm_name,
+            scenario=str(self.scenario_path),
+            makespan=self.algorithm.makespan,
+            timesteps=self.algorithm.timestep,
+            completed=self.is_finished(),
+            wall_time=time.perf_counter() - start_time,
+            fallbacks=len(self.budget.fallbacks)
+        )
+        return self.result
+
+    def start(self) -> None:
+        """
+        Start the simulation loop.
+        """
+        self.run()
@@ -1,30 +1,19 @@
 import json
 import pathlib
 import tkinter as tk
-from abc import ABC, abstractmethod
 from enum import Enum, auto
-from typing import List
-from planner.algorithm_utils import get_algorithm
+from typing import List, Optional
+from planner.algorithm_utils import get_algorithm, ONLINE_ALGORITHMS
+from planner.budget import PlanningBudget
 from planner import Algorithm, Task
 from .agent import TKAgent
+from .base_simulation import Simulation
 from .grid import Grid
+from .task_feed import TaskFeed
 from .shelf import Shelf
 from .tkinter_utils import rect_pos_to_coordinates
 
 
-class Simulation(ABC):
-    DT: int = 100
-
-    @abstractmethod
-    def start(self) -> None:
-        ...
-
-    @abstractmethod
-    def update(self) -> None:
-        ...
-
-
-
 class State(Enum):
     RUNNING = auto()
     PAUSED = auto()
@@ -36,7 +25,14 @@ class TkinterSimulation(Simulation):
         visualization using Tkinter.
     """
 
-    def __init__(self, scenario_path: pathlib.Path, algorithm: str, grid_size: int = 10):
+    def __init__(
+        self,
+        scenario_path: pathlib.Path,
+        algorithm: str,
+        grid_size: int = 10,
+        tick_budget: Optional[float] = None,
+        **algorithm_kwargs
+    ):
         """
         Initialize the simulation implemented in TKinter
         Args:
@@ -44,8 +40,13 @@ class TkinterSimulation(Simulation):
             algorithm (str): The algorithm to use for pathfinding.
             grid_size (int, optional): The size of each grid cell in pixels.
                 Default is 10.
+            tick_budget (float, optional): planning time allowed per timestep in seconds, the algorithm falls
+                back to cheaper plans when it is exceeded. None for no limit. Default is None.
+            **algorithm_kwargs: Additional keyword arguments forwarded to the algorithm.
         """
         self.algorithm_name = algorithm
+        self.algorithm_kwargs = algorithm_kwargs
+        self.budget = PlanningBudget(tick_budget)
         # scenario opening
         with open(scenario_path, "r") as scenario:
             self.scenario = json.load(scenario)
@@ -78,13 +79,8 @@ class TkinterSimulation(Simulation):
         self.timestep_label.pack()
         self.agents = []
         self.shelves = []
-        self.initial_tasks = self.scenario["tasks"]
-        self.tasks = []
-        self.online_algorithms = [
-            "token_passing",
-            "token_passing_task_swap",
-            "central"
-        ]
+        self.task_feed = None
+        self.online_algorithms = ONLINE_ALGORITHMS
         self.initialize()
 
     def initialize(self):
@@ -132,13 +128,14 @@ class TkinterSimulation(Simulation):
 
         # Task assignment
         # self.tp = TokenPassing(self.agents, self.grid)
-        self.tasks = [Task(**task) for task in self.scenario["tasks"]]
+        self.task_feed = TaskFeed.from_scenario(self.scenario)
         # self.tp.add_tasks(self.tasks)
         self.algorithm: Algorithm = get_algorithm(
             algorithm_name=self.algorithm_name,
             agents=self.agents,
             grid=self.grid,
-            tasks=[] if self.algorithm_name in self.online_algorithms else self.tasks
+            tasks=[] if self.algorithm_name in self.online_algorithms else self.task_feed.drain(),
+            **self.algorithm_kwargs
         )
         # self.algorithm.add_tasks(self.tasks)
 
@@ -155,7 +152,8 @@ class TkinterSimulation(Simulation):
                 if self.algorithm.makespan != -1:
                     print("MAKESPAN: ", self.algorithm.makespan)
                     self.pause()
-            self.algorithm.update()
+            self.budget.start()
+            self.algorithm.update(self.budget)
             self.timestep_label.config(text=f"Timestep: {self.algorithm.timestep}")
         self.window.after(self.DT, self.update)
 
@@ -197,8 +195,7 @@ class TkinterSimulation(Simulation):
         Returns:
             List[Task]: List of new tasks.
         """
-        new_tasks = list(filter(lambda t: t.r == timestep, self.tasks))
-        return new_tasks
+        return self.task_feed.release(timestep)
     
     def pause(self):
         """
@@ -0,0 +1,93 @@
+import json
+import pathlib
+from operator import attrgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+from planner import Task
+
+
+class TaskFeed:
+    """
+        TaskFeed class, releases the tasks of a scenario tick by tick, according to their release time r.
+
+        A sequence of tasks is sorted by release time once (tasks released at the same timestep keep their order),
+        any other iterable (a generator, a JSONL file) is consumed lazily and must already be sorted by release
+        time, so that the full list of tasks is never held in memory. Each call to release costs O(arrivals).
+    """
+
+    def __init__(self, tasks: Iterable[Task]):
+        """
+        Initialize the task feed
+        Args:
+            tasks (Iterable[Task]): the tasks, an iterable that is not a sequence must be sorted by release time.
+        """
+        if isinstance(tasks, Sequence):
+            tasks = sorted(tasks, key=attrgetter("r"))
+        self._tasks: Iterator[Task] = iter(tasks)
+        self._next: Optional[Task] = next(self._tasks, None)
+
+    @classmethod
+    def from_jsonl(cls, path: pathlib.Path | str) -> "TaskFeed":
+        """
+        Stream the tasks from a JSONL file, one {"s": [x, y], "g": [x, y], "r": t} object per line, sorted by
+        release time.
+        """
+        def read_tasks() -> Iterator[Task]:
+            with open(path, "r") as tasks_file:
+                for line in tasks_file:
+                    if line.strip():
+                        yield Task(**json.loads(line))
+
+        return cls(read_tasks())
+
+    @classmethod
+    def from_scenario(cls, scenario: Dict) -> "TaskFeed":
+        """
+        Create the task feed of a scenario, the tasks are either listed in "tasks" or streamed from the JSONL file
+        whose path is "tasks_file".
+        """
+        if "tasks_file" in scenario:
+            return cls.from_jsonl(scenario["tasks_file"])
+        return cls([Task(**task) for task in scenario.get("tasks", [])])
+
+    def release(self, timestep: int) -> List[Task]:
+        """
+        Get the tasks released at the given timestep, and the ones released before it that have not been
+        returned yet.
+
+        Args:
+            timestep (int): The current timestep.
+
+        Returns:
+            List[Task]: List of new tasks.
+        """
+        new_tasks = []
+        while self._next is not None and self._next.r <= timestep:
+            task = self._next
+            new_tasks.append(task)
+            self._next = next(self._tasks, None)
+            if self._next is not None and self._next.r < task.r:
+                raise ValueError(f"{self._next} is not sorted by release time, it follows {task}")
+        return new_tasks
+
+    def drain(self) -> List[Task]:
+        """
+        Returns:
+            List[Task]: every task not released yet, regardless of its release time (used by offline algorithms).
+        """
+        new_tasks = []
+        while self._next is not None:
+            new_tasks.append(self._next)
+            self._next = next(self._tasks, None)
+        return new_tasks
+
+    @property
+    def next_release(self) -> Optional[int]:
+        """
+        Returns:
+            Optional[int]: the release time of the next task, None if every task has been released.
+        """
+        return self._next.r if self._next is not None else None
+
+    @property
+    def exhausted(self) -> bool:
+        return self._next is None
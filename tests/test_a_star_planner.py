@@ -0,0 +1,63 @@
+import random
+import unittest
+from queue import PriorityQueue
+from typing import List, Set, Tuple
+from planner.a_star_planner import AStarPlanner
+from planner.grid_graph import GridEdge, GridNode
+from simulator import Grid
+
+
+def original_plan(start_position: Tuple, target_position: Tuple, grid: Grid, constraints: Set[tuple]) -> List:
+    """
+    The A* of the original planner (a PriorityQueue of GridNodes, searched linearly for duplicates), expanding the
+    successors in the order of the grid instead of the order of a set of nodes, which depended on the hash seed.
+    """
+    constraints_vertex_set = {GridNode(*constraint) for constraint in constraints if len(constraint) == 2}
+    constraints_edge_set = {GridEdge(*constraint) for constraint in constraints if len(constraint) == 3}
+    start = GridNode(start_position)
+    target = GridNode(target_position)
+    start.h = start.manhattan(target)
+    start.f = start.g + start.h
+    fringe = PriorityQueue()
+    closed = set()
+    fringe.put(start)
+    while not fringe.empty():
+        n: GridNode = fringe.get()
+        closed.add(n)
+        if n.same_position(target):
+            return AStarPlanner._get_path(n)
+        for adj_node in n.get_valid_positions(grid):
+            if adj_node in constraints_vertex_set or GridEdge((n.x, n.y), (adj_node.x, adj_node.y), n.timestep) in \
+                    constraints_edge_set:
+                continue
+            if adj_node in closed or adj_node in fringe.queue:  # the cost of a timed node never improves
+                continue
+            adj_node.h = adj_node.manhattan(target)
+            adj_node.f = adj_node.g + adj_node.h
+            fringe.put(adj_node)
+    return AStarPlanner._get_path(start)
+
+
+class AStarPlannerTest(unittest.TestCase):
+
+    def test_same_paths_as_original_planner(self):
+        grid = Grid("maps/warehouse-tiny.map")
+        free = [(x, y) for y in range(grid.height) for x in range(grid.width) if grid.is_passable((x, y))]
+        rng = random.Random("a-star")
+        for query in range(40):
+            start, target = rng.sample(free, 2)
+            constraints = set()
+            if query % 2:  # vertex and edge constraints on random cells, the start is never reserved
+                for _ in range(30):
+                    constraints.add((rng.choice(free), rng.randint(1, 15)))
+                    position = rng.choice(free)
+                    constraints.add((position, rng.choice(grid.successors(position)), rng.randint(0, 15)))
+            with self.subTest(start=start, target=target, constraints=len(constraints)):
+                self.assertEqual(
+                    AStarPlanner.plan(start, target, grid, constraints),
+                    original_plan(start, target, grid, constraints)
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import itertools
+import random
+import unittest
+from typing import List, Tuple
+import numpy as np
+from planner.atsp_solver import ATSPSolver
+
+
+def task_agent_matrix(rng: random.Random, num_agents: int, num_tasks: int, size: int = 30) -> np.ndarray:
+    """
+    Returns:
+        np.ndarray: the matrix of a task-agent graph (see PrioritizedTaskPlanning.build_graph) over random parking
+            positions, pickups and goals, with Manhattan distances.
+    """
+    def point():
+        return np.array([rng.randrange(size), rng.randrange(size)])
+
+    starts = [point() for _ in range(num_agents)]
+    pickups = [point() for _ in range(num_tasks)]
+    goals = [point() for _ in range(num_tasks)]
+    distance = lambda a, b: int(np.abs(a - b).sum())
+    delivery = [distance(pickup, goal) for pickup, goal in zip(pickups, goals)]
+    matrix = np.zeros((num_agents + num_tasks,) * 2, dtype=np.int64)
+    for task in range(num_tasks):
+        for agent in range(num_agents):
+            matrix[agent, num_agents + task] = distance(starts[agent], pickups[task])
+        for other in range(num_tasks):
+            matrix[num_agents + task, num_agents + other] = delivery[task] + distance(goals[task], pickups[other])
+        matrix[num_agents + task, :num_agents] = delivery[task]
+    return matrix
+
+
+def makespan(matrix: np.ndarray, tour: List[int], num_agents: int) -> Tuple[int, int]:
+    """
+    Returns:
+        Tuple[int, int]: the cost of the longest agent tour and the total cost of the tour.
+    """
+    edges = [int(matrix[vertex, tour[(i + 1) % len(tour)]]) for i, vertex in enumerate(tour)]
+    route_costs = [0] * num_agents
+    route = 0
+    for vertex, edge in zip(tour, edges):
+        route = vertex if vertex < num_agents else route
+        route_costs[route] += edge
+    return max(route_costs), sum(edges)
+
+
+def brute_force_makespan(matrix: np.ndarray, num_agents: int) -> int:
+    tasks = range(num_agents, len(matrix))
+    best = None
+    for order in itertools.permutations(tasks):
+        for cuts in itertools.combinations_with_replacement(range(len(tasks) + 1), num_agents - 1):
+            bounds = (0, *cuts, len(tasks))
+            tour = []
+            for agent in range(num_agents):
+                tour += [agent, *order[bounds[agent]:bounds[agent + 1]]]
+            value = makespan(matrix, tour, num_agents)[0]
+            best = value if best is None else min(best, value)
+    return best
+
+
+class ATSPSolverTest(unittest.TestCase):
+
+    def test_makespan_matches_brute_force(self):
+        solver = ATSPSolver()
+        for num_agents, num_tasks, seeds in ((3, 4, 20), (2, 5, 10), (4, 4, 10)):
+            for seed in range(seeds):
+                with self.subTest(num_agents=num_agents, num_tasks=num_tasks, seed=seed):
+                    rng = random.Random(f"atsp-{num_agents}-{num_tasks}-{seed}")
+                    matrix = task_agent_matrix(rng, num_agents, num_tasks)
+                    tour = solver.solve(matrix, num_agents)
+                    self.assertEqual(makespan(matrix, tour, num_agents)[0], brute_force_makespan(matrix, num_agents))
+
+    def test_total_matches_brute_force(self):
+        solver = ATSPSolver(objective="total")
+        rng = random.Random("atsp-total")
+        for _ in range(10):
+            matrix = np.array([[0 if i == j else rng.randint(1, 50) for j in range(7)] for i in range(7)])
+            tour = solver.solve(matrix)
+            optimum = min(makespan(matrix, [0, *order], 1)[1] for order in itertools.permutations(range(1, 7)))
+            self.assertEqual(makespan(matrix, tour, 1)[1], optimum)
+
+    def test_tour_is_a_permutation_keeping_the_agents_in_order(self):
+        rng = random.Random("atsp-permutation")
+        for num_agents, num_tasks in ((1, 1), (5, 0), (3, 12), (8, 40)):
+            matrix = task_agent_matrix(rng, num_agents, num_tasks)
+            tour = ATSPSolver().solve(matrix, num_agents)
+            self.assertEqual(sorted(tour), list(range(num_agents + num_tasks)))
+            self.assertEqual([vertex for vertex in tour if vertex < num_agents], list(range(num_agents)))
+
+    def test_same_seed_gives_same_tour(self):
+        matrix = task_agent_matrix(random.Random("atsp-seed"), 4, 20)
+        tours = [ATSPSolver(seed=7).solve(matrix, 4) for _ in range(2)]
+        self.assertEqual(tours[0], tours[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
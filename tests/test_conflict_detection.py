@@ -0,0 +1,97 @@
+import random
+import unittest
+from typing import Dict, List, Tuple
+from planner.conflict_detection import ConflictDetector
+
+MOVES = [(0, 0), (1, 0), (-1, 0), (0, 1), (0, -1)]
+
+
+def random_path(rng: random.Random, size: int, start_timestep: int, length: int) -> List[Tuple]:
+    """
+    Returns:
+        List[Tuple]: a random walk (with waits) of length positions on a size x size grid, in the reversed
+            [(position, timestep), ...] format.
+    """
+    position = (rng.randrange(size), rng.randrange(size))
+    path = [(position, start_timestep)]
+    for timestep in range(start_timestep + 1, start_timestep + length):
+        dx, dy = rng.choice(MOVES)
+        position = (min(max(position[0] + dx, 0), size - 1), min(max(position[1] + dy, 0), size - 1))
+        path.append((position, timestep))
+    return path[::-1]
+
+
+def pairwise_first_conflicts(detector: ConflictDetector) -> Dict[Tuple, Tuple[int, int]]:
+    """
+    Returns:
+        Dict[Tuple, Tuple[int, int]]: the timesteps of the first vertex and edge conflicts of every conflicting
+            pair of agents, independent of the time window packed by the detector.
+    """
+    conflicts = {}
+    for i, agent1 in enumerate(detector.agents):
+        for j, agent2 in enumerate(detector.agents):
+            vertex, edge = int(detector.first_vertex[i, j]), int(detector.first_edge[i, j])
+            if i < j and min(vertex, edge) < ConflictDetector.NO_CONFLICT:
+                conflicts[(agent1, agent2)] = tuple(
+                    detector.start_timestep + column if column < ConflictDetector.NO_CONFLICT else None
+                    for column in (vertex, edge)
+                )
+    return conflicts
+
+
+class ConflictDetectorUpdateTest(unittest.TestCase):
+
+    def assert_same_conflicts(self, incremental: ConflictDetector, fresh: ConflictDetector) -> None:
+        self.assertEqual(pairwise_first_conflicts(incremental), pairwise_first_conflicts(fresh))
+        self.assertEqual(incremental.first_conflict(), fresh.first_conflict())
+        self.assertEqual(incremental.num_conflicting_pairs(), fresh.num_conflicting_pairs())
+
+    def check_random_updates(self, wait_at_goal: bool) -> None:
+        rng = random.Random(f"conflict-detection-{wait_at_goal}")
+        for _ in range(100):
+            size = rng.randint(3, 6)
+            agents = range(rng.randint(2, 6))
+            solution = {agent: random_path(rng, size, rng.randint(2, 6), rng.randint(1, 12)) for agent in agents}
+            detector = ConflictDetector(solution, wait_at_goal)
+            for _ in range(10):
+                agent = rng.choice(list(solution))
+                # the new paths can start before the packed window, end after it or leave the packed width
+                solution[agent] = random_path(rng, size + rng.randint(0, 2), rng.randint(0, 8), rng.randint(1, 20))
+                detector.update(agent, solution[agent])
+                self.assert_same_conflicts(detector, ConflictDetector(solution, wait_at_goal))
+
+    def test_update_matches_fresh_build_waiting_at_goal(self):
+        self.check_random_updates(wait_at_goal=True)
+
+    def test_update_matches_fresh_build_leaving_goal(self):
+        self.check_random_updates(wait_at_goal=False)
+
+    def test_copy_is_updated_independently(self):
+        rng = random.Random("conflict-detection-copy")
+        for _ in range(50):
+            solution = {agent: random_path(rng, 4, 0, rng.randint(1, 10)) for agent in range(4)}
+            detector = ConflictDetector(solution, wait_at_goal=False)
+            before = pairwise_first_conflicts(detector)
+            child_solution = dict(solution)
+            child_solution[0] = random_path(rng, 4, 0, rng.randint(1, 10))
+            child = detector.copy()
+            child.update(0, child_solution[0])
+            self.assertEqual(pairwise_first_conflicts(detector), before)
+            self.assert_same_conflicts(child, ConflictDetector(child_solution, wait_at_goal=False))
+
+    def test_vertex_and_edge_conflicts(self):
+        # agents 0 and 1 swap cells between timesteps 0 and 1, agent 2 reaches the cell where agent 0 waits
+        solution = {
+            0: [((1, 0), 2), ((1, 0), 1), ((0, 0), 0)],
+            1: [((0, 0), 1), ((1, 0), 0)],
+            2: [((1, 0), 2), ((1, 1), 1), ((2, 1), 0)]
+        }
+        conflicts = ConflictDetector(solution, wait_at_goal=False).conflicts()
+        self.assertEqual(
+            [(c.type.name, c.agents(), c.timestep) for c in conflicts],
+            [("EDGE", (0, 1), 0), ("VERTEX", (0, 2), 2)]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import stat
+import sys
+import tempfile
+import textwrap
+import unittest
+from planner.lkh_runner import LKHError, LKHRunner
+
+TOUR_HEADER = """NAME : TA-Prioritized.4.tour
+COMMENT : Length = 42
+TYPE : TOUR
+DIMENSION : 4
+TOUR_SECTION
+"""
+
+
+class LKHTourTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, content: str) -> str:
+        path = os.path.join(self.directory.name, "solution.tour")
+        with open(path, "w") as file:
+            file.write(content)
+        return path
+
+    def test_read_tour_stops_at_minus_one(self):
+        tour_file = self.write(TOUR_HEADER + "3\n1\n4\n2\n-1\nEOF\n")
+        self.assertEqual(LKHRunner.read_tour(tour_file), [2, 0, 3, 1])
+
+    def test_read_tour_stops_at_eof(self):
+        tour_file = self.write(TOUR_HEADER + "3 1\n4 2 EOF\n")
+        self.assertEqual(LKHRunner.read_tour(tour_file), [2, 0, 3, 1])
+
+    def test_read_tour_without_terminator(self):
+        tour_file = self.write(TOUR_HEADER + "3\n1\n4\n2\n")
+        self.assertEqual(LKHRunner.read_tour(tour_file), [2, 0, 3, 1])
+
+    def test_read_tour_without_tour_section(self):
+        tour_file = self.write("NAME : TA-Prioritized.4.tour\nEOF\n")
+        with self.assertRaises(LKHError):
+            LKHRunner.read_tour(tour_file)
+
+    def test_rotate_tour_starts_from_node_zero(self):
+        self.assertEqual(LKHRunner.rotate_tour([2, 0, 3, 1], 4), [0, 3, 1, 2])
+        self.assertEqual(LKHRunner.rotate_tour([0, 1, 2], 3), [0, 1, 2])
+
+    def test_rotate_tour_rejects_non_permutations(self):
+        for tour in ([2, 0, 3], [2, 0, 3, 3], [2, 0, 3, 4], [1, 2, 3, 4], []):
+            with self.subTest(tour=tour), self.assertRaises(LKHError):
+                LKHRunner.rotate_tour(tour, 4)
+
+
+@unittest.skipUnless(os.name == "posix", "the fake LKH executable is a script")
+class LKHRunnerSolveTest(unittest.TestCase):
+    """
+    solve runs a fake LKH executable writing a fixed tour to the TOUR_FILE of its parameters.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def fake_lkh(self, tour_section: str, exit_code: int = 0) -> LKHRunner:
+        executable = os.path.join(self.directory.name, "LKH")
+        with open(executable, "w") as file:
+            file.write(f"#!{sys.executable}\n" + textwrap.dedent(f"""
+                import sys
+                with open(sys.argv[1]) as parameters:
+                    files = dict(line.split(" = ", 1) for line in parameters.read().splitlines())
+                with open(files["TOUR_FILE"], "w") as tour:
+                    tour.write({TOUR_HEADER + tour_section!r})
+                sys.exit({exit_code})
+            """))
+        os.chmod(executable, os.stat(executable).st_mode | stat.S_IEXEC)
+        return LKHRunner(executable=executable)
+
+    def test_solve_rotates_the_tour(self):
+        runner = self.fake_lkh("3\n1\n4\n2\n-1\nEOF\n")
+        self.assertTrue(runner.is_available())
+        self.assertEqual(runner.solve([[0] * 4 for _ in range(4)]), [0, 3, 1, 2])
+
+    def test_solve_rejects_a_tour_of_another_dimension(self):
+        runner = self.fake_lkh("3\n1\n4\n2\n-1\nEOF\n")
+        with self.assertRaises(LKHError):
+            runner.solve([[0] * 5 for _ in range(5)])
+
+    def test_solve_raises_when_lkh_fails(self):
+        with self.assertRaises(LKHError):
+            self.fake_lkh("-1\n", exit_code=1).solve([[0] * 4 for _ in range(4)])
+        with self.assertRaises(LKHError):
+            LKHRunner(executable=os.path.join(self.directory.name, "missing")).solve([[0] * 4 for _ in range(4)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import random
+import unittest
+from planner.prioritized import PrioritizedTaskPlanning
+from planner.task import Task
+from simulator import Grid, HeadlessAgent
+from simulator.headless_simulation import HeadlessSimulation
+
+
+class PrioritizedTaskPlanningTest(unittest.TestCase):
+
+    def test_pooled_paths_equal_serial_paths(self):
+        grid = Grid("maps/warehouse-tiny.map")
+        free = [(x, y) for y in range(grid.height) for x in range(grid.width) if grid.is_passable((x, y))]
+        rng = random.Random("prioritized")
+        starts = rng.sample(free, 4)
+        # few cells, so that the same routes are planned several times and the route cache is used
+        cells = rng.sample(free, 6)
+        tasks = [Task(*rng.sample(cells, 2)) for _ in range(10)]
+        paths = {}
+        for workers in (0, 2):
+            agents = [HeadlessAgent(start) for start in starts]
+            PrioritizedTaskPlanning(agents, grid, list(tasks), atsp_solver="local_search", workers=workers)
+            paths[workers] = [agent.command_queue for agent in agents]
+        self.assertEqual(paths[0], paths[2])
+
+    def test_online_replanning_has_no_conflicts(self):
+        simulation = HeadlessSimulation("scenarios/scen_small_100_6.json", "prioritized_task_assignment_online")
+        previous = [agent.position for agent in simulation.agents]
+        while not simulation.is_finished():
+            simulation.update()
+            positions = [agent.position for agent in simulation.agents]
+            self.assertEqual(len(set(positions)), len(positions), f"vertex conflict at {simulation.algorithm.timestep}")
+            moves = {(position1, position2) for position1, position2 in zip(previous, positions)}
+            swaps = [move for move in moves if move[0] != move[1] and move[::-1] in moves]
+            self.assertEqual(swaps, [], f"swap conflict at {simulation.algorithm.timestep}")
+            previous = positions
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+import unittest
+from simulator.headless_simulation import HeadlessSimulation
+
+
+class PlanningBudgetTest(unittest.TestCase):
+
+    def check_expired_budget(self, algorithm: str) -> None:
+        # with no planning time every search times out, the agents only make the single steps of the fallback
+        simulation = HeadlessSimulation("scenarios/scen_small_100_6.json", algorithm, tick_budget=0)
+        for timestep in range(1, 11):
+            simulation.update()
+            positions = [agent.position for agent in simulation.agents]
+            self.assertEqual(len(set(positions)), len(positions))
+            self.assertEqual(len(simulation.budget.fallbacks), timestep * len(simulation.agents))
+        self.assertEqual({event.fallback for event in simulation.budget.fallbacks}, {"single step"})
+        # the released tasks stay pending and unassigned
+        self.assertGreater(len(simulation.algorithm.token.tasks), 0)
+        self.assertEqual(set(simulation.algorithm.token.assign.values()), {None})
+
+    def test_token_passing_expired_budget(self):
+        self.check_expired_budget("token_passing")
+
+    def test_token_passing_task_swap_expired_budget(self):
+        self.check_expired_budget("token_passing_task_swap")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+from planner.task import Task
+from planner.task_index import TaskIndex
+from planner.token_passing_task_swap import Token
+
+
+class TokenTest(unittest.TestCase):
+
+    def assert_owners_match_assign(self, token: Token) -> None:
+        self.assertEqual(token.owners, {task: agent for agent, task in token.assign.items() if task is not None})
+
+    def test_owners_follow_swaps_and_rollbacks(self):
+        task1, task2 = Task((1, 1), (2, 2)), Task((3, 3), (4, 4))
+        token = Token(paths={}, tasks=TaskIndex([task1, task2]), assign={0: task1, 1: None, 2: None})
+        self.assertEqual(token.owner(task1), 0)
+        self.assertIsNone(token.owner(task2))
+        outer = token.savepoint()
+        token.set_task(0, None)  # agent 1 takes task1 from agent 0, that takes task2
+        token.set_task(1, task1)
+        inner = token.savepoint()
+        token.set_task(0, task2)
+        token.set_task(2, task2)  # a nested swap of task2, rolled back
+        token.set_task(0, None)
+        self.assertEqual(token.owner(task2), 2)
+        token.rollback(inner)
+        self.assertEqual((token.owner(task1), token.owner(task2)), (1, None))
+        self.assert_owners_match_assign(token)
+        token.set_task(0, task2)
+        token.rollback(outer)
+        self.assertEqual((token.owner(task1), token.owner(task2)), (0, None))
+        self.assert_owners_match_assign(token)
+        savepoint = token.savepoint()
+        token.set_task(2, task2)
+        token.commit()
+        self.assertEqual(len(token.undo_log), savepoint)
+        self.assertEqual(token.owner(task2), 2)
+        self.assert_owners_match_assign(token)
+
+
+if __name__ == "__main__":
+    unittest.main()